@@ -17,6 +17,33 @@
 # limitations under the License.
 #
 
-from .cep import *  # noqa:
+import importlib
 
 __version__ = '0.1.0'
+
+# as implementações são importadas apenas quando usadas, o que reduz o tempo
+# de importação do pacote (relevante para invocações curtas, como as de
+# linha de comando); ``from acbrlib_python import ACBrLibCEP`` continua
+# funcionando como antes
+_IMPLEMENTACOES = {
+        'ACBrLibCEP': '.cep',
+        'ACBrLibCEPPool': '.cep',
+        'ACBrLibCEPExecutor': '.cep',
+        'AsyncACBrLibCEP': '.cep',
+        'ACBrLibCEPRoteador': '.cep',
+    }
+
+__all__ = list(_IMPLEMENTACOES)
+
+
+def __getattr__(nome):
+    modulo = _IMPLEMENTACOES.get(nome)
+    if modulo is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {nome!r}')
+    valor = getattr(importlib.import_module(modulo, __name__), nome)
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
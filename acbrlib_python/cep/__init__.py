@@ -17,6 +17,35 @@
 # limitations under the License.
 #
 
-from .impl import ACBrLibCEP  # noqa:
+import importlib
 
-__all__ = ['ACBrLibCEP']
+# cada implementação (e suas dependências, como ``asyncio`` e
+# ``concurrent.futures``) é importada apenas quando usada
+_IMPLEMENTACOES = {
+        'ACBrLibCEP': '.impl',
+        'ACBrLibCEPPool': '.pool',
+        'ACBrLibCEPExecutor': '.processos',
+        'AsyncACBrLibCEP': '.assincrono',
+        'ACBrLibCEPRoteador': '.roteador',
+    }
+
+__all__ = [
+        'ACBrLibCEP',
+        'ACBrLibCEPPool',
+        'ACBrLibCEPExecutor',
+        'AsyncACBrLibCEP',
+        'ACBrLibCEPRoteador',
+    ]
+
+
+def __getattr__(nome):
+    modulo = _IMPLEMENTACOES.get(nome)
+    if modulo is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {nome!r}')
+    valor = getattr(importlib.import_module(modulo, __name__), nome)
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
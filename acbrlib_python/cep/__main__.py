@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/__main__.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Utilitários de linha de comando da ACBrLibCEP:
+
+    $ acbrlib-cep --help
+    $ python -m acbrlib_python.cep --help
+"""
+
+import argparse
+import os
+import sys
+
+from ..constantes import AUTO
+from .cache import CachePersistente
+from .enriquecimento import FORMATOS
+from .enriquecimento import Progresso
+from .enriquecimento import contar_linhas
+from .enriquecimento import enriquecer_arquivo
+from .enriquecimento import formato_arquivo
+from .indice import IndiceCEP
+from .indice import importar_csv
+
+
+def compactar_cache(parser, args):
+    if not os.path.exists(args.arquivo):
+        parser.error(f'arquivo nao encontrado: {args.arquivo}')
+    cache = CachePersistente(args.arquivo)
+    removidas = cache.compactar(vacuum=not args.sem_vacuum)
+    print(f'{removidas} entradas expiradas removidas')
+    return 0
+
+
+def indexar(parser, args):
+    colunas = {}
+    for mapeamento in args.coluna:
+        campo, _, coluna = mapeamento.partition('=')
+        colunas[campo] = coluna
+    quantidade = importar_csv(
+            args.entrada,
+            args.destino,
+            delimitador=args.delimitador,
+            colunas=colunas,
+            encoding=args.encoding
+        )
+    print(f'{quantidade} enderecos indexados em {args.destino}')
+    return 0
+
+
+def enriquecer(parser, args):
+    from .impl import ACBrLibCEP
+    from .pool import ACBrLibCEPPool
+    try:
+        formato = args.formato or formato_arquivo(args.entrada)
+    except ValueError as ex:
+        parser.error(str(ex))
+    if args.trabalhadores < 1:
+        parser.error('--trabalhadores deve ser maior que zero')
+    if args.lote < 1:
+        parser.error('--lote deve ser maior que zero')
+
+    progresso = None
+    if not args.silencioso:
+        total = contar_linhas(args.entrada, formato)
+        progresso = Progresso(total=total)
+
+    cache = CachePersistente(args.cache) if args.cache else None
+    indice = IndiceCEP(args.indice) if args.indice else None
+    opcoes = dict(
+            convencao_chamada=args.convencao_chamada,
+            arq_config=args.arq_config,
+            chave_crypt=args.chave_crypt,
+            cache=cache,
+            indice=indice,
+        )
+    if args.trabalhadores == 1:
+        fonte = ACBrLibCEP.usando(args.biblioteca, **opcoes)
+    else:
+        fonte = ACBrLibCEPPool.usando(
+                args.biblioteca,
+                tamanho=args.trabalhadores,
+                **opcoes
+            )
+    try:
+        with fonte as cep:
+            concluidas = enriquecer_arquivo(
+                    args.entrada,
+                    args.saida,
+                    cep.buscar_varios_ceps,
+                    formato=formato,
+                    coluna=args.coluna_cep,
+                    prefixo=args.prefixo,
+                    tamanho_lote=args.lote,
+                    checkpoint=args.checkpoint,
+                    progresso=progresso,
+                    delimitador=args.delimitador,
+                    encoding=args.encoding
+                )
+    finally:
+        if indice is not None:
+            indice.fechar()
+        if cache is not None:
+            cache.fechar()
+    if args.silencioso:
+        return 0
+    print(f'{concluidas} linhas gravadas em {args.saida}')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            prog='acbrlib-cep',
+            description='Utilitarios da ACBrLibCEP.'
+        )
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    compactar = subparsers.add_parser(
+            'compactar-cache',
+            help='remove as entradas expiradas do cache persistente e '
+                 'reorganiza o arquivo'
+        )
+    compactar.add_argument('arquivo')
+    compactar.add_argument(
+            '--sem-vacuum',
+            action='store_true',
+            help='apenas remove as entradas expiradas'
+        )
+    compactar.set_defaults(executar=compactar_cache)
+
+    indice = subparsers.add_parser(
+            'indexar',
+            help='constroi um indice local de enderecos a partir de um CSV'
+        )
+    indice.add_argument('entrada', help='arquivo CSV, com cabecalho')
+    indice.add_argument('destino', help='arquivo do indice')
+    indice.add_argument('--delimitador', default=',')
+    indice.add_argument('--encoding', default='utf-8')
+    indice.add_argument(
+            '--coluna',
+            action='append',
+            default=[],
+            metavar='CAMPO=COLUNA',
+            help='nome da coluna do CSV para um atributo do endereco '
+                 '(por exemplo, municipio=NOME_LOCALIDADE)'
+        )
+    indice.set_defaults(executar=indexar)
+
+    enriquecimento = subparsers.add_parser(
+            'enriquecer',
+            help='preenche os enderecos dos CEPs de um arquivo CSV ou JSONL'
+        )
+    enriquecimento.add_argument('entrada', help='arquivo CSV, com cabecalho, ou JSONL')
+    enriquecimento.add_argument('saida', help='arquivo enriquecido, no mesmo formato')
+    enriquecimento.add_argument(
+            '--biblioteca',
+            required=True,
+            help='caminho para a biblioteca ACBrLibCEP'
+        )
+    enriquecimento.add_argument('--convencao-chamada', default=AUTO)
+    enriquecimento.add_argument('--arq-config', default='')
+    enriquecimento.add_argument('--chave-crypt', default='')
+    enriquecimento.add_argument('--formato', choices=FORMATOS)
+    enriquecimento.add_argument(
+            '--coluna-cep',
+            default='cep',
+            help='coluna que contem o CEP (padrao: cep)'
+        )
+    enriquecimento.add_argument(
+            '--prefixo',
+            default='',
+            help='prefixo das colunas acrescentadas'
+        )
+    enriquecimento.add_argument(
+            '--trabalhadores',
+            type=int,
+            default=1,
+            help='quantidade de buscas simultaneas (padrao: 1)'
+        )
+    enriquecimento.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='quantidade de linhas lidas e gravadas de cada vez'
+        )
+    enriquecimento.add_argument(
+            '--checkpoint',
+            help='arquivo que registra o progresso; se existir, o '
+                 'processamento e retomado de onde parou'
+        )
+    enriquecimento.add_argument('--cache', help='arquivo do cache persistente')
+    enriquecimento.add_argument('--indice', help='arquivo do indice local')
+    enriquecimento.add_argument('--delimitador', default=',')
+    enriquecimento.add_argument('--encoding', default='utf-8')
+    enriquecimento.add_argument(
+            '--silencioso',
+            action='store_true',
+            help='nao mostra o progresso'
+        )
+    enriquecimento.set_defaults(executar=enriquecer)
+
+    args = parser.parse_args(argv)
+    return args.executar(parser, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
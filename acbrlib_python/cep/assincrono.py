@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/assincrono.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import List
+from typing import Optional
+from typing import TypeVar
+from typing import Union
+
+from ..constantes import AUTO
+
+from .coalescencia import copia
+from .impl import ACBrLibCEP
+from .impl import chave_logradouro
+from .impl import normalizar_cep
+from .modelos import Endereco
+from .pool import ACBrLibCEPPool
+
+T = TypeVar('T')
+
+
+class CoalescedorAsync(object):
+    """
+    Coalescência para corrotinas de um mesmo *event loop*. A busca é
+    executada em uma *task* compartilhada pelas corrotinas que a aguardam:
+    o cancelamento (ou o tempo de espera esgotado) de uma delas não afeta
+    as demais e a *task* só é cancelada quando todas desistirem.
+    """
+
+    def __init__(self):
+        self._em_andamento: Dict[Hashable, asyncio.Task] = {}
+        self._aguardando: Dict[Hashable, int] = {}
+        self._coalescidas = 0
+
+    @property
+    def em_andamento(self) -> int:
+        """Quantidade de buscas (chaves distintas) em andamento."""
+        return len(self._em_andamento)
+
+    @property
+    def coalescidas(self) -> int:
+        """Quantidade de chamadas que aguardaram uma busca já em andamento,
+        em vez de executá-la novamente."""
+        return self._coalescidas
+
+    async def executar(
+            self,
+            chave: Hashable,
+            funcao: Callable[[], Awaitable[T]]) -> T:
+        """
+        Aguarda a corrotina resultante de ``funcao`` ou, se já houver uma
+        em andamento para a mesma chave, aguarda por ela. Veja
+        :meth:`~acbrlib_python.cep.coalescencia.Coalescedor.executar`.
+        """
+        task = self._em_andamento.get(chave)
+        if task is None:
+            task = asyncio.ensure_future(funcao())
+            self._em_andamento[chave] = task
+            self._aguardando[chave] = 0
+            task.add_done_callback(lambda _: self._concluir(chave, task))
+            copiar = False
+        else:
+            self._coalescidas += 1
+            copiar = True
+        self._aguardando[chave] += 1
+        try:
+            resultado = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._em_andamento.get(chave) is task:
+                self._aguardando[chave] -= 1
+                if self._aguardando[chave] == 0:
+                    # ninguém mais aguarda pela busca; a chave é liberada já,
+                    # e não no término da task, para que uma nova chamada
+                    # inicie outra busca em vez de aguardar a cancelada
+                    del self._em_andamento[chave]
+                    del self._aguardando[chave]
+                    task.cancel()
+            raise
+        return copia(resultado) if copiar else resultado
+
+    def _concluir(self, chave: Hashable, task: asyncio.Task) -> None:
+        # a chave pode já ter sido liberada (ou reutilizada por outra busca)
+        # se todos desistiram desta
+        if self._em_andamento.get(chave) is task:
+            del self._em_andamento[chave]
+            del self._aguardando[chave]
+        if not task.cancelled():
+            # evita o aviso de exceção nunca recuperada, se todos que
+            # aguardavam desistiram antes do término da busca
+            task.exception()
+
+
+class AsyncACBrLibCEP(object):
+    """
+    Fachada para uso da :class:`~acbrlib_python.cep.ACBrLibCEP` a partir de
+    código ``asyncio``. As chamadas à biblioteca (que bloqueiam durante todo
+    o acesso ao serviço de consulta) são executadas em *threads* de um
+    executor limitado, sem bloquear o *event loop*:
+
+    .. sourcecode:: python
+
+        async with AsyncACBrLibCEP.usando('/caminho/para/libacbrcep64.so') as cep:
+            enderecos = await cep.buscar_por_cep('18270170', timeout=5)
+
+    Uma única instância de ``ACBrLibCEP`` atende a uma chamada por vez. Para
+    atender várias chamadas simultâneas, use um
+    :class:`~acbrlib_python.cep.ACBrLibCEPPool` como fonte.
+
+    O tempo de espera (``timeout``) e o cancelamento liberam quem aguarda
+    o resultado, mas a chamada à biblioteca já iniciada não pode ser
+    interrompida: ela continua ocupando sua vaga até terminar. Chamadas
+    canceladas enquanto aguardam uma vaga não chegam a ser executadas.
+
+    :param fonte: Uma instância de ``ACBrLibCEP`` já inicializada ou um
+        ``ACBrLibCEPPool``.
+    :param limite: Opcional. Quantidade máxima de chamadas em andamento. Se
+        não for informado, será o tamanho do *pool* ou ``1``.
+    :param timeout: Opcional. Tempo máximo de espera padrão, em segundos,
+        para cada chamada (incluindo a espera por uma vaga).
+    :param coalescer: Se buscas idênticas simultâneas devem aguardar por uma
+        única chamada (veja :class:`CoalescedorAsync`).
+    """
+
+    def __init__(
+            self,
+            fonte: Union[ACBrLibCEP, ACBrLibCEPPool],
+            limite: Optional[int] = None,
+            timeout: Optional[float] = None,
+            coalescer: bool = True):
+        if limite is None:
+            limite = getattr(fonte, 'tamanho', 1)
+        if isinstance(fonte, ACBrLibCEP) and limite != 1:
+            raise ValueError(
+                    'Uma instancia de ACBrLibCEP atende apenas uma chamada '
+                    f'por vez; use um ACBrLibCEPPool (limite={limite!r})'
+                )
+        self._fonte = fonte
+        self._limite = limite
+        self._timeout = timeout
+        self._coalescedor = CoalescedorAsync() if coalescer else None
+        self._semaforo = None
+        self._executor = ThreadPoolExecutor(
+                max_workers=limite,
+                thread_name_prefix='acbrlib-cep'
+            )
+
+    @classmethod
+    @asynccontextmanager
+    async def usando(
+            cls,
+            caminho_biblioteca,
+            convencao_chamada=AUTO,
+            arq_config='',
+            chave_crypt='',
+            tamanho=1,
+            timeout=None,
+            coalescer=True):
+        """
+        Equivalente assíncrono de :meth:`ACBrLibCEP.usando`. Se ``tamanho``
+        for maior que ``1``, será usado um ``ACBrLibCEPPool`` com essa
+        quantidade de instâncias.
+        """
+        loop = asyncio.get_running_loop()
+        if tamanho == 1:
+            def abrir():
+                cep = ACBrLibCEP.usar(
+                        caminho_biblioteca,
+                        convencao_chamada=convencao_chamada
+                    )
+                cep.inicializar(arq_config, chave_crypt)
+                return cep
+            fechar = 'finalizar'
+        else:
+            abrir = functools.partial(
+                    ACBrLibCEPPool,
+                    caminho_biblioteca,
+                    tamanho=tamanho,
+                    convencao_chamada=convencao_chamada,
+                    arq_config=arq_config,
+                    chave_crypt=chave_crypt
+                )
+            fechar = 'fechar'
+        fonte = await loop.run_in_executor(None, abrir)
+        instancia = cls(fonte, timeout=timeout, coalescer=coalescer)
+        try:
+            yield instancia
+        finally:
+            # chamadas abandonadas por timeout podem estar em andamento
+            await loop.run_in_executor(
+                    None,
+                    functools.partial(instancia.fechar, aguardar=True)
+                )
+            await loop.run_in_executor(None, getattr(fonte, fechar))
+
+    @property
+    def fonte(self) -> Union[ACBrLibCEP, ACBrLibCEPPool]:
+        return self._fonte
+
+    @property
+    def limite(self) -> int:
+        return self._limite
+
+    @property
+    def coalescedor(self) -> Optional[CoalescedorAsync]:
+        return self._coalescedor
+
+    async def buscar_por_cep(
+            self,
+            numero: str,
+            timeout: Optional[float] = None) -> List[Endereco]:
+        """
+        Veja :meth:`ACBrLibCEP.buscar_por_cep`.
+
+        :raise asyncio.TimeoutError: Se o resultado não for obtido dentro
+            do tempo de espera.
+        """
+        try:
+            chave = normalizar_cep(numero)
+        except ValueError:
+            chave = None  # não coalescida; o erro é resultado da fonte
+        return await self._executar(
+                timeout,
+                chave,
+                self._fonte.buscar_por_cep,
+                numero
+            )
+
+    async def buscar_por_logradouro(
+            self,
+            tipo_logradouro='',
+            logradouro='',
+            bairro='',
+            municipio='',
+            uf='',
+            timeout: Optional[float] = None) -> List[Endereco]:
+        """
+        Veja :meth:`ACBrLibCEP.buscar_por_logradouro`.
+
+        :raise asyncio.TimeoutError: Se o resultado não for obtido dentro
+            do tempo de espera.
+        """
+        return await self._executar(
+                timeout,
+                chave_logradouro(tipo_logradouro, logradouro, bairro, municipio, uf),
+                functools.partial(
+                        self._fonte.buscar_por_logradouro,
+                        tipo_logradouro=tipo_logradouro,
+                        logradouro=logradouro,
+                        bairro=bairro,
+                        municipio=municipio,
+                        uf=uf
+                    )
+            )
+
+    def fechar(self, aguardar: bool = False) -> None:
+        """
+        Encerra o executor. A fonte não é finalizada.
+
+        :param aguardar: Se deve aguardar o término das chamadas em
+            andamento (o que bloqueia a *thread* atual).
+        """
+        self._executor.shutdown(wait=aguardar)
+
+    async def _executar(self, timeout, chave, funcao, *args):
+        timeout = self._timeout if timeout is None else timeout
+        if self._coalescedor is None or chave is None:
+            chamada = self._submeter(funcao, *args)
+        else:
+            chamada = self._coalescedor.executar(
+                    chave,
+                    functools.partial(self._submeter, funcao, *args)
+                )
+        return await asyncio.wait_for(chamada, timeout)
+
+    async def _submeter(self, funcao, *args):
+        if self._semaforo is None:
+            # criado no event loop em uso
+            self._semaforo = asyncio.Semaphore(self._limite)
+        semaforo = self._semaforo
+        await semaforo.acquire()
+        try:
+            futuro = asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    functools.partial(funcao, *args)
+                )
+        except BaseException:
+            semaforo.release()
+            raise
+
+        def liberar(f):
+            semaforo.release()
+            if not f.cancelled():
+                # evita o aviso de exceção nunca recuperada, se quem
+                # aguardava desistiu antes do término da chamada
+                f.exception()
+
+        futuro.add_done_callback(liberar)
+        return await asyncio.shield(futuro)
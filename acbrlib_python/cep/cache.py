@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/cache.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import json
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from dataclasses import astuple
+from dataclasses import dataclass
+from dataclasses import replace
+from typing import Callable
+from typing import Hashable
+from typing import List
+from typing import Optional
+
+from .modelos import Endereco
+from .modelos import internar
+
+
+@dataclass
+class EstatisticasCache:
+    acertos: int = 0
+    acertos_negativos: int = 0
+    falhas: int = 0
+    expirados: int = 0
+    descartados: int = 0
+
+    @property
+    def consultas(self) -> int:
+        return self.acertos + self.falhas
+
+    @property
+    def taxa_acertos(self) -> float:
+        return self.acertos / self.consultas if self.consultas else 0.0
+
+
+class Cache(object):
+    """
+    Base para os caches de resultados de buscas de endereços. As chaves são
+    o CEP normalizado (veja :func:`~acbrlib_python.cep.impl.normalizar_cep`)
+    ou a tupla de atributos de logradouro normalizados (veja
+    :func:`~acbrlib_python.cep.impl.chave_logradouro`).
+    """
+
+    @property
+    def estatisticas(self) -> EstatisticasCache:
+        raise NotImplementedError()
+
+    def obter(self, chave: Hashable) -> Optional[List[Endereco]]:
+        """
+        :return: Uma lista de endereços (possivelmente vazia) ou ``None`` se
+            não houver um resultado válido para a chave.
+        """
+        raise NotImplementedError()
+
+    def guardar(self, chave: Hashable, enderecos: List[Endereco]) -> None:
+        raise NotImplementedError()
+
+    def descartar(self, chave: Optional[Hashable] = None) -> None:
+        """Descarta a entrada indicada ou, se omitida, todas as entradas."""
+        raise NotImplementedError()
+
+    def obter_ou_buscar(
+            self,
+            chave: Hashable,
+            buscar: Callable[[], List[Endereco]]) -> List[Endereco]:
+        """
+        Resulta os endereços guardados para a chave ou, se não houver, os
+        endereços resultantes de ``buscar``, que são então guardados.
+        Exceções de ``buscar`` não são guardadas.
+        """
+        enderecos = self.obter(chave)
+        if enderecos is None:
+            enderecos = buscar()
+            self.guardar(chave, enderecos)
+        return enderecos
+
+
+class CacheEnderecos(Cache):
+    """
+    Cache em memória para resultados de buscas de endereços, limitado em
+    quantidade de entradas (as menos usadas recentemente são descartadas
+    primeiro) e com tempo de vida. Resultados vazios também são guardados
+    (cache negativo), com um tempo de vida próprio, geralmente menor.
+
+    Pode ser compartilhado entre *threads*.
+
+    :param tamanho_maximo: Quantidade máxima de entradas.
+    :param ttl: Tempo de vida, em segundos, de um resultado.
+    :param ttl_negativo: Tempo de vida, em segundos, de um resultado vazio.
+        Se for zero, resultados vazios não serão guardados.
+    :param relogio: Função que resulta o tempo atual, em segundos.
+    """
+
+    def __init__(
+            self,
+            tamanho_maximo: int = 10000,
+            ttl: float = 86400,
+            ttl_negativo: float = 300,
+            relogio: Callable[[], float] = time.monotonic):
+        self._tamanho_maximo = tamanho_maximo
+        self._ttl = ttl
+        self._ttl_negativo = ttl_negativo
+        self._relogio = relogio
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._estatisticas = EstatisticasCache()
+
+    def __len__(self):
+        return len(self._entradas)
+
+    @property
+    def estatisticas(self) -> EstatisticasCache:
+        with self._lock:
+            return replace(self._estatisticas)
+
+    def obter(self, chave: Hashable) -> Optional[List[Endereco]]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                expira_em, enderecos = entrada
+                if expira_em > self._relogio():
+                    self._entradas.move_to_end(chave)
+                    self._estatisticas.acertos += 1
+                    if not enderecos:
+                        self._estatisticas.acertos_negativos += 1
+                    return list(enderecos)
+                del self._entradas[chave]
+                self._estatisticas.expirados += 1
+            self._estatisticas.falhas += 1
+            return None
+
+    def guardar(self, chave: Hashable, enderecos: List[Endereco]) -> None:
+        ttl = self._ttl if enderecos else self._ttl_negativo
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entradas[chave] = (self._relogio() + ttl, tuple(enderecos))
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self._tamanho_maximo:
+                self._entradas.popitem(last=False)
+                self._estatisticas.descartados += 1
+
+    def descartar(self, chave: Optional[Hashable] = None) -> None:
+        with self._lock:
+            if chave is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(chave, None)
+
+
+class CachePersistente(Cache):
+    """
+    Cache persistente, em um banco de dados SQLite em modo WAL, que pode
+    ser compartilhado entre processos (por exemplo, os *workers* de um
+    servidor de aplicação) e sobrevive ao reinício do serviço. Cada
+    processo e cada *thread* usam a sua própria conexão.
+
+    As entradas expiradas não são removidas na leitura, apenas ignoradas;
+    use :meth:`compactar` periodicamente para removê-las, ou a linha de
+    comando:
+
+    .. sourcecode:: shell
+
+        $ python -m acbrlib_python.cep compactar-cache /var/cache/cep.sqlite
+
+    :param arquivo: Caminho do arquivo do banco de dados.
+    :param ttl: Tempo de vida, em segundos, de um resultado.
+    :param ttl_negativo: Tempo de vida, em segundos, de um resultado vazio.
+        Se for zero, resultados vazios não serão guardados.
+    :param timeout: Tempo máximo de espera, em segundos, enquanto o banco
+        de dados estiver bloqueado por outra conexão.
+    :param relogio: Função que resulta o tempo atual, em segundos desde a
+        *epoch*. Deve ser o mesmo relógio em todos os processos.
+    """
+
+    def __init__(
+            self,
+            arquivo: str,
+            ttl: float = 86400 * 30,
+            ttl_negativo: float = 3600,
+            timeout: float = 5.0,
+            relogio: Callable[[], float] = time.time):
+        self._arquivo = arquivo
+        self._ttl = ttl
+        self._ttl_negativo = ttl_negativo
+        self._timeout = timeout
+        self._relogio = relogio
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._estatisticas = EstatisticasCache()
+        self._conexao()
+
+    @property
+    def arquivo(self) -> str:
+        return self._arquivo
+
+    @property
+    def estatisticas(self) -> EstatisticasCache:
+        with self._lock:
+            return replace(self._estatisticas)
+
+    def obter(self, chave: Hashable) -> Optional[List[Endereco]]:
+        linha = self._conexao().execute(
+                'SELECT expira_em, valor FROM enderecos WHERE chave = ?',
+                (_chave(chave),)
+            ).fetchone()
+        with self._lock:
+            if linha is not None:
+                expira_em, valor = linha
+                if expira_em > self._relogio():
+                    enderecos = [Endereco(*internar(v)) for v in json.loads(valor)]
+                    self._estatisticas.acertos += 1
+                    if not enderecos:
+                        self._estatisticas.acertos_negativos += 1
+                    return enderecos
+                self._estatisticas.expirados += 1
+            self._estatisticas.falhas += 1
+        return None
+
+    def guardar(self, chave: Hashable, enderecos: List[Endereco]) -> None:
+        ttl = self._ttl if enderecos else self._ttl_negativo
+        if ttl <= 0:
+            return
+        valor = json.dumps(
+                [astuple(e) for e in enderecos],
+                ensure_ascii=False,
+                separators=(',', ':')
+            )
+        with self._conexao() as conexao:
+            conexao.execute(
+                    'INSERT OR REPLACE INTO enderecos (chave, expira_em, valor) '
+                    'VALUES (?, ?, ?)',
+                    (_chave(chave), self._relogio() + ttl, valor)
+                )
+
+    def descartar(self, chave: Optional[Hashable] = None) -> None:
+        with self._conexao() as conexao:
+            if chave is None:
+                conexao.execute('DELETE FROM enderecos')
+            else:
+                conexao.execute(
+                        'DELETE FROM enderecos WHERE chave = ?',
+                        (_chave(chave),)
+                    )
+
+    def compactar(self, vacuum: bool = True) -> int:
+        """
+        Remove as entradas expiradas e, opcionalmente, reorganiza o arquivo
+        do banco de dados, devolvendo ao sistema o espaço não utilizado.
+
+        :return: A quantidade de entradas removidas.
+        """
+        with self._conexao() as conexao:
+            removidas = conexao.execute(
+                    'DELETE FROM enderecos WHERE expira_em <= ?',
+                    (self._relogio(),)
+                ).rowcount
+        if vacuum:
+            self._conexao().execute('VACUUM')
+        return removidas
+
+    def fechar(self) -> None:
+        """Fecha a conexão da *thread* atual."""
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None:
+            conexao.close()
+            self._local.conexao = None
+
+    def _conexao(self):
+        # sqlite3 é importado apenas por quem usa o cache persistente
+        import sqlite3
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None or self._local.pid != os.getpid():
+            # conexões não devem ser reaproveitadas após um fork
+            conexao = sqlite3.connect(self._arquivo, timeout=self._timeout)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            with conexao:
+                conexao.execute(
+                        'CREATE TABLE IF NOT EXISTS enderecos ('
+                        'chave TEXT PRIMARY KEY, '
+                        'expira_em REAL NOT NULL, '
+                        'valor TEXT NOT NULL'
+                        ') WITHOUT ROWID'
+                    )
+            self._local.conexao = conexao
+            self._local.pid = os.getpid()
+        return conexao
+
+
+def _chave(chave: Hashable) -> str:
+    if isinstance(chave, tuple):
+        # chaves de logradouro; não colidem com os CEPs, que são digitos
+        return 'L:' + '\x1f'.join(chave)
+    return str(chave)
+
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/coalescencia.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Coalescência de buscas idênticas em andamento (*single-flight*): enquanto
+uma busca está em andamento, quem pedir a mesma busca (pela mesma chave,
+como o CEP normalizado) aguarda por ela em vez de invocar a biblioteca e
+o serviço de consulta novamente. Todos recebem o mesmo resultado ou a
+mesma exceção. Resultados não são guardados depois que a busca termina;
+para isso, use um :class:`~acbrlib_python.cep.cache.Cache`.
+
+Para corrotinas ``asyncio``, veja
+:class:`~acbrlib_python.cep.assincrono.CoalescedorAsync`.
+"""
+
+import threading
+
+from concurrent.futures import Future
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Optional
+from typing import TypeVar
+
+T = TypeVar('T')
+
+
+class Coalescedor(object):
+    """
+    Coalescência para chamadas a partir de várias *threads*. A *thread*
+    que inicia a busca a executa; as demais aguardam o seu término.
+
+    .. sourcecode:: python
+
+        coalescedor = Coalescedor()
+        enderecos = coalescedor.executar(cep, lambda: instancia.buscar_por_cep(cep))
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento: Dict[Hashable, Future] = {}
+        self._coalescidas = 0
+
+    @property
+    def em_andamento(self) -> int:
+        """Quantidade de buscas (chaves distintas) em andamento."""
+        return len(self._em_andamento)
+
+    @property
+    def coalescidas(self) -> int:
+        """Quantidade de chamadas que aguardaram uma busca já em andamento,
+        em vez de executá-la novamente."""
+        return self._coalescidas
+
+    def executar(
+            self,
+            chave: Hashable,
+            funcao: Callable[[], T],
+            timeout: Optional[float] = None) -> T:
+        """
+        Executa ``funcao`` ou, se já houver uma execução em andamento para
+        a mesma chave, aguarda por ela.
+
+        :param timeout: Opcional. Tempo máximo, em segundos, que esta
+            chamada aguarda por uma execução já em andamento. Não se aplica
+            à chamada que executa ``funcao``. Se não for informado, aguarda
+            indefinidamente.
+
+        :return: O resultado de ``funcao``. Se o resultado for uma lista,
+            cada chamada recebe a sua própria cópia.
+        :raise concurrent.futures.TimeoutError: Se a execução em andamento
+            não terminar dentro do tempo de espera.
+        :raise: A exceção resultante de ``funcao``, para todas as chamadas
+            que a aguardavam.
+        """
+        with self._lock:
+            futuro = self._em_andamento.get(chave)
+            if futuro is None:
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+                executar = True
+            else:
+                self._coalescidas += 1
+                executar = False
+        if not executar:
+            return copia(futuro.result(timeout))
+        try:
+            resultado = funcao()
+        except BaseException as ex:
+            self._concluir(chave)
+            futuro.set_exception(ex)
+            raise
+        self._concluir(chave)
+        futuro.set_result(resultado)
+        return resultado
+
+    def _concluir(self, chave: Hashable) -> None:
+        # removida antes de o resultado ser publicado, para que chamadas
+        # posteriores iniciem uma nova busca em vez de reaproveitar esta
+        with self._lock:
+            del self._em_andamento[chave]
+
+
+def copia(resultado):
+    """Resulta uma cópia de uma lista ou o próprio resultado."""
+    # as listas de endereços não são compartilhadas entre quem as recebe
+    return list(resultado) if isinstance(resultado, list) else resultado
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/enriquecimento.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Enriquecimento de arquivos CSV ou JSONL com os endereços dos CEPs neles
+contidos. Usado pelo comando ``acbrlib-cep enriquecer``.
+
+As linhas são lidas e gravadas em lotes, preservando a ordem da entrada.
+Após gravar cada lote, um arquivo de *checkpoint* registra a quantidade de
+linhas concluídas e o tamanho do arquivo de saída, de modo que um
+processamento interrompido possa ser retomado sem repetir buscas nem
+duplicar linhas.
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+
+from itertools import islice
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import TextIO
+from typing import Tuple
+
+from .lote import Resultado
+from .lote import ResultadosEmLote
+from .modelos import CAMPOS
+
+CSV = 'csv'
+
+JSONL = 'jsonl'
+
+FORMATOS = (CSV, JSONL)
+
+Linha = Dict[str, Any]
+
+
+def formato_arquivo(arquivo: str) -> str:
+    """Deduz o formato (:data:`CSV` ou :data:`JSONL`) pela extensão."""
+    _, extensao = os.path.splitext(arquivo)
+    extensao = extensao.lower().lstrip('.')
+    if extensao in ('jsonl', 'ndjson'):
+        return JSONL
+    if extensao in ('csv', 'txt'):
+        return CSV
+    raise ValueError(f'formato nao reconhecido: {arquivo!r}')
+
+
+def contar_linhas(arquivo: str, formato: str) -> int:
+    """Conta (aproximadamente, para CSV com quebras de linha dentro de
+    campos) as linhas de dados do arquivo, sem decodificá-lo."""
+    quantidade = 0
+    ultimo = b'\n'
+    with open(arquivo, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            quantidade += bloco.count(b'\n')
+            ultimo = bloco[-1:]
+    if ultimo != b'\n':
+        quantidade += 1
+    return quantidade - 1 if formato == CSV and quantidade else quantidade
+
+
+def ler_csv(f: TextIO, delimitador: str = ',') -> Tuple[List[str], Iterator[Linha]]:
+    leitor = csv.DictReader(f, delimiter=delimitador)
+    return list(leitor.fieldnames or []), iter(leitor)
+
+
+def ler_jsonl(f: TextIO) -> Iterator[Linha]:
+    for numero, texto in enumerate(f, 1):
+        if texto.strip():
+            try:
+                yield json.loads(texto)
+            except ValueError as ex:
+                raise ValueError(f'linha {numero}: {ex}') from None
+
+
+def colunas_enriquecidas(prefixo: str = '') -> List[str]:
+    """Colunas acrescentadas a cada linha: os atributos do endereço e a
+    mensagem de erro da busca, se houver."""
+    return [f'{prefixo}{c}' for c in CAMPOS] + [f'{prefixo}erro']
+
+
+def enriquecer_linhas(
+        linhas: Iterable[Linha],
+        buscar_varios_ceps: Callable[[Iterable[str]], Iterator[Resultado]],
+        coluna: str = 'cep',
+        prefixo: str = '',
+        tamanho_lote: int = 1000) -> Iterator[List[Linha]]:
+    """
+    Enriquece as linhas com o primeiro endereço encontrado para o CEP
+    contido na coluna indicada, produzindo lotes de linhas enriquecidas na
+    mesma ordem em que foram lidas.
+
+    :param linhas: Linhas a enriquecer (dicionários).
+    :param buscar_varios_ceps: Função de busca em lote, como
+        :meth:`ACBrLibCEP.buscar_varios_ceps
+        <acbrlib_python.cep.ACBrLibCEP.buscar_varios_ceps>`.
+    :param coluna: Nome da coluna que contém o CEP.
+    :param prefixo: Prefixo dos nomes das colunas acrescentadas.
+    :param tamanho_lote: Quantidade de linhas por lote.
+    """
+    colunas = colunas_enriquecidas(prefixo)
+    # a coluna do CEP pode coincidir com uma das colunas acrescentadas; seu
+    # valor original só é substituído se o endereço for encontrado
+    vazio = dict.fromkeys([c for c in colunas if c != coluna], '')
+    linhas = iter(linhas)
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            return
+        numeros = (str(linha.get(coluna) or '') for linha in lote)
+        resultados = ResultadosEmLote(buscar_varios_ceps(numeros))
+        for linha in lote:
+            numero = str(linha.get(coluna) or '')
+            linha.update(vazio)
+            resultado = resultados.get(numero)
+            if resultado is None:
+                resultado = resultados.get(''.join(filter(str.isdigit, numero)))
+            if isinstance(resultado, Exception):
+                linha[colunas[-1]] = str(resultado)
+            elif resultado:
+                for nome, valor in zip(colunas, _valores(resultado[0])):
+                    linha[nome] = valor
+        yield lote
+
+
+def _valores(endereco) -> Iterator[str]:
+    for campo in CAMPOS:
+        yield getattr(endereco, campo)
+
+
+class Checkpoint(object):
+    """
+    Registra o progresso de um enriquecimento: quantidade de linhas da
+    entrada já concluídas e o tamanho, em *bytes*, do arquivo de saída
+    correspondente. O arquivo é substituído atomicamente a cada gravação.
+    """
+
+    def __init__(self, arquivo: Optional[str]):
+        self.arquivo = arquivo
+        self.linhas = 0
+        self.posicao = 0
+        if arquivo and os.path.exists(arquivo):
+            with open(arquivo, encoding='utf-8') as f:
+                dados = json.load(f)
+            self.linhas = int(dados['linhas'])
+            self.posicao = int(dados['posicao'])
+
+    def gravar(self, linhas: int, posicao: int) -> None:
+        self.linhas = linhas
+        self.posicao = posicao
+        if not self.arquivo:
+            return
+        temporario = f'{self.arquivo}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'linhas': linhas, 'posicao': posicao}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.arquivo)
+
+
+class Progresso(object):
+    """Mostra, numa única linha, as linhas concluídas, a vazão e o tempo
+    estimado para o término."""
+
+    def __init__(
+            self,
+            total: Optional[int] = None,
+            inicial: int = 0,
+            saida: TextIO = sys.stderr,
+            intervalo: float = 1.0,
+            relogio: Callable[[], float] = time.monotonic):
+        self._total = total
+        self._inicial = inicial
+        self._saida = saida
+        self._intervalo = intervalo
+        self._relogio = relogio
+        self._inicio = relogio()
+        self._ultima = None
+
+    def atualizar(self, concluidas: int, final: bool = False) -> None:
+        agora = self._relogio()
+        if not final and self._ultima is not None \
+                and agora - self._ultima < self._intervalo:
+            return
+        self._ultima = agora
+        self._saida.write(f'\r{self.descrever(concluidas, agora)}')
+        if final:
+            self._saida.write('\n')
+        self._saida.flush()
+
+    def descrever(self, concluidas: int, agora: Optional[float] = None) -> str:
+        if agora is None:
+            agora = self._relogio()
+        decorrido = agora - self._inicio
+        processadas = concluidas - self._inicial
+        taxa = processadas / decorrido if decorrido > 0 else 0.0
+        texto = f'{concluidas}'
+        if self._total:
+            texto += f'/{self._total} ({100 * concluidas / self._total:.1f}%)'
+        texto += f' linhas, {taxa:.1f} linhas/s'
+        if self._total and taxa > 0:
+            restantes = max(self._total - concluidas, 0) / taxa
+            texto += f', ETA {_duracao(restantes)}'
+        return texto
+
+
+def _duracao(segundos: float) -> str:
+    minutos, segundos = divmod(int(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f'{horas:d}:{minutos:02d}:{segundos:02d}'
+
+
+def enriquecer_arquivo(
+        entrada: str,
+        saida: str,
+        buscar_varios_ceps: Callable[[Iterable[str]], Iterator[Resultado]],
+        formato: Optional[str] = None,
+        coluna: str = 'cep',
+        prefixo: str = '',
+        tamanho_lote: int = 1000,
+        checkpoint: Optional[str] = None,
+        progresso: Optional[Progresso] = None,
+        delimitador: str = ',',
+        encoding: str = 'utf-8') -> int:
+    """
+    Enriquece o arquivo de entrada, gravando as linhas enriquecidas no
+    arquivo de saída, no mesmo formato. Se houver um *checkpoint*, as linhas
+    já concluídas são ignoradas e a saída é truncada no ponto registrado e
+    continuada.
+
+    :return: A quantidade total de linhas concluídas.
+    """
+    formato = formato or formato_arquivo(entrada)
+    ponto = Checkpoint(checkpoint)
+    retomando = ponto.linhas > 0 and os.path.exists(saida)
+    if retomando:
+        os.truncate(saida, ponto.posicao)
+    else:
+        ponto.linhas = ponto.posicao = 0
+
+    with open(entrada, newline='', encoding=encoding) as origem, \
+            open(saida, 'a' if retomando else 'w',
+                 newline='', encoding=encoding) as destino:
+        if formato == CSV:
+            campos, linhas = ler_csv(origem, delimitador)
+            novos = [c for c in colunas_enriquecidas(prefixo) if c not in campos]
+            escritor = csv.DictWriter(
+                    destino,
+                    fieldnames=campos + novos,
+                    delimiter=delimitador,
+                    extrasaction='ignore'
+                )
+            if not retomando:
+                escritor.writeheader()
+            gravar = escritor.writerows
+        else:
+            linhas = ler_jsonl(origem)
+
+            def gravar(lote):
+                destino.writelines(
+                        json.dumps(linha, ensure_ascii=False) + '\n'
+                        for linha in lote
+                    )
+
+        concluidas = ponto.linhas
+        linhas = islice(linhas, concluidas, None)
+        if progresso:
+            progresso.atualizar(concluidas)
+        for lote in enriquecer_linhas(
+                linhas,
+                buscar_varios_ceps,
+                coluna=coluna,
+                prefixo=prefixo,
+                tamanho_lote=tamanho_lote):
+            gravar(lote)
+            destino.flush()
+            concluidas += len(lote)
+            ponto.gravar(concluidas, destino.tell())
+            if progresso:
+                progresso.atualizar(concluidas)
+
+    if progresso:
+        progresso.atualizar(concluidas, final=True)
+    return concluidas
@@ -17,17 +17,27 @@
 # limitations under the License.
 #
 
-import configparser
-import io
+import time
 
 from contextlib import contextmanager
 from ctypes import POINTER
 from ctypes import c_char_p
 from ctypes import c_int
+from dataclasses import dataclass
+from dataclasses import field
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Mapping
+from typing import Optional
+from typing import Tuple
 from typing import Type
 
+from .. import ini
 from ..constantes import AUTO
 from ..excecoes import ACBrLibException
 from ..mixins import ACBrLibCommonMixin
@@ -37,11 +47,57 @@ from ..proto import ReferenceLibrary
 from ..proto import Signature
 from ..proto import common_method_prototypes
 from ..proto import config_method_prototypes
+from ..proto import read_buffer
 from ..proto import read_string_buffer
+from ..proto import shared_library
+from ..rastreamento import ENDERECOS
+from ..rastreamento import ORIGEM
+from ..rastreamento import span
 
+from .cache import Cache
 from .excecoes import ACBrLibCEPException
 from .excecoes import ACBrLibCEPErroResposta
 from .modelos import Endereco
+from .modelos import internar
+
+
+@lru_cache(maxsize=None)
+def prototipos() -> Mapping[str, Signature]:
+    """
+    Os protótipos das funções da ACBrLibCEP. São construídos na primeira vez
+    em que forem necessários e compartilhados (somente leitura) por todas as
+    instâncias de :class:`ACBrLibCEP`.
+    """
+    return MappingProxyType({
+            **common_method_prototypes('CEP'),
+            **config_method_prototypes('CEP'),
+            'CEP_BuscarPorCEP': Signature([c_char_p, c_char_p, POINTER(c_int)]),  # eCEP, sResposta, esTamanho,
+            'CEP_BuscarPorLogradouro': Signature([
+                    c_char_p,  # eCidade
+                    c_char_p,  # eTipo_Logradouro
+                    c_char_p,  # eLogradouro
+                    c_char_p,  # eUF
+                    c_char_p,  # eBairro
+                    c_char_p,  # sResposta
+                    POINTER(c_int),  # esTamanho
+                ])
+        })
+
+
+@dataclass
+class Aquecimento:
+    """
+    Resultado de :meth:`ACBrLibCEP.aquecer`: quanto tempo (em segundos)
+    levou cada fase executada, na ordem em que foram executadas. As fases
+    são ``carregar``, ``inicializar``, ``resolver``, ``configuracao`` e
+    ``canario``; ``inicializar`` é omitida se a instância já estiver
+    inicializada e ``canario`` se não houver um CEP canário.
+    """
+    fases: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return sum(self.fases.values())
 
 
 class ACBrLibCEP(ACBrLibReferencia, ACBrLibCommonMixin, ACBrLibConfigMixin):
@@ -51,33 +107,43 @@ class ACBrLibCEP(ACBrLibReferencia, ACBrLibCommonMixin, ACBrLibConfigMixin):
             prefixo: str,
             biblioteca: ReferenceLibrary,
             prototipos: Mapping[str, Signature],
-            base_exception: Type[ACBrLibException]):
+            base_exception: Type[ACBrLibException],
+            cache: Optional[Cache] = None,
+            indice=None):
         super().__init__(prefixo, biblioteca, prototipos, base_exception)
+        self._cache = cache
+        self._indice = indice
+        self._aquecimento = None
+
+    @property
+    def cache(self) -> Optional[Cache]:
+        return self._cache
+
+    @property
+    def aquecimento(self) -> Optional[Aquecimento]:
+        """O resultado do último :meth:`aquecer`, se houver."""
+        return self._aquecimento
+
+    @property
+    def indice(self):
+        return self._indice
 
     @staticmethod
-    def usar(caminho_biblioteca, convencao_chamada=AUTO):
-        prototypes = {
-                **common_method_prototypes('CEP'),
-                **config_method_prototypes('CEP'),
-                'CEP_BuscarPorCEP': Signature([c_char_p, c_char_p, POINTER(c_int)]),  # eCEP, sResposta, esTamanho,
-                'CEP_BuscarPorLogradouro': Signature([
-                        c_char_p,  # eCidade
-                        c_char_p,  # eTipo_Logradouro
-                        c_char_p,  # eLogradouro
-                        c_char_p,  # eUF
-                        c_char_p,  # eBairro
-                        c_char_p,  # sResposta
-                        POINTER(c_int),  # esTamanho
-                    ])
-            }
+    def usar(
+            caminho_biblioteca,
+            convencao_chamada=AUTO,
+            cache=None,
+            indice=None):
         instancia = ACBrLibCEP(
                 'CEP',
-                ReferenceLibrary(
+                shared_library(
                         caminho_biblioteca,
                         calling_convention=convencao_chamada
                     ),
-                prototypes,
-                ACBrLibCEPException
+                prototipos(),
+                ACBrLibCEPException,
+                cache=cache,
+                indice=indice
             )
         return instancia
 
@@ -88,17 +154,84 @@ class ACBrLibCEP(ACBrLibReferencia, ACBrLibCommonMixin, ACBrLibConfigMixin):
             caminho_biblioteca,
             convencao_chamada=AUTO,
             arq_config='',
-            chave_crypt=''):
-        cep = cls.usar(caminho_biblioteca, convencao_chamada=convencao_chamada)
-        cep.inicializar(arq_config, chave_crypt)
+            chave_crypt='',
+            cache=None,
+            indice=None,
+            aquecer=False,
+            cep_canario=None):
+        """
+        Cria uma instância inicializada que é finalizada ao final do bloco.
+        Se ``aquecer`` for verdadeiro (ou se houver um ``cep_canario``) a
+        instância é inicializada através de :meth:`aquecer`.
+        """
+        cep = cls.usar(
+                caminho_biblioteca,
+                convencao_chamada=convencao_chamada,
+                cache=cache,
+                indice=indice
+            )
+        if aquecer or cep_canario:
+            cep.aquecer(arq_config, chave_crypt, cep_canario=cep_canario)
+        else:
+            cep.inicializar(arq_config, chave_crypt)
         try:
             yield cep
         finally:
             cep.finalizar()
 
+    def aquecer(
+            self,
+            arq_config: str = '',
+            chave_crypt: str = '',
+            cep_canario: Optional[str] = None) -> Aquecimento:
+        """
+        Antecipa tudo o que, de outro modo, seria feito na primeira busca:
+        carrega a biblioteca, inicializa (se ainda não estiver
+        inicializada), resolve todas as funções dos protótipos e lê a
+        configuração (veja :meth:`configuracao`). Opcionalmente, faz uma
+        busca pelo ``cep_canario`` diretamente na biblioteca (sem consultar
+        o índice ou o *cache*), o que também verifica se a biblioteca está
+        em condições de responder.
+
+        Se uma das fases falhar, a instância inicializada aqui é finalizada
+        antes de a exceção ser propagada.
+
+        :return: O tempo de cada fase (veja :class:`Aquecimento`), também
+            disponível em :attr:`aquecimento`.
+        """
+        aquecimento = Aquecimento()
+        fases = aquecimento.fases
+        inicializar = not self._em_uso
+
+        def fase(nome, funcao, *args):
+            with span(self._rastreador, f'aquecer.{nome}'):
+                inicio = time.perf_counter()
+                funcao(*args)
+                fases[nome] = time.perf_counter() - inicio
+
+        with span(self._rastreador, 'ACBrLibCEP.aquecer'):
+            fase('carregar', lambda: self._biblioteca.ref)
+            if inicializar:
+                fase('inicializar', self.inicializar, arq_config, chave_crypt)
+            try:
+                fase('resolver', self.resolver_funcoes)
+                fase('configuracao', self.configuracao)
+                if cep_canario:
+                    fase('canario', self._buscar_por_cep, normalizar_cep(cep_canario))
+            except BaseException:
+                if inicializar:
+                    self.finalizar()
+                raise
+        self._aquecimento = aquecimento
+        return aquecimento
+
     def buscar_por_cep(self, numero: str) -> List[Endereco]:
         """
-        Faz uma busca pelo número do CEP.
+        Faz uma busca pelo número do CEP. Se houver um índice local (veja
+        :class:`~acbrlib_python.cep.indice.IndiceCEP`) ele será consultado
+        primeiro; a biblioteca será invocada apenas se o CEP não estiver no
+        índice.
+
         :param numero: Número do CEP. Deve possuir exatamente oito digitos e
             pode ou não estar formatado (qualquer caracter que não seja um
             digito, será ignorado).
@@ -106,14 +239,55 @@ class ACBrLibCEP(ACBrLibReferencia, ACBrLibCommonMixin, ACBrLibConfigMixin):
         :raise ValueError: Se o argumento não possuir oito digitos, após
             todos os caracteres não-digito terem sido removidos.
         """
-        cep = ''.join([c for c in numero if c.isdigit()])
-        if len(cep) != 8:
-            raise ValueError(
-                    f'CEP informado nao possui nove digitos: {numero!r}'
+        with span(self._rastreador, 'ACBrLibCEP.buscar_por_cep') as s:
+            enderecos = self._consultar_cep(normalizar_cep(numero))
+            s.definir_atributo(ENDERECOS, len(enderecos))
+            return enderecos
+
+    def _consultar_cep(self, cep: str) -> List[Endereco]:
+        if self._indice is not None:
+            enderecos = self._indice.buscar(cep)
+            if enderecos:
+                return enderecos
+        if self._cache is not None:
+            return self._cache.obter_ou_buscar(
+                    cep,
+                    lambda: self._buscar_por_cep(cep)
                 )
+        return self._buscar_por_cep(cep)
+
+    def _buscar_por_cep(self, cep: str) -> List[Endereco]:
         metodo = f'{self._prefixo}_BuscarPorCEP'
-        resposta = read_string_buffer(self, metodo, self._b(cep))
-        return processar_resposta(resposta)
+        return read_buffer(
+                self,
+                metodo,
+                self._b(cep),
+                processar=self._processar_resposta
+            )
+
+    def _processar_resposta(self, dados) -> List[Endereco]:
+        # a resposta é processada diretamente sobre o buffer da chamada
+        if self._rastreador is None:
+            return processar_resposta_bytes(dados, self._encoding)
+        with self._rastreador.iniciar('processar_resposta') as s:
+            enderecos = processar_resposta_bytes(dados, self._encoding)
+            s.definir_atributo(ENDERECOS, len(enderecos))
+            return enderecos
+
+    def buscar_varios_ceps(self, numeros: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        """
+        Busca vários números de CEP, um de cada vez, sem repetir os CEPs
+        já buscados. Os números são consumidos sob demanda. Para distribuir
+        as buscas entre várias instâncias, use um
+        :class:`~acbrlib_python.cep.ACBrLibCEPPool`.
+
+        Veja :func:`~acbrlib_python.cep.lote.buscar_varios_ceps`.
+
+        :return: Um iterador de tuplas contendo o CEP normalizado e a lista
+            de endereços resultante ou a exceção lançada pela busca.
+        """
+        from .lote import buscar_varios_ceps
+        return buscar_varios_ceps(self.buscar_por_cep, numeros)
 
     def buscar_por_logradouro(
             self,
@@ -140,55 +314,264 @@ class ACBrLibCEP(ACBrLibReferencia, ACBrLibCommonMixin, ACBrLibConfigMixin):
 
         :return: Retorna uma lista de :class:`~acbrlib_python.cep.Endereco`.
         """
-        metodo = f'{self._prefixo}_BuscarPorLogradouro'
-        resposta = read_string_buffer(
+        argumentos = (tipo_logradouro, logradouro, bairro, municipio, uf)
+        with span(self._rastreador, 'ACBrLibCEP.buscar_por_logradouro') as s:
+            if self._cache is not None:
+                enderecos = self._cache.obter_ou_buscar(
+                        chave_logradouro(*argumentos),
+                        lambda: self._buscar_por_logradouro(*argumentos)
+                    )
+            else:
+                enderecos = self._buscar_por_logradouro(*argumentos)
+            s.definir_atributo(ENDERECOS, len(enderecos))
+            return enderecos
+
+    def iter_buscar_por_logradouro(
+            self,
+            tipo_logradouro='',
+            logradouro='',
+            bairro='',
+            municipio='',
+            uf='') -> Iterator[Endereco]:
+        """
+        Faz a mesma busca que :meth:`buscar_por_logradouro`, mas produz os
+        endereços à medida em que cada seção ``EnderecoN`` da resposta é
+        processada, na ordem em que aparecem na resposta. Se apenas os
+        primeiros endereços forem consumidos, os demais não são processados.
+
+        A busca é feita quando o primeiro endereço for solicitado. O
+        resultado é obtido do cache, se houver, mas não é guardado nele.
+
+        :return: Um iterador de :class:`~acbrlib_python.cep.Endereco`.
+        """
+        argumentos = (tipo_logradouro, logradouro, bairro, municipio, uf)
+        with span(self._rastreador, 'ACBrLibCEP.iter_buscar_por_logradouro') as s:
+            enderecos = None
+            if self._cache is not None:
+                enderecos = self._cache.obter(chave_logradouro(*argumentos))
+            if enderecos is None:
+                s.definir_atributo(ORIGEM, 'biblioteca')
+                resposta = self._resposta_busca_por_logradouro(*argumentos)
+            else:
+                s.definir_atributo(ORIGEM, 'cache')
+                s.definir_atributo(ENDERECOS, len(enderecos))
+        # o span termina antes do primeiro endereço ser produzido: os
+        # endereços são processados à medida em que forem consumidos
+        if enderecos is not None:
+            yield from enderecos
+        else:
+            yield from iter_processar_resposta(resposta)
+
+    def _buscar_por_logradouro(self, *argumentos) -> List[Endereco]:
+        return read_buffer(
                 self,
-                metodo,
+                f'{self._prefixo}_BuscarPorLogradouro',
+                *self._argumentos_logradouro(*argumentos),
+                processar=self._processar_resposta
+            )
+
+    def _resposta_busca_por_logradouro(self, *argumentos) -> str:
+        return read_string_buffer(
+                self,
+                f'{self._prefixo}_BuscarPorLogradouro',
+                *self._argumentos_logradouro(*argumentos)
+            )
+
+    def _argumentos_logradouro(
+            self,
+            tipo_logradouro,
+            logradouro,
+            bairro,
+            municipio,
+            uf) -> Tuple[bytes, ...]:
+        # na ordem dos parâmetros de CEP_BuscarPorLogradouro
+        return (
                 self._b(municipio),
                 self._b(tipo_logradouro),
                 self._b(logradouro),
                 self._b(uf),
                 self._b(bairro),
             )
-        return processar_resposta(resposta)
+
+
+def normalizar_cep(numero: str) -> str:
+    """
+    Remove do número do CEP todos os caracteres que não sejam digitos.
+
+    :raise ValueError: Se o resultado não possuir exatamente oito digitos.
+    """
+    cep = ''.join([c for c in numero if c.isdigit()])
+    if len(cep) != 8:
+        raise ValueError(
+                f'CEP informado nao possui nove digitos: {numero!r}'
+            )
+    return cep
+
+
+def chave_logradouro(
+        tipo_logradouro='',
+        logradouro='',
+        bairro='',
+        municipio='',
+        uf='') -> Tuple[str, ...]:
+    """
+    Resulta uma chave para os atributos de uma busca por logradouro,
+    desconsiderando diferenças de caixa e de espaços em branco.
+    """
+    return tuple(
+            ' '.join(valor.split()).casefold()
+            for valor in (tipo_logradouro, logradouro, bairro, municipio, uf)
+        )
 
 
 def processar_resposta(resposta: str) -> List[Endereco]:
-    buf = io.StringIO(resposta)
-    parser = configparser.ConfigParser()
-    parser.read_file(buf)
-    section, option = 'CEP', 'Quantidade'
-    if not parser.has_option(section, option):
+    try:
+        secoes = ini.ler(resposta)
+    except ValueError as ex:
+        raise ACBrLibCEPErroResposta(
+                f'Resposta mal formada; {ex}; resposta={resposta!r}'
+            ) from None
+    quantidade = _quantidade(secoes.get('CEP', {}), resposta)
+    return [_endereco(i, secoes) for i in range(quantidade)]
+
+
+def processar_resposta_bytes(dados, encoding: str = 'utf-8') -> List[Endereco]:
+    """
+    Processa a resposta como :func:`processar_resposta`, mas diretamente
+    sobre os *bytes* da resposta (ou um ``memoryview`` do buffer onde ela
+    foi escrita), decodificando apenas os valores dos atributos dos
+    endereços.
+
+    :param dados: A resposta, como *bytes* ou outro objeto que suporte o
+        protocolo de buffer.
+    :param encoding: A codificação da resposta.
+    """
+    try:
+        secoes = ini.ler_bytes(dados)
+    except ValueError as ex:
+        raise ACBrLibCEPErroResposta(
+                f'Resposta mal formada; {ex}; '
+                f'resposta={_decodificar(dados, encoding)!r}'
+            ) from None
+    quantidade = secoes.get(b'CEP', {}).get(b'quantidade')
+    if quantidade is None:
+        _quantidade({}, _decodificar(dados, encoding))  # resulta a exceção
+    return [_endereco_bytes(i, secoes, encoding) for i in range(int(quantidade))]
+
+
+def iter_processar_resposta(resposta: str) -> Iterator[Endereco]:
+    """
+    Processa a resposta como :func:`processar_resposta`, mas produz os
+    endereços à medida em que cada seção ``EnderecoN`` é processada, na
+    ordem em que aparecem na resposta.
+
+    A quantidade de endereços (``[CEP] Quantidade``) é validada antes do
+    primeiro endereço ser produzido. A falta de alguma seção ``EnderecoN``
+    só é detectada quando a iteração alcançar o final da resposta.
+    """
+    try:
+        posicao = _posicao_secao_cep(resposta)
+        secao = {} if posicao < 0 else next(ini.secoes(resposta[posicao:]))[1]
+    except ValueError as ex:
+        raise ACBrLibCEPErroResposta(
+                f'Resposta mal formada; {ex}; resposta={resposta!r}'
+            ) from None
+    quantidade = _quantidade(secao, resposta)
+    produzidos = set()
+    try:
+        for nome, secao in ini.secoes(resposta):
+            i = _indice_endereco(nome, quantidade)
+            if i is not None and i not in produzidos:
+                produzidos.add(i)
+                yield _endereco(i, {nome: secao})
+    except ValueError as ex:
+        raise ACBrLibCEPErroResposta(
+                f'Resposta mal formada; {ex}; resposta={resposta!r}'
+            ) from None
+    for i in range(quantidade):
+        if i not in produzidos:
+            _endereco(i, {})  # resulta a exceção da seção ausente
+
+
+def _posicao_secao_cep(resposta: str) -> int:
+    # a seção [CEP] costuma ser a última da resposta
+    fim = len(resposta)
+    while True:
+        posicao = resposta.rfind('[CEP]', 0, fim)
+        if posicao < 0:
+            return posicao
+        inicio = resposta.rfind('\n', 0, posicao) + 1
+        final = resposta.find('\n', posicao)
+        if final < 0:
+            final = len(resposta)
+        if not resposta[inicio:posicao].strip() and not resposta[posicao + 5:final].strip():
+            return inicio
+        fim = posicao
+
+
+def _quantidade(secao: ini.Secao, resposta: str) -> int:
+    quantidade = secao.get('quantidade')
+    if quantidade is None:
         raise ACBrLibCEPErroResposta(
                 'Resposta mal formada; a resposta nao possui a '
                 'informacao da quantidade de enderecos encontrados; '
                 f'resposta={resposta!r}'
             )
-    enderecos = []
-    for i in range(parser.getint(section, option)):
-        enderecos.append(_endereco(i, parser))
-    return enderecos
+    return int(quantidade)
+
+
+def _indice_endereco(nome: str, quantidade: int) -> Optional[int]:
+    if nome.startswith('Endereco') and nome[8:].isdigit():
+        i = int(nome[8:]) - 1
+        if 0 <= i < quantidade:
+            return i
+    return None
+
 
+_OPCOES = (
+        'Tipo_Logradouro',
+        'Logradouro',
+        'Complemento',
+        'Bairro',
+        'Municipio',
+        'UF',
+        'CEP',
+        'IBGE_Municipio',
+        'IBGE_UF',
+    )
 
-def _endereco(i: int, parser: configparser.ConfigParser) -> Endereco:
+_CHAVES = tuple(opcao.lower() for opcao in _OPCOES)
+
+
+_CHAVES_BYTES = tuple(chave.encode('ascii') for chave in _CHAVES)
+
+
+def _endereco_bytes(
+        i: int,
+        secoes: Mapping[bytes, ini.SecaoBytes],
+        encoding: str) -> Endereco:
+    secao = secoes.get(b'Endereco%d' % (i + 1), {})
+    try:
+        valores = [secao[chave] for chave in _CHAVES_BYTES]
+    except KeyError:
+        # resulta a mesma exceção que o processamento da resposta decodificada
+        _endereco(i, {f'Endereco{i + 1}': {c.decode('ascii'): '' for c in secao}})
+        raise
+    return Endereco(*internar([valor.decode(encoding) for valor in valores]))
+
+
+def _decodificar(dados, encoding: str) -> str:
+    return bytes(dados).decode(encoding, errors='replace')
+
+
+def _endereco(i: int, secoes: Mapping[str, ini.Secao]) -> Endereco:
     section = f'Endereco{i + 1}'
-    options = [
-            'Tipo_Logradouro',
-            'Logradouro',
-            'Complemento',
-            'Bairro',
-            'Municipio',
-            'UF',
-            'CEP',
-            'IBGE_Municipio',
-            'IBGE_UF',
-        ]
-    kwargs = {}
-    for option in options:
-        if not parser.has_option(section, option):
-            raise ACBrLibCEPErroResposta(
+    secao = secoes.get(section, {})
+    try:
+        return Endereco(*internar([secao[chave] for chave in _CHAVES]))
+    except KeyError:
+        option = next(o for o, c in zip(_OPCOES, _CHAVES) if c not in secao)
+        raise ACBrLibCEPErroResposta(
                 'Resposta mal formada; a resposta nao possui a '
                 f'informacao {option!r} na secao {section!r}'
-            )
-        kwargs[option.lower()] = parser.get(section, option)
-    return Endereco(**kwargs)
+            ) from None
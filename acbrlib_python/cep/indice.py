@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/indice.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import csv
+import dataclasses
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Optional
+
+from .impl import normalizar_cep
+from .modelos import CAMPOS
+from .modelos import Endereco
+from .modelos import internar
+
+ASSINATURA = b'ACBRCEP1'
+
+_CABECALHO = struct.Struct('<8sII')  # assinatura, quantidade, reservado
+
+_SEPARADOR = '\x1f'
+
+
+class IndiceCEP(object):
+    """
+    Índice local de endereços, somente leitura, mapeado em memória a partir
+    de um arquivo construído por :func:`construir_indice` ou
+    :func:`importar_csv`. Os CEPs são mantidos ordenados, como inteiros, de
+    modo que uma busca é uma busca binária, sem qualquer acesso à rede.
+
+    O arquivo é formado por um cabeçalho, seguido do vetor de CEPs
+    ordenados, do vetor de posições dos registros e dos registros (os
+    atributos do endereço, em UTF-8). Um mesmo CEP pode possuir mais de um
+    endereço. Os inteiros são gravados em *little-endian*.
+
+    Pode ser compartilhado entre *threads* e, por ser mapeado em memória,
+    as páginas do arquivo são compartilhadas entre os processos que
+    carregarem o mesmo índice.
+
+    :param arquivo: Caminho do arquivo do índice.
+    """
+
+    def __init__(self, arquivo: str):
+        if sys.byteorder != 'little':
+            raise RuntimeError('IndiceCEP requer uma plataforma little-endian')
+        self._arquivo = arquivo
+        with open(arquivo, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._carregar()
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    def _carregar(self):
+        assinatura, quantidade, _ = _CABECALHO.unpack_from(self._mmap, 0)
+        if assinatura != ASSINATURA:
+            raise ValueError(f'Arquivo de indice invalido: {self._arquivo!r}')
+        self._quantidade = quantidade
+        self._memoria = memoryview(self._mmap)
+        inicio = _CABECALHO.size
+        fim = inicio + 4 * quantidade
+        self._ceps = self._memoria[inicio:fim].cast('I')
+        inicio, fim = fim, fim + 4 * (quantidade + 1)
+        self._posicoes = self._memoria[inicio:fim].cast('I')
+        self._registros = fim
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fechar()
+
+    def __len__(self):
+        return self._quantidade
+
+    def __contains__(self, numero):
+        try:
+            valor = int(normalizar_cep(numero))
+        except ValueError:
+            return False
+        i = bisect_left(self._ceps, valor)
+        return i < self._quantidade and self._ceps[i] == valor
+
+    def buscar(self, numero: str) -> List[Endereco]:
+        """
+        Busca os endereços do CEP no índice.
+
+        :param numero: Número do CEP, formatado ou não.
+        :return: Uma lista de :class:`~acbrlib_python.cep.modelos.Endereco`,
+            vazia se o CEP não estiver no índice.
+        :raise ValueError: Se o número não possuir oito digitos.
+        """
+        valor = int(normalizar_cep(numero))
+        inicio = bisect_left(self._ceps, valor)
+        fim = bisect_right(self._ceps, valor, inicio)
+        return [self._endereco(i) for i in range(inicio, fim)]
+
+    def fechar(self) -> None:
+        self._ceps.release()
+        self._posicoes.release()
+        self._memoria.release()
+        self._mmap.close()
+
+    def _endereco(self, i: int) -> Endereco:
+        inicio = self._registros + self._posicoes[i]
+        fim = self._registros + self._posicoes[i + 1]
+        valores = self._mmap[inicio:fim].decode('utf-8').split(_SEPARADOR)
+        return Endereco(*internar(valores))
+
+
+def construir_indice(
+        enderecos: Iterable[Endereco],
+        destino: str) -> int:
+    """
+    Constrói um arquivo de índice para :class:`IndiceCEP`. O arquivo é
+    gravado com um nome temporário e então renomeado, de modo que um
+    índice em uso possa ser substituído.
+
+    :param enderecos: Os endereços a serem indexados, em qualquer ordem.
+    :param destino: Caminho do arquivo do índice.
+    :return: A quantidade de endereços indexados.
+    """
+    registros = []
+    for endereco in enderecos:
+        valores = dataclasses.astuple(endereco)
+        if any(_SEPARADOR in v for v in valores):
+            raise ValueError(f'Endereco contem um caractere invalido: {endereco!r}')
+        registros.append((
+                int(normalizar_cep(endereco.cep)),
+                _SEPARADOR.join(valores).encode('utf-8'),
+            ))
+    registros.sort(key=lambda r: r[0])
+
+    ceps = array('I', (cep for cep, _ in registros))
+    posicoes = array('I', [0])
+    for _, dados in registros:
+        posicoes.append(posicoes[-1] + len(dados))
+    if ceps.itemsize != 4 or posicoes.itemsize != 4:
+        raise RuntimeError('array de inteiros sem sinal com tamanho inesperado')
+    if sys.byteorder != 'little':
+        ceps.byteswap()
+        posicoes.byteswap()
+
+    temporario = f'{destino}.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(_CABECALHO.pack(ASSINATURA, len(registros), 0))
+        ceps.tofile(f)
+        posicoes.tofile(f)
+        for _, dados in registros:
+            f.write(dados)
+    os.replace(temporario, destino)
+    return len(registros)
+
+
+def importar_csv(
+        arquivo: str,
+        destino: str,
+        delimitador: str = ',',
+        colunas: Optional[Mapping[str, str]] = None,
+        encoding: str = 'utf-8') -> int:
+    """
+    Constrói um arquivo de índice a partir de um arquivo CSV com cabeçalho.
+
+    :param arquivo: Caminho do arquivo CSV.
+    :param destino: Caminho do arquivo do índice.
+    :param delimitador: Delimitador de campos do arquivo CSV.
+    :param colunas: Opcional. Mapeia os atributos de
+        :class:`~acbrlib_python.cep.modelos.Endereco` para os nomes das
+        colunas no arquivo CSV. Por padrão, as colunas têm os mesmos nomes
+        dos atributos. Apenas a coluna do CEP é obrigatória; as colunas
+        ausentes resultam em atributos vazios.
+    :param encoding: Codificação do arquivo CSV.
+    :return: A quantidade de endereços indexados.
+    """
+    colunas = {**{c: c for c in CAMPOS}, **(colunas or {})}
+
+    def enderecos(leitor):
+        for linha in leitor:
+            valores = {c: (linha.get(colunas[c]) or '').strip() for c in CAMPOS}
+            try:
+                cep = normalizar_cep(valores['cep'])
+            except ValueError:
+                raise ValueError(
+                        f'CEP invalido na linha {leitor.line_num} '
+                        f'de {arquivo!r}: {valores["cep"]!r}'
+                    ) from None
+            valores['cep'] = f'{cep[:5]}-{cep[5:]}'
+            yield Endereco(**valores)
+
+    with open(arquivo, newline='', encoding=encoding) as f:
+        leitor = csv.DictReader(f, delimiter=delimitador)
+        return construir_indice(enderecos(leitor), destino)
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/lote.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from .impl import normalizar_cep
+from .modelos import Endereco
+from .modelos import EnderecoBatch
+
+Resultado = Tuple[str, Union[List[Endereco], Exception]]
+
+
+def buscar_varios_ceps(
+        buscar: Callable[[str], List[Endereco]],
+        numeros: Iterable[str],
+        trabalhadores: int = 1,
+        janela: Optional[int] = None) -> Iterator[Resultado]:
+    """
+    Busca vários números de CEP, produzindo os resultados à medida em que
+    as buscas terminam (não necessariamente na ordem dos números).
+
+    Os números são normalizados tal como em
+    :meth:`~acbrlib_python.cep.ACBrLibCEP.buscar_por_cep` e cada CEP é
+    buscado uma única vez, ainda que apareça várias vezes. Os números são
+    consumidos sob demanda: no máximo ``janela`` buscas ficam pendentes de
+    cada vez, de modo que ``numeros`` pode ser um gerador arbitrariamente
+    longo (as linhas de um arquivo, por exemplo).
+
+    :param buscar: Função que busca um CEP normalizado.
+    :param numeros: Números de CEP, formatados ou não.
+    :param trabalhadores: Quantidade de *threads* que executam as buscas.
+        Se for ``1``, as buscas são feitas na própria *thread* atual.
+    :param janela: Opcional. Quantidade máxima de buscas pendentes. Por
+        padrão, o dobro da quantidade de trabalhadores.
+
+    :return: Um iterador de tuplas contendo o CEP normalizado e a lista de
+        endereços resultante ou a exceção lançada pela busca. Números
+        inválidos resultam no número original e um ``ValueError``.
+    """
+    if trabalhadores == 1:
+        for cep in _normalizados(numeros):
+            if isinstance(cep, tuple):
+                yield cep
+                continue
+            try:
+                yield cep, buscar(cep)
+            except Exception as ex:
+                yield cep, ex
+        return
+
+    executor = ThreadPoolExecutor(
+            max_workers=trabalhadores,
+            thread_name_prefix='acbrlib-cep-lote'
+        )
+    try:
+        yield from em_paralelo(
+                lambda cep: executor.submit(buscar, cep),
+                numeros,
+                janela or 2 * trabalhadores
+            )
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ResultadosEmLote(Mapping):
+    """
+    Reúne os resultados de uma busca em lote (veja
+    :func:`buscar_varios_ceps`) num mapeamento dos CEPs para as suas listas
+    de endereços ou exceções, tal como ``dict(resultados)``, mas com os
+    endereços de todas as buscas guardados num único
+    :class:`~acbrlib_python.cep.modelos.EnderecoBatch`, em colunas, e os
+    objetos :class:`~acbrlib_python.cep.modelos.Endereco` criados apenas
+    quando cada resultado for acessado.
+
+    .. sourcecode:: python
+
+        resultados = ResultadosEmLote(pool.buscar_varios_ceps(numeros))
+        ufs = resultados.enderecos.coluna('uf')
+        enderecos = resultados['18270170']
+    """
+
+    __slots__ = ('_enderecos', '_intervalos', '_erros')
+
+    def __init__(self, resultados: Iterable[Resultado] = ()):
+        self._enderecos = EnderecoBatch()
+        self._intervalos: Dict[str, Tuple[int, int]] = {}
+        self._erros: Dict[str, Exception] = {}
+        for numero, resultado in resultados:
+            self.adicionar(numero, resultado)
+
+    def __getitem__(self, numero: str) -> Union[List[Endereco], Exception]:
+        erro = self._erros.get(numero)
+        if erro is not None:
+            return erro
+        inicio, fim = self._intervalos[numero]
+        return [self._enderecos[i] for i in range(inicio, fim)]
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._intervalos
+        yield from self._erros
+
+    def __len__(self):
+        return len(self._intervalos) + len(self._erros)
+
+    def __contains__(self, numero):
+        return numero in self._intervalos or numero in self._erros
+
+    def __repr__(self):
+        return (
+                f'<{self.__class__.__name__} com {len(self._intervalos)} '
+                f'buscas, {len(self._enderecos)} enderecos e '
+                f'{len(self._erros)} erros>'
+            )
+
+    @property
+    def enderecos(self) -> EnderecoBatch:
+        """Os endereços de todas as buscas bem sucedidas, na ordem em que
+        foram reunidos."""
+        return self._enderecos
+
+    @property
+    def erros(self) -> Dict[str, Exception]:
+        """As exceções das buscas que falharam, por número."""
+        return dict(self._erros)
+
+    def adicionar(self, numero: str, resultado: Union[List[Endereco], Exception]) -> None:
+        """Acrescenta um resultado, substituindo o resultado anterior do
+        mesmo número, se houver (os seus endereços não são descartados do
+        lote)."""
+        self._intervalos.pop(numero, None)
+        self._erros.pop(numero, None)
+        if isinstance(resultado, Exception):
+            self._erros[numero] = resultado
+        else:
+            inicio = len(self._enderecos)
+            self._enderecos.extend(resultado)
+            self._intervalos[numero] = (inicio, len(self._enderecos))
+
+
+def em_paralelo(
+        submeter: Callable[[str], Future],
+        numeros: Iterable[str],
+        janela: int) -> Iterator[Resultado]:
+    """
+    Como :func:`buscar_varios_ceps`, mas as buscas são submetidas a um
+    executor qualquer, através de ``submeter``, que deve resultar um
+    ``concurrent.futures.Future`` para cada CEP normalizado.
+    """
+    pendentes = {}
+    ceps = _normalizados(numeros)
+    esgotados = False
+    while pendentes or not esgotados:
+        while not esgotados and len(pendentes) < janela:
+            cep = next(ceps, None)
+            if cep is None:
+                esgotados = True
+            elif isinstance(cep, tuple):
+                yield cep
+            else:
+                pendentes[submeter(cep)] = cep
+        if not pendentes:
+            continue
+        concluidos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+        for futuro in concluidos:
+            cep = pendentes.pop(futuro)
+            ex = futuro.exception()
+            yield cep, (futuro.result() if ex is None else ex)
+
+
+def _normalizados(numeros: Iterable[str]) -> Iterator[Union[str, Resultado]]:
+    # produz os CEPs normalizados ainda não vistos ou, para os números
+    # inválidos, a tupla do resultado com o erro
+    vistos = set()
+    for numero in numeros:
+        try:
+            cep = normalizar_cep(numero)
+        except ValueError as ex:
+            yield numero, ex
+            continue
+        if cep not in vistos:
+            vistos.add(cep)
+            yield cep
@@ -17,9 +17,58 @@
 # limitations under the License.
 #
 
+import sys
+
+from array import array
+from collections.abc import Sequence
+from dataclasses import FrozenInstanceError
 from dataclasses import dataclass
+from dataclasses import fields
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+from typing import Union
+
+
+def _com_slots(cls):
+    """
+    Recria a *dataclass* com ``__slots__`` para os seus campos, dispensando
+    o ``__dict__`` de cada instância (equivalente a ``slots=True``,
+    disponível apenas a partir do Python 3.10).
+    """
+    campos = tuple(campo.name for campo in fields(cls))
+    atributos = dict(cls.__dict__)
+    atributos['__slots__'] = campos
+    for nome in campos + ('__dict__', '__weakref__'):
+        atributos.pop(nome, None)
+    novo = type(cls)(cls.__name__, cls.__bases__, atributos)
+    novo.__qualname__ = cls.__qualname__
+
+    # instâncias imutáveis com __slots__ não podem ser restauradas pelo
+    # pickle através de setattr
+    def __getstate__(self):
+        return tuple(getattr(self, nome) for nome in campos)
+
+    def __setstate__(self, estado):
+        for nome, valor in zip(campos, estado):
+            object.__setattr__(self, nome, valor)
+
+    # os métodos gerados pela dataclass referem-se à classe original
+    def __setattr__(self, nome, valor):
+        raise FrozenInstanceError(f'cannot assign to field {nome!r}')
 
+    def __delattr__(self, nome):
+        raise FrozenInstanceError(f'cannot delete field {nome!r}')
 
+    novo.__getstate__ = __getstate__
+    novo.__setstate__ = __setstate__
+    novo.__setattr__ = __setattr__
+    novo.__delattr__ = __delattr__
+    return novo
+
+
+@_com_slots
 @dataclass(frozen=True)
 class Endereco:
     tipo_logradouro: str
@@ -31,3 +80,166 @@ class Endereco:
     cep: str
     ibge_municipio: str
     ibge_uf: str
+
+
+CAMPOS = tuple(campo.name for campo in fields(Endereco))
+
+# atributos cujos valores se repetem muito entre endereços diferentes
+CAMPOS_REPETIDOS = (
+        'tipo_logradouro',
+        'bairro',
+        'municipio',
+        'uf',
+        'ibge_municipio',
+        'ibge_uf',
+    )
+
+_INDICES_REPETIDOS = tuple(CAMPOS.index(nome) for nome in CAMPOS_REPETIDOS)
+
+
+def internar(valores: List[str]) -> List[str]:
+    """
+    Substitui, na lista de valores dos atributos de um endereço (na ordem
+    dos atributos de :class:`Endereco`), os valores dos atributos que se
+    repetem muito (veja ``CAMPOS_REPETIDOS``) pelas suas versões internadas
+    (veja :func:`sys.intern`), de modo que todos os endereços em memória
+    compartilhem uma única instância de cada valor.
+
+    :return: A própria lista informada.
+    """
+    for i in _INDICES_REPETIDOS:
+        valores[i] = sys.intern(valores[i])
+    return valores
+
+
+class _ColunaCodificada(object):
+    """
+    Coluna de um :class:`EnderecoBatch` codificada em dicionário: cada
+    valor distinto é guardado uma única vez e cada linha guarda apenas o
+    código (um inteiro de 32 bits) do seu valor.
+    """
+
+    __slots__ = ('_codigos', '_valores', '_indices')
+
+    def __init__(self, valores: Iterable[str] = ()):
+        self._codigos = array('I')
+        self._valores = []
+        self._indices = {}
+        self.extend(valores)
+
+    def __len__(self):
+        return len(self._codigos)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self._valores[c] for c in self._codigos[indice]]
+        return self._valores[self._codigos[indice]]
+
+    def __iter__(self):
+        valores = self._valores
+        return (valores[c] for c in self._codigos)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def append(self, valor: str) -> None:
+        codigo = self._indices.get(valor)
+        if codigo is None:
+            codigo = self._indices[valor] = len(self._valores)
+            self._valores.append(sys.intern(valor))
+        self._codigos.append(codigo)
+
+    def extend(self, valores: Iterable[str]) -> None:
+        for valor in valores:
+            self.append(valor)
+
+    @property
+    def distintos(self) -> int:
+        return len(self._valores)
+
+
+class EnderecoBatch(Sequence):
+    """
+    Uma sequência de endereços armazenada em colunas, uma lista de valores
+    para cada atributo de :class:`Endereco`, adequada para grandes
+    quantidades de endereços (resultados de buscas em lote, por exemplo).
+    Os objetos :class:`Endereco` são criados apenas quando cada item for
+    acessado. As colunas dos atributos que se repetem muito (veja
+    ``CAMPOS_REPETIDOS``) são codificadas em dicionário: cada valor distinto
+    é guardado uma única vez.
+
+    .. sourcecode:: python
+
+        lote = EnderecoBatch(enderecos)
+        ufs = lote.coluna('uf')
+        primeiro = lote[0]  # um Endereco
+    """
+
+    __slots__ = ('_colunas',)
+
+    def __init__(self, enderecos: Iterable[Endereco] = ()):
+        self._colunas = tuple(
+                _ColunaCodificada() if nome in CAMPOS_REPETIDOS else []
+                for nome in CAMPOS
+            )
+        self.extend(enderecos)
+
+    @classmethod
+    def de_linhas(cls, linhas: Iterable[Tuple[str, ...]]) -> 'EnderecoBatch':
+        """
+        Cria um lote a partir de tuplas com os valores dos atributos, na
+        ordem dos atributos de :class:`Endereco`, sem criar objetos
+        intermediários.
+        """
+        lote = cls()
+        for linha in linhas:
+            lote.append_linha(linha)
+        return lote
+
+    def __len__(self):
+        return len(self._colunas[0])
+
+    def __getitem__(self, indice: Union[int, slice]):
+        if isinstance(indice, slice):
+            lote = self.__class__()
+            for destino, origem in zip(lote._colunas, self._colunas):
+                destino.extend(origem[indice])
+            return lote
+        return Endereco(*[coluna[indice] for coluna in self._colunas])
+
+    def __iter__(self) -> Iterator[Endereco]:
+        for linha in zip(*self._colunas):
+            yield Endereco(*linha)
+
+    def __eq__(self, other):
+        if isinstance(other, EnderecoBatch):
+            return all(a == b for a, b in zip(self._colunas, other._colunas))
+        return NotImplemented
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} com {len(self)} enderecos>'
+
+    def append(self, endereco: Endereco) -> None:
+        for nome, coluna in zip(CAMPOS, self._colunas):
+            coluna.append(getattr(endereco, nome))
+
+    def append_linha(self, linha: Tuple[str, ...]) -> None:
+        if len(linha) != len(CAMPOS):
+            raise ValueError(f'Linha com quantidade inesperada de valores: {linha!r}')
+        for valor, coluna in zip(linha, self._colunas):
+            coluna.append(valor)
+
+    def extend(self, enderecos: Iterable[Endereco]) -> None:
+        for endereco in enderecos:
+            self.append(endereco)
+
+    def coluna(self, nome: str) -> Tuple[str, ...]:
+        """Resulta os valores de um atributo, para todos os endereços."""
+        return tuple(self._colunas[CAMPOS.index(nome)])
+
+    def linha(self, indice: int) -> Tuple[str, ...]:
+        """Resulta os valores dos atributos de um endereço, sem criá-lo."""
+        return tuple(coluna[indice] for coluna in self._colunas)
+
+    def enderecos(self) -> List[Endereco]:
+        return list(self)
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/pool.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import shutil
+import tempfile
+
+from concurrent.futures import TimeoutError
+from functools import partial
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from ..constantes import AUTO
+from ..excecoes import ACBrLibPoolEsgotado
+from ..pool import ACBrLibPool
+from ..pool import copiar_biblioteca
+from ..proto import discard_shared_library
+from ..rastreamento import ENDERECOS
+from ..rastreamento import ORIGEM
+from ..rastreamento import Rastreador
+from ..rastreamento import padrao as rastreador_padrao
+from ..rastreamento import span
+
+from .cache import Cache
+from .coalescencia import Coalescedor
+from .impl import ACBrLibCEP
+from .impl import Aquecimento
+from .impl import chave_logradouro
+from .impl import iter_processar_resposta
+from .impl import normalizar_cep
+from .lote import Resultado
+from .lote import buscar_varios_ceps
+from .modelos import Endereco
+
+logger = logging.getLogger(__name__)
+
+
+class ACBrLibCEPPool(ACBrLibPool):
+    """
+    Um *pool* de instâncias de :class:`~acbrlib_python.cep.ACBrLibCEP`
+    inicializadas, que pode ser compartilhado entre *threads*. Os métodos de
+    busca têm a mesma assinatura dos métodos de ``ACBrLibCEP`` e são
+    distribuídos entre as instâncias do *pool*:
+
+    .. sourcecode:: python
+
+        with ACBrLibCEPPool('/caminho/para/libacbrcep64.so', tamanho=4) as pool:
+            enderecos = pool.buscar_por_cep('18270170')
+
+    As versões *single-thread* da ACBrLib mantêm um estado global. Por isso,
+    por padrão, cada instância carrega sua própria cópia do arquivo da
+    biblioteca (veja :func:`~acbrlib_python.pool.copiar_biblioteca`).
+
+    :param caminho_biblioteca: Caminho para a biblioteca.
+    :param tamanho: Quantidade de instâncias.
+    :param convencao_chamada: Convenção de chamada.
+    :param arq_config: Arquivo de configuração usado na inicialização.
+    :param chave_crypt: Chave de criptografia usada na inicialização.
+    :param timeout: Opcional. Tempo máximo de espera padrão, em segundos,
+        para que uma instância fique disponível.
+    :param copiar: Se cada instância deve carregar uma cópia da biblioteca.
+        Desligue apenas se a biblioteca puder ser usada simultaneamente a
+        partir de um mesmo caminho. Neste caso, a instância que substitui
+        uma instância com problemas passa a usar a biblioteca compartilhada
+        sem inicializá-la novamente, exceto se nenhuma outra instância a
+        estiver usando.
+    :param diretorio: Opcional. Diretório onde as cópias da biblioteca serão
+        criadas. Se não for informado, será usado um diretório temporário,
+        removido quando o *pool* for fechado.
+    :param cache: Opcional. Um :class:`~acbrlib_python.cep.cache.Cache`
+        consultado antes que uma instância seja emprestada.
+    :param indice: Opcional. Um :class:`~acbrlib_python.cep.indice.IndiceCEP`
+        consultado antes do cache e da biblioteca.
+    :param aquecer: Se as instâncias devem ser inicializadas através de
+        :meth:`ACBrLibCEP.aquecer` (veja :attr:`aquecimentos`).
+    :param cep_canario: Opcional. CEP buscado por cada instância ao ser
+        aquecida; implica ``aquecer``.
+    :param coalescer: Se buscas idênticas simultâneas devem aguardar por uma
+        única chamada à biblioteca (veja
+        :class:`~acbrlib_python.cep.coalescencia.Coalescedor`).
+    :param valores_config: Opcional. Valores de configuração (tuplas de
+        sessão, chave e valor) gravados em cada instância logo após a
+        inicialização, como ``[('CEP', 'WebService', '10')]``.
+    """
+
+    def __init__(
+            self,
+            caminho_biblioteca: str,
+            tamanho: int = 4,
+            convencao_chamada: str = AUTO,
+            arq_config: str = '',
+            chave_crypt: str = '',
+            timeout: Optional[float] = None,
+            copiar: bool = True,
+            diretorio: Optional[str] = None,
+            cache: Optional[Cache] = None,
+            indice=None,
+            aquecer: bool = False,
+            cep_canario: Optional[str] = None,
+            coalescer: bool = True,
+            valores_config: Optional[Iterable[Tuple[str, str, str]]] = None):
+        self._cache = cache
+        self._indice = indice
+        self._coalescedor = Coalescedor() if coalescer else None
+        self._rastreador = rastreador_padrao()
+        self._aquecimentos = [None] * tamanho
+        self._diretorio_temporario = None
+        self._copias = []
+        self._convencao_chamada = convencao_chamada
+        if copiar:
+            if diretorio is None:
+                diretorio = tempfile.mkdtemp(prefix='acbrlib-')
+                self._diretorio_temporario = diretorio
+            caminhos = copiar_biblioteca(caminho_biblioteca, tamanho, diretorio)
+            self._copias = caminhos
+        else:
+            caminhos = [caminho_biblioteca] * tamanho
+        valores_config = list(valores_config or [])
+        criadas = set()
+
+        def fabrica(indice):
+            cep = ACBrLibCEP.usar(
+                    caminhos[indice],
+                    convencao_chamada=convencao_chamada
+                )
+            try:
+                if valores_config:
+                    # gravados antes do aquecimento, que então lê a
+                    # configuração e busca o CEP canário já com eles
+                    cep.inicializar(arq_config, chave_crypt)
+                    for sessao, chave, valor in valores_config:
+                        cep.config_gravar_valor(sessao, chave, valor)
+                if aquecer or cep_canario:
+                    self._aquecimentos[indice] = cep.aquecer(
+                            arq_config,
+                            chave_crypt,
+                            cep_canario=cep_canario
+                        )
+                elif not cep.inicializada:
+                    cep.inicializar(arq_config, chave_crypt)
+            except BaseException:
+                if cep.inicializada:
+                    cep.finalizar()
+                raise
+            if indice in criadas and cep.biblioteca.users > 1:
+                # a instância substituída (veja ACBrLibPool.devolver) já foi
+                # finalizada, mas a biblioteca continua em uso pelas demais
+                # instâncias e não pode ser inicializada novamente enquanto
+                # elas a estiverem usando
+                logger.warning(
+                        'instancia %d substituida sem reinicializar a '
+                        'biblioteca compartilhada %r',
+                        indice,
+                        caminhos[indice]
+                    )
+            criadas.add(indice)
+            return cep
+
+        super().__init__(fabrica, tamanho, timeout=timeout)
+
+    @property
+    def cache(self) -> Optional[Cache]:
+        return self._cache
+
+    @property
+    def coalescedor(self) -> Optional[Coalescedor]:
+        return self._coalescedor
+
+    @property
+    def rastreador(self) -> Optional[Rastreador]:
+        """
+        O :class:`~acbrlib_python.rastreamento.Rastreador` das buscas feitas
+        através do *pool*, inclusive das resolvidas pelo índice ou pelo
+        *cache*, ou ``None``. Por padrão, o rastreador ativo quando o *pool*
+        foi criado. Os *spans* de cada instância (veja
+        :attr:`ACBrLibCEP.rastreador
+        <acbrlib_python.proto.ACBrLibReferencia.rastreador>`) são filhos
+        destes.
+        """
+        return self._rastreador
+
+    @rastreador.setter
+    def rastreador(self, value: Optional[Rastreador]):
+        self._rastreador = value
+
+    @property
+    def aquecimentos(self) -> List[Optional[Aquecimento]]:
+        """O resultado do aquecimento de cada instância (o mais recente,
+        para as instâncias substituídas), se tiverem sido aquecidas."""
+        return list(self._aquecimentos)
+
+    @classmethod
+    def usando(cls, caminho_biblioteca, **kwargs):
+        """Equivalente a :meth:`ACBrLibCEP.usando`; o *pool* é um
+        *context manager* que fecha suas instâncias ao final do bloco."""
+        return cls(caminho_biblioteca, **kwargs)
+
+    def fechar(self) -> None:
+        super().fechar()
+        for caminho in self._copias:
+            discard_shared_library(caminho, self._convencao_chamada)
+        self._copias = []
+        if self._diretorio_temporario:
+            shutil.rmtree(self._diretorio_temporario, ignore_errors=True)
+            self._diretorio_temporario = None
+
+    def buscar_por_cep(self, numero: str, timeout: Optional[float] = None) -> List[Endereco]:
+        """
+        Veja :meth:`ACBrLibCEP.buscar_por_cep`.
+
+        :raise ACBrLibPoolEsgotado: Se nenhuma instância ficar disponível
+            dentro do tempo de espera ou se a mesma busca, já em andamento,
+            não terminar dentro dele.
+        """
+        with span(self._rastreador, 'ACBrLibCEPPool.buscar_por_cep') as s:
+            cep = normalizar_cep(numero)
+            if self._indice is not None:
+                enderecos = self._indice.buscar(cep)
+                if enderecos:
+                    s.definir_atributo(ORIGEM, 'indice')
+                    s.definir_atributo(ENDERECOS, len(enderecos))
+                    return enderecos
+
+            def buscar():
+                s.definir_atributo(ORIGEM, 'biblioteca')
+                with self.emprestar(timeout=timeout) as instancia:
+                    return instancia.buscar_por_cep(cep)
+            enderecos = self._buscar(s, cep, buscar, timeout)
+            s.definir_atributo(ENDERECOS, len(enderecos))
+            return enderecos
+
+    def buscar_varios_ceps(
+            self,
+            numeros: Iterable[str],
+            trabalhadores: Optional[int] = None,
+            janela: Optional[int] = None,
+            timeout: Optional[float] = None) -> Iterator[Resultado]:
+        """
+        Busca vários números de CEP, distribuindo as buscas entre as
+        instâncias do *pool*. Os resultados são produzidos à medida em que
+        as buscas terminam. Veja
+        :func:`~acbrlib_python.cep.lote.buscar_varios_ceps`.
+
+        :param trabalhadores: Opcional. Quantidade de *threads* que executam
+            as buscas. Por padrão, o tamanho do *pool*.
+        :param janela: Opcional. Quantidade máxima de buscas pendentes.
+
+        Para reunir todos os resultados com os endereços guardados em
+        colunas, use :class:`~acbrlib_python.cep.lote.ResultadosEmLote`:
+
+        .. sourcecode:: python
+
+            resultados = ResultadosEmLote(pool.buscar_varios_ceps(numeros))
+        """
+        return buscar_varios_ceps(
+                partial(self.buscar_por_cep, timeout=timeout),
+                numeros,
+                trabalhadores=trabalhadores or self.tamanho,
+                janela=janela
+            )
+
+    def buscar_por_logradouro(
+            self,
+            tipo_logradouro='',
+            logradouro='',
+            bairro='',
+            municipio='',
+            uf='',
+            timeout: Optional[float] = None) -> List[Endereco]:
+        """
+        Veja :meth:`ACBrLibCEP.buscar_por_logradouro`.
+
+        :raise ACBrLibPoolEsgotado: Se nenhuma instância ficar disponível
+            dentro do tempo de espera ou se a mesma busca, já em andamento,
+            não terminar dentro dele.
+        """
+        argumentos = (tipo_logradouro, logradouro, bairro, municipio, uf)
+
+        chave = chave_logradouro(*argumentos)
+
+        with span(self._rastreador, 'ACBrLibCEPPool.buscar_por_logradouro') as s:
+            def buscar():
+                s.definir_atributo(ORIGEM, 'biblioteca')
+                with self.emprestar(timeout=timeout) as cep:
+                    return cep.buscar_por_logradouro(*argumentos)
+            enderecos = self._buscar(s, chave, buscar, timeout)
+            s.definir_atributo(ENDERECOS, len(enderecos))
+            return enderecos
+
+    def iter_buscar_por_logradouro(
+            self,
+            tipo_logradouro='',
+            logradouro='',
+            bairro='',
+            municipio='',
+            uf='',
+            timeout: Optional[float] = None) -> Iterator[Endereco]:
+        """
+        Veja :meth:`ACBrLibCEP.iter_buscar_por_logradouro`. A instância é
+        emprestada apenas durante a chamada à biblioteca; a resposta é
+        processada à medida em que for consumida.
+        """
+        argumentos = (tipo_logradouro, logradouro, bairro, municipio, uf)
+        with span(self._rastreador, 'ACBrLibCEPPool.iter_buscar_por_logradouro') as s:
+            enderecos = None
+            if self._cache is not None:
+                enderecos = self._cache.obter(chave_logradouro(*argumentos))
+            if enderecos is None:
+                s.definir_atributo(ORIGEM, 'biblioteca')
+                with self.emprestar(timeout=timeout) as cep:
+                    resposta = cep._resposta_busca_por_logradouro(*argumentos)
+            else:
+                s.definir_atributo(ORIGEM, 'cache')
+                s.definir_atributo(ENDERECOS, len(enderecos))
+        # veja ACBrLibCEP.iter_buscar_por_logradouro
+        if enderecos is not None:
+            yield from enderecos
+        else:
+            yield from iter_processar_resposta(resposta)
+
+    def _buscar(self, s, chave, buscar, timeout):
+        # o resultado vem do cache (se houver), de uma busca idêntica em
+        # andamento ou da própria busca, que redefine a origem no span
+        buscar = self._coalescida(s, chave, buscar, timeout)
+        if self._cache is not None:
+            s.definir_atributo(ORIGEM, 'cache')
+            return self._cache.obter_ou_buscar(chave, buscar)
+        return buscar()
+
+    def _coalescida(self, s, chave, buscar, timeout):
+        if self._coalescedor is None:
+            return buscar
+        timeout = self._timeout if timeout is None else timeout
+
+        def coalescida():
+            s.definir_atributo(ORIGEM, 'coalescida')
+            # quem aguarda uma busca em andamento respeita o próprio tempo
+            # de espera, não o de quem a iniciou
+            try:
+                return self._coalescedor.executar(chave, buscar, timeout=timeout)
+            except TimeoutError:
+                raise ACBrLibPoolEsgotado(
+                        f'A busca em andamento para {chave!r} nao terminou '
+                        f'em {timeout!r} segundos'
+                    ) from None
+        return coalescida
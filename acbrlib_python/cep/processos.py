@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/processos.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import operator
+import os
+
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from ..constantes import AUTO
+
+from .impl import ACBrLibCEP
+from .lote import Resultado
+from .lote import em_paralelo
+from .modelos import CAMPOS
+from .modelos import Endereco
+from .modelos import internar
+
+_valores = operator.attrgetter(*CAMPOS)
+
+# instância da ACBrLibCEP do processo trabalhador
+_cep = None
+
+
+class ACBrLibCEPExecutor(object):
+    """
+    Distribui buscas entre processos trabalhadores, cada um com sua própria
+    instância inicializada da :class:`~acbrlib_python.cep.ACBrLibCEP`. Ao
+    contrário de :class:`~acbrlib_python.cep.ACBrLibCEPPool`, cada processo
+    possui seu próprio espaço de endereçamento e, portanto, seu próprio
+    estado global da biblioteca:
+
+    .. sourcecode:: python
+
+        with ACBrLibCEPExecutor.usando('/caminho/para/libacbrcep64.so') as executor:
+            for enderecos in executor.mapear(ceps):
+                ...
+
+    Os endereços retornam dos processos trabalhadores como tuplas de valores
+    e são convertidos para :class:`~acbrlib_python.cep.modelos.Endereco` no
+    processo principal.
+
+    :param caminho_biblioteca: Caminho para a biblioteca.
+    :param processos: Opcional. Quantidade de processos trabalhadores. Se
+        não for informado, será usada a quantidade de processadores.
+    :param convencao_chamada: Convenção de chamada.
+    :param arq_config: Arquivo de configuração usado na inicialização.
+    :param chave_crypt: Chave de criptografia usada na inicialização.
+    :param contexto: Opcional. Contexto de ``multiprocessing`` usado para
+        iniciar os processos trabalhadores.
+    """
+
+    def __init__(
+            self,
+            caminho_biblioteca: str,
+            processos: Optional[int] = None,
+            convencao_chamada: str = AUTO,
+            arq_config: str = '',
+            chave_crypt: str = '',
+            contexto=None):
+        self._processos = processos or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(
+                max_workers=self._processos,
+                mp_context=contexto,
+                initializer=_inicializar_trabalhador,
+                initargs=(
+                        caminho_biblioteca,
+                        convencao_chamada,
+                        arq_config,
+                        chave_crypt,
+                    )
+            )
+
+    @classmethod
+    def usando(cls, caminho_biblioteca, **kwargs):
+        """O executor é um *context manager* que encerra os processos
+        trabalhadores (finalizando a biblioteca) ao final do bloco."""
+        return cls(caminho_biblioteca, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.finalizar()
+
+    @property
+    def processos(self) -> int:
+        """Quantidade de processos trabalhadores."""
+        return self._processos
+
+    def submeter_busca_por_cep(self, numero: str) -> 'Future[List[Endereco]]':
+        """
+        Submete uma busca pelo número do CEP, sem aguardar o resultado.
+
+        :return: Um ``concurrent.futures.Future`` cujo resultado será uma
+            lista de :class:`~acbrlib_python.cep.modelos.Endereco`.
+        """
+        futuro = Future()
+        interno = self._executor.submit(_buscar_por_cep, numero)
+        interno.add_done_callback(lambda f: _transferir(f, futuro))
+        # cancelar a busca ainda não iniciada a retira da fila
+        futuro.add_done_callback(lambda f: f.cancelled() and interno.cancel())
+        return futuro
+
+    def buscar_por_cep(self, numero: str) -> List[Endereco]:
+        """Veja :meth:`ACBrLibCEP.buscar_por_cep`."""
+        return _enderecos(self._executor.submit(_buscar_por_cep, numero).result())
+
+    def buscar_por_logradouro(
+            self,
+            tipo_logradouro='',
+            logradouro='',
+            bairro='',
+            municipio='',
+            uf='') -> List[Endereco]:
+        """Veja :meth:`ACBrLibCEP.buscar_por_logradouro`."""
+        futuro = self._executor.submit(
+                _buscar_por_logradouro,
+                tipo_logradouro,
+                logradouro,
+                bairro,
+                municipio,
+                uf
+            )
+        return _enderecos(futuro.result())
+
+    def mapear(
+            self,
+            numeros: Iterable[str],
+            tamanho_lote: int = 16) -> Iterator[List[Endereco]]:
+        """
+        Busca cada um dos números de CEP, distribuindo as buscas em lotes
+        entre os processos trabalhadores. Os resultados são produzidos na
+        mesma ordem dos números informados.
+
+        :param numeros: Números de CEP.
+        :param tamanho_lote: Quantidade de buscas enviadas de uma só vez a
+            um processo trabalhador.
+
+        :raise: A exceção da primeira busca que falhar é relançada quando o
+            seu resultado for alcançado.
+        """
+        resultados = self._executor.map(
+                _buscar_por_cep,
+                numeros,
+                chunksize=tamanho_lote
+            )
+        for valores in resultados:
+            yield _enderecos(valores)
+
+    def buscar_varios_ceps(
+            self,
+            numeros: Iterable[str],
+            janela: Optional[int] = None) -> Iterator[Resultado]:
+        """
+        Busca vários números de CEP, sem repetir os CEPs já buscados,
+        distribuindo as buscas entre os processos trabalhadores. Os
+        resultados são produzidos à medida em que as buscas terminam. Veja
+        :func:`~acbrlib_python.cep.lote.buscar_varios_ceps`.
+
+        :param janela: Opcional. Quantidade máxima de buscas pendentes. Por
+            padrão, o dobro da quantidade de processos trabalhadores.
+        """
+        if janela is None:
+            janela = 2 * self._processos
+        return em_paralelo(self.submeter_busca_por_cep, numeros, janela)
+
+    def finalizar(self, aguardar: bool = True) -> None:
+        """
+        Encerra os processos trabalhadores. Cada processo finaliza a sua
+        instância da biblioteca ao encerrar.
+        """
+        self._executor.shutdown(wait=aguardar)
+
+
+def _enderecos(valores: List[Tuple[str, ...]]) -> List[Endereco]:
+    return [Endereco(*internar(list(v))) for v in valores]
+
+
+def _transferir(origem: Future, destino: Future) -> None:
+    if origem.cancelled():
+        destino.cancel()
+        return
+    # a partir daqui o destino não pode mais ser cancelado (se ainda não
+    # foi), de modo que o resultado sempre pode ser definido
+    if not destino.set_running_or_notify_cancel():
+        return
+    ex = origem.exception()
+    if ex is not None:
+        destino.set_exception(ex)
+    else:
+        destino.set_result(_enderecos(origem.result()))
+
+
+def _inicializar_trabalhador(caminho, convencao, arq_config, chave_crypt):
+    global _cep
+    _cep = ACBrLibCEP.usar(caminho, convencao_chamada=convencao)
+    _cep.inicializar(arq_config, chave_crypt)
+    # executado quando o processo trabalhador encerra normalmente
+    util.Finalize(None, _finalizar_trabalhador, exitpriority=10)
+
+
+def _finalizar_trabalhador():
+    global _cep
+    if _cep is not None:
+        _cep.finalizar()
+        _cep = None
+
+
+def _buscar_por_cep(numero):
+    return [_valores(e) for e in _cep.buscar_por_cep(numero)]
+
+
+def _buscar_por_logradouro(*args):
+    return [_valores(e) for e in _cep.buscar_por_logradouro(*args)]
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/cep/roteador.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Roteamento de buscas entre vários provedores (os serviços de consulta
+``CEP_WS_*``, veja :mod:`acbrlib_python.cep.constantes`). Como uma
+instância da biblioteca é configurada com um único serviço de cada vez, o
+roteador mantém uma fonte (geralmente um
+:class:`~acbrlib_python.cep.ACBrLibCEPPool`) para cada provedor:
+
+.. sourcecode:: python
+
+    with ACBrLibCEPRoteador.usando(
+            '/caminho/para/libacbrcep64.so',
+            provedores=[CEP_WS_VIACEP, CEP_WS_CORREIOS, CEP_WS_CEPABERTO],
+            hedge=True) as roteador:
+        enderecos = roteador.buscar_por_cep('18270170')
+"""
+
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Optional
+
+from ..constantes import AUTO
+
+from .impl import normalizar_cep
+from .modelos import Endereco
+from .pool import ACBrLibCEPPool
+
+
+@dataclass
+class EstatisticasProvedor:
+    """
+    Estado de um provedor. As latências (em segundos, apenas das buscas bem
+    sucedidas) e a taxa de erros consideram as últimas buscas (veja o
+    parâmetro ``janela`` de :class:`ACBrLibCEPRoteador`).
+    """
+    provedor: Hashable
+    chamadas: int = 0
+    erros: int = 0
+    latencia: Optional[float] = None
+    latencia_p95: Optional[float] = None
+    taxa_erros: float = 0.0
+    suspenso: bool = False
+
+
+class _Provedor(object):
+
+    __slots__ = (
+            'provedor',
+            'fonte',
+            'latencias',
+            'custos',
+            'falhas',
+            'chamadas',
+            'erros',
+            'suspenso_ate',
+        )
+
+    def __init__(self, provedor, fonte, janela):
+        self.provedor = provedor
+        self.fonte = fonte
+        self.latencias = deque(maxlen=janela)
+        self.custos = deque(maxlen=janela)
+        self.falhas = deque(maxlen=janela)
+        self.chamadas = 0
+        self.erros = 0
+        self.suspenso_ate = 0.0
+
+    def latencia(self, percentil: float) -> Optional[float]:
+        if not self.latencias:
+            return None
+        latencias = sorted(self.latencias)
+        return latencias[min(len(latencias) - 1, int(percentil * len(latencias)))]
+
+    def taxa_erros(self) -> float:
+        return sum(self.falhas) / len(self.falhas) if self.falhas else 0.0
+
+    def classificacao(self):
+        # menor taxa de erros primeiro e, entre taxas iguais, os provedores
+        # com amostras antes dos ainda desconhecidos e a menor mediana dos
+        # custos (latências, com as falhas contando como penalidade)
+        if not self.custos:
+            return (0.0, True, 0.0)
+        custos = sorted(self.custos)
+        return (self.taxa_erros(), False, custos[len(custos) // 2])
+
+
+class ACBrLibCEPRoteador(object):
+    """
+    Distribui as buscas entre os provedores: cada busca é enviada ao
+    provedor saudável com a menor taxa de erros recente e, entre taxas
+    iguais, ao mais rápido, pela mediana das latências recentes, em que
+    cada falha conta como uma latência de ``penalidade`` segundos.
+    Provedores ainda sem buscas são usados depois dos que já responderam
+    sem erros, na ordem em que foram informados. Se a busca falhar, ela é
+    repetida no próximo provedor, até que todos tenham falhado.
+
+    Um provedor cuja taxa de erros atingir ``limite_erros`` é suspenso por
+    ``suspensao`` segundos: durante esse tempo, ele só é usado se todos os
+    provedores saudáveis falharem.
+
+    Com ``hedge``, se o provedor escolhido não responder dentro do
+    percentil ``percentil`` das suas latências recentes, a mesma busca é
+    enviada também ao próximo provedor e prevalece a primeira resposta bem
+    sucedida. A busca mais lenta não é interrompida (uma chamada à
+    biblioteca não pode ser), mas o seu resultado é descartado.
+
+    Pode ser compartilhado entre *threads*, desde que as fontes também
+    possam (como ``ACBrLibCEPPool``).
+
+    :param fontes: Mapeamento dos provedores para as suas fontes, objetos
+        com os métodos ``buscar_por_cep`` e ``buscar_por_logradouro``.
+    :param hedge: Se buscas lentas devem ser enviadas também ao próximo
+        provedor.
+    :param percentil: Percentil das latências do provedor, entre 0 e 1,
+        usado como prazo para o *hedge*.
+    :param janela: Quantidade de buscas recentes consideradas nas latências
+        e na taxa de erros de cada provedor.
+    :param limite_erros: Taxa de erros, entre 0 e 1, a partir da qual o
+        provedor é suspenso.
+    :param minimo_amostras: Quantidade mínima de buscas recentes para que um
+        provedor seja suspenso ou tenha um prazo para o *hedge*.
+    :param suspensao: Tempo de suspensão, em segundos.
+    :param penalidade: Latência, em segundos, atribuída a uma busca que
+        falhou (ou o tempo que ela levou, se maior) ao classificar os
+        provedores.
+    :param trabalhadores: Opcional. Quantidade de *threads* que executam as
+        buscas quando há *hedge*. Por padrão, quatro por provedor.
+    :param relogio: Função que resulta o tempo atual, em segundos, usada
+        para as suspensões.
+    """
+
+    def __init__(
+            self,
+            fontes: Mapping[Hashable, Any],
+            hedge: bool = False,
+            percentil: float = 0.95,
+            janela: int = 100,
+            limite_erros: float = 0.5,
+            minimo_amostras: int = 10,
+            suspensao: float = 30.0,
+            penalidade: float = 5.0,
+            trabalhadores: Optional[int] = None,
+            relogio: Callable[[], float] = time.monotonic):
+        if not fontes:
+            raise ValueError('Nenhum provedor informado')
+        if not 0 < percentil <= 1:
+            raise ValueError(f'Percentil invalido: {percentil!r}')
+        self._provedores = [_Provedor(p, f, janela) for p, f in fontes.items()]
+        self._hedge = hedge
+        self._percentil = percentil
+        self._limite_erros = limite_erros
+        self._minimo_amostras = minimo_amostras
+        self._suspensao = suspensao
+        self._penalidade = penalidade
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._hedges = 0
+        self._fontes_proprias = False
+        self._executor = None
+        if hedge:
+            self._executor = ThreadPoolExecutor(
+                    max_workers=trabalhadores or 4 * len(self._provedores),
+                    thread_name_prefix='acbrlib-cep-roteador'
+                )
+
+    @classmethod
+    def usando(
+            cls,
+            caminho_biblioteca: str,
+            provedores: Iterable[int],
+            tamanho: int = 1,
+            convencao_chamada: str = AUTO,
+            arq_config: str = '',
+            chave_crypt: str = '',
+            **kwargs) -> 'ACBrLibCEPRoteador':
+        """
+        Cria um roteador com um :class:`~acbrlib_python.cep.ACBrLibCEPPool`
+        (com ``tamanho`` instâncias, cada uma com a sua cópia da
+        biblioteca) configurado para cada um dos ``provedores`` (constantes
+        ``CEP_WS_*``). Os *pools* são fechados junto com o roteador, que é
+        um *context manager*. Os demais argumentos são os de
+        :class:`ACBrLibCEPRoteador`.
+        """
+        fontes = {}
+        try:
+            for provedor in provedores:
+                fontes[provedor] = ACBrLibCEPPool(
+                        caminho_biblioteca,
+                        tamanho=tamanho,
+                        convencao_chamada=convencao_chamada,
+                        arq_config=arq_config,
+                        chave_crypt=chave_crypt,
+                        valores_config=[('CEP', 'WebService', str(provedor))]
+                    )
+            roteador = cls(fontes, **kwargs)
+        except BaseException:
+            for fonte in fontes.values():
+                fonte.fechar()
+            raise
+        roteador._fontes_proprias = True
+        return roteador
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fechar()
+
+    @property
+    def fontes(self) -> Dict[Hashable, Any]:
+        return {p.provedor: p.fonte for p in self._provedores}
+
+    @property
+    def hedges(self) -> int:
+        """Quantidade de buscas enviadas também a um segundo provedor."""
+        return self._hedges
+
+    def estatisticas(self) -> Dict[Hashable, EstatisticasProvedor]:
+        """Resulta o estado atual de cada provedor."""
+        with self._lock:
+            agora = self._relogio()
+            return {
+                    p.provedor: EstatisticasProvedor(
+                            provedor=p.provedor,
+                            chamadas=p.chamadas,
+                            erros=p.erros,
+                            latencia=p.latencia(0.5),
+                            latencia_p95=p.latencia(self._percentil),
+                            taxa_erros=p.taxa_erros(),
+                            suspenso=p.suspenso_ate > agora
+                        )
+                    for p in self._provedores
+                }
+
+    def fechar(self) -> None:
+        """
+        Aguarda as buscas em andamento e encerra o roteador. As fontes são
+        fechadas apenas se tiverem sido criadas por :meth:`usando`.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        if self._fontes_proprias:
+            for p in self._provedores:
+                p.fonte.fechar()
+            self._fontes_proprias = False
+
+    def buscar_por_cep(self, numero: str) -> List[Endereco]:
+        """
+        Veja :meth:`ACBrLibCEP.buscar_por_cep`.
+
+        :raise: A exceção do último provedor, se todos falharem.
+        """
+        return self._buscar('buscar_por_cep', normalizar_cep(numero))
+
+    def buscar_por_logradouro(
+            self,
+            tipo_logradouro='',
+            logradouro='',
+            bairro='',
+            municipio='',
+            uf='') -> List[Endereco]:
+        """
+        Veja :meth:`ACBrLibCEP.buscar_por_logradouro`.
+
+        :raise: A exceção do último provedor, se todos falharem.
+        """
+        return self._buscar(
+                'buscar_por_logradouro',
+                tipo_logradouro=tipo_logradouro,
+                logradouro=logradouro,
+                bairro=bairro,
+                municipio=municipio,
+                uf=uf
+            )
+
+    def _buscar(self, metodo, *args, **kwargs):
+        candidatos = self._candidatos()
+        if self._hedge and len(candidatos) > 1:
+            return self._buscar_com_hedge(candidatos, metodo, args, kwargs)
+        ultima = None
+        for provedor in candidatos:
+            try:
+                return self._chamar(provedor, metodo, args, kwargs)
+            except Exception as ex:
+                ultima = ex
+        raise ultima
+
+    def _buscar_com_hedge(self, candidatos, metodo, args, kwargs):
+        restantes = iter(candidatos)
+        pendentes = {}
+
+        def submeter():
+            provedor = next(restantes, None)
+            if provedor is not None:
+                futuro = self._executor.submit(self._chamar, provedor, metodo, args, kwargs)
+                pendentes[futuro] = provedor
+
+        submeter()
+        with self._lock:
+            prazo = self._prazo(candidatos[0])
+        ultima = None
+        while pendentes:
+            concluidos, _ = wait(pendentes, timeout=prazo, return_when=FIRST_COMPLETED)
+            if not concluidos:
+                # o provedor escolhido excedeu o prazo; a mesma busca é
+                # enviada ao próximo e prevalece a primeira resposta
+                with self._lock:
+                    self._hedges += 1
+                submeter()
+            prazo = None
+            for futuro in concluidos:
+                del pendentes[futuro]
+                if futuro.exception() is None:
+                    return futuro.result()
+                ultima = futuro.exception()
+            if not pendentes:
+                submeter()
+        raise ultima
+
+    def _candidatos(self) -> List[_Provedor]:
+        with self._lock:
+            agora = self._relogio()
+            saudaveis = sorted(
+                    (p for p in self._provedores if p.suspenso_ate <= agora),
+                    key=_Provedor.classificacao
+                )
+            suspensos = sorted(
+                    (p for p in self._provedores if p.suspenso_ate > agora),
+                    key=lambda p: p.suspenso_ate
+                )
+        return saudaveis + suspensos
+
+    def _prazo(self, provedor: _Provedor) -> Optional[float]:
+        if len(provedor.latencias) < self._minimo_amostras:
+            return None
+        return provedor.latencia(self._percentil)
+
+    def _chamar(self, provedor: _Provedor, metodo, args, kwargs):
+        inicio = time.perf_counter()
+        try:
+            resultado = getattr(provedor.fonte, metodo)(*args, **kwargs)
+        except Exception:
+            self._registrar(provedor, time.perf_counter() - inicio, falhou=True)
+            raise
+        self._registrar(provedor, time.perf_counter() - inicio)
+        return resultado
+
+    def _registrar(self, provedor: _Provedor, latencia: float, falhou: bool = False) -> None:
+        with self._lock:
+            provedor.chamadas += 1
+            provedor.falhas.append(falhou)
+            if falhou:
+                provedor.custos.append(max(latencia, self._penalidade))
+                provedor.erros += 1
+                if (len(provedor.falhas) >= self._minimo_amostras
+                        and provedor.taxa_erros() >= self._limite_erros):
+                    provedor.suspenso_ate = self._relogio() + self._suspensao
+                    # ao fim da suspensão o provedor recomeça sem histórico
+                    # de erros, sendo suspenso novamente se continuar falhando
+                    provedor.falhas.clear()
+            else:
+                provedor.custos.append(latencia)
+                provedor.latencias.append(latencia)
@@ -33,3 +33,5 @@ CALLING_CONVENTIONS = (
 CONVENCOES_CHAMADA = CALLING_CONVENTIONS
 
 BUFFER_LENGTH = 1024
+
+MAX_BUFFER_LENGTH = 1048576
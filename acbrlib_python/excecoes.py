@@ -17,11 +17,13 @@
 # limitations under the License.
 #
 
-from unidecode import unidecode
-
 
 class ACBrLibException(Exception):
     def __init__(self, metodo=None, retorno=None, mensagem=None):
+        # importado apenas quando uma exceção é de fato construída, para não
+        # pesar na importação do pacote
+        from unidecode import unidecode
+        self._mensagem = mensagem
         if not mensagem:
             mensagem = f'Código de retorno inesperado: {retorno!r}'
         mensagem = f'{mensagem} (método {metodo!r} retornou {retorno!r})'
@@ -29,6 +31,10 @@ class ACBrLibException(Exception):
         self._retorno = retorno
         super().__init__(unidecode(mensagem))
 
+    def __reduce__(self):
+        # preserva os argumentos originais ao atravessar processos
+        return (self.__class__, (self._metodo, self._retorno, self._mensagem))
+
     @property
     def metodo(self):
         return self._metodo
@@ -36,3 +42,11 @@ class ACBrLibException(Exception):
     @property
     def retorno(self):
         return self._retorno
+
+
+class ACBrLibPoolEsgotado(Exception):
+    """
+    Nenhuma instância do *pool* ficou disponível dentro do tempo de espera
+    indicado.
+    """
+    pass
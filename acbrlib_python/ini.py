@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/ini.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Leitura, em uma única passada, do conteúdo no formato INI resultante dos
+métodos da ACBrLib. Para esse formato, o resultado é o mesmo que seria
+obtido com ``configparser.ConfigParser``: nomes de seção são sensíveis à
+caixa, nomes de chave são convertidos para minúsculas e valores têm os
+espaços em branco das extremidades removidos. Não há suporte para
+interpolação, valores em múltiplas linhas ou seção ``DEFAULT``.
+
+As funções :func:`secoes_bytes` e :func:`ler_bytes` fazem a mesma leitura
+diretamente sobre *bytes* (ou qualquer objeto que suporte o protocolo de
+buffer, como um ``memoryview`` de um buffer ``ctypes``), sem decodificar ou
+copiar o conteúdo inteiro: apenas os nomes, chaves e valores são copiados,
+cabendo a quem os usar decodificá-los.
+"""
+
+import io
+import re
+
+from typing import Dict
+from typing import Iterator
+from typing import Tuple
+
+Secao = Dict[str, str]
+
+SecaoBytes = Dict[bytes, bytes]
+
+# cada linha é um comentário, um cabeçalho de seção, um par chave/valor ou,
+# se não for vazia, uma linha inválida; as alternativas são avaliadas na
+# mesma ordem que em ``secoes`` e os espaços em branco são removidos depois
+_LINHA = re.compile(
+        rb'^[ \t\r\f\v]*(?:([#;])|\[([^\n]+)\]|([^\n=:]+)[=:]|)([^\n]*)$',
+        re.M
+    )
+
+_FIM_LINHA = re.compile(rb'\n')
+
+# as linhas são lidas em blocos de aproximadamente este tamanho, em bytes
+_BLOCO = 65536
+
+
+def secoes(conteudo: str) -> Iterator[Tuple[str, Secao]]:
+    """
+    Produz as seções do conteúdo, na ordem em que aparecem, à medida em que
+    cada seção é concluída.
+
+    :return: Um iterador de tuplas contendo o nome da seção e um dicionário
+        com as chaves (em minúsculas) e valores da seção.
+    :raise ValueError: Se houver conteúdo antes da primeira seção ou uma
+        linha que não seja uma seção, um comentário ou um par chave/valor.
+    """
+    nome = None
+    secao = None
+    # as linhas são obtidas sob demanda e separadas apenas por "\n", tal
+    # como ``configparser`` faz ao ler de um ``io.StringIO``
+    for numero, linha in enumerate(io.StringIO(conteudo), 1):
+        linha = linha.strip()
+        if not linha or linha[0] in '#;':
+            continue
+        if linha[0] == '[':
+            fim = linha.rfind(']')
+            if fim > 1:
+                if nome is not None:
+                    yield nome, secao
+                nome, secao = linha[1:fim], {}
+                continue
+        if secao is None:
+            raise ValueError(f'Conteudo antes da primeira secao (linha {numero})')
+        igual = linha.find('=')
+        dois_pontos = linha.find(':')
+        if dois_pontos >= 0 and (igual < 0 or dois_pontos < igual):
+            igual = dois_pontos
+        if igual <= 0:
+            raise ValueError(f'Linha invalida na secao {nome!r} (linha {numero})')
+        secao[linha[:igual].rstrip().lower()] = linha[igual + 1:].lstrip()
+    if nome is not None:
+        yield nome, secao
+
+
+def ler(conteudo: str) -> Dict[str, Secao]:
+    """
+    Lê todas as seções do conteúdo. Seções repetidas são combinadas.
+
+    :return: Um dicionário que mapeia os nomes das seções para dicionários
+        com as chaves (em minúsculas) e valores de cada seção.
+    :raise ValueError: Veja :func:`secoes`.
+    """
+    resultado = {}
+    for nome, secao in secoes(conteudo):
+        existente = resultado.get(nome)
+        if existente is None:
+            resultado[nome] = secao
+        else:
+            existente.update(secao)
+    return resultado
+
+
+def secoes_bytes(conteudo) -> Iterator[Tuple[bytes, SecaoBytes]]:
+    """
+    Como :func:`secoes`, mas sobre *bytes*. Os nomes das chaves são
+    convertidos para minúsculas (apenas os caracteres ASCII).
+
+    :param conteudo: *Bytes* ou outro objeto que suporte o protocolo de
+        buffer (``bytearray``, ``memoryview``, ``mmap``, etc).
+    :raise ValueError: Veja :func:`secoes`.
+    """
+    nome = None
+    secao = None
+    for comentario, cabecalho, chave, resto in _linhas(conteudo):
+        if cabecalho:
+            if nome is not None:
+                yield nome, secao
+            nome, secao = cabecalho, {}
+        elif chave:
+            chave = chave.strip()
+            if not chave or secao is None:
+                _erro(conteudo)
+            secao[chave.lower()] = resto.strip()
+        elif not comentario and resto.strip():
+            _erro(conteudo)
+    if nome is not None:
+        yield nome, secao
+
+
+def ler_bytes(conteudo) -> Dict[bytes, SecaoBytes]:
+    """Como :func:`ler`, mas sobre *bytes*. Veja :func:`secoes_bytes`."""
+    resultado = {}
+    for nome, secao in secoes_bytes(conteudo):
+        existente = resultado.get(nome)
+        if existente is None:
+            resultado[nome] = secao
+        else:
+            existente.update(secao)
+    return resultado
+
+
+def _linhas(conteudo) -> Iterator[Tuple[bytes, bytes, bytes, bytes]]:
+    # ``findall`` é bem mais rápido que ``finditer`` mas produz uma lista
+    # com todas as linhas; os blocos, delimitados por quebras de linha,
+    # limitam a memória usada sem copiar o conteúdo
+    tamanho = memoryview(conteudo).nbytes
+    inicio = 0
+    while inicio < tamanho:
+        fim = _FIM_LINHA.search(conteudo, min(inicio + _BLOCO, tamanho))
+        fim = tamanho if fim is None else fim.start()
+        yield from _LINHA.findall(conteudo, inicio, fim)
+        inicio = fim + 1
+
+
+def _erro(conteudo) -> None:
+    # refaz a leitura (mais lenta) do conteúdo apenas para resultar a mesma
+    # exceção, com o número da linha, que resultaria de ``secoes``
+    for _ in secoes(bytes(conteudo).decode('latin-1')):
+        pass
+    raise ValueError('Conteudo invalido')
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/instrumentacao.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Instrumentação das chamadas à biblioteca nativa. Quando uma instância de
+:class:`Instrumentacao` é associada a uma
+:class:`~acbrlib_python.proto.ACBrLibReferencia`, cada chamada a uma função
+da biblioteca é cronometrada e repassada, junto com o código de retorno, aos
+coletores configurados. As releituras de buffer (respostas que não couberam
+no buffer e precisaram ser lidas novamente através de ``XXX_UltimoRetorno``)
+também são registradas:
+
+.. sourcecode:: python
+
+    from acbrlib_python import instrumentacao
+
+    memoria = instrumentacao.ColetorMemoria()
+    instrumentacao.ativar(memoria, instrumentacao.ColetorLogging())
+
+    with ACBrLibCEP.usando('/caminho/para/libacbrcep64.so') as cep:
+        cep.buscar_por_cep('18270170')
+
+    print(instrumentacao.exportar_prometheus(memoria))
+
+Sem instrumentação, os ponteiros de função são invocados diretamente, sem
+qualquer custo adicional.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+logger = logging.getLogger(__name__)
+
+LIMITES_PADRAO = (
+        0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+        0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    )
+"""Limites superiores (em segundos) dos intervalos do histograma de
+latências de :class:`ColetorMemoria`."""
+
+_padrao = None
+
+
+class Coletor(object):
+    """Interface dos coletores de :class:`Instrumentacao`."""
+
+    def registrar_chamada(self, metodo: str, duracao: float, retorno: int) -> None:
+        """
+        Registra uma chamada a uma função da biblioteca.
+
+        :param metodo: Nome da função, por exemplo ``CEP_BuscarPorCEP``.
+        :param duracao: Duração da chamada, em segundos.
+        :param retorno: Código de retorno da função.
+        """
+        pass
+
+    def registrar_releitura(self, metodo: str, tamanho: int) -> None:
+        """
+        Registra que a resposta da função (de ``tamanho`` *bytes*) não coube
+        no buffer e precisou ser relida.
+        """
+        pass
+
+
+class Instrumentacao(object):
+    """
+    Repassa os registros das chamadas aos coletores.
+
+    :param coletores: Os coletores que receberão os registros.
+    :param relogio: Função que resulta o tempo, em segundos, usado para
+        cronometrar as chamadas.
+    """
+
+    def __init__(self, *coletores: Coletor, relogio=time.perf_counter):
+        self._coletores = tuple(coletores)
+        self.relogio = relogio
+
+    @property
+    def coletores(self) -> Sequence[Coletor]:
+        return self._coletores
+
+    def chamada(self, metodo: str, duracao: float, retorno: int) -> None:
+        for coletor in self._coletores:
+            coletor.registrar_chamada(metodo, duracao, retorno)
+
+    def releitura(self, metodo: str, tamanho: int) -> None:
+        for coletor in self._coletores:
+            coletor.registrar_releitura(metodo, tamanho)
+
+    def instrumentar(self, metodo: str, fptr):
+        """Envolve o ponteiro de função de modo que cada chamada seja
+        cronometrada e registrada."""
+        relogio = self.relogio
+        chamada = self.chamada
+
+        def invocar(*args):
+            inicio = relogio()
+            retorno = fptr(*args)
+            chamada(metodo, relogio() - inicio, retorno)
+            return retorno
+
+        invocar.fptr = fptr
+        return invocar
+
+
+def ativar(*coletores: Coletor) -> Instrumentacao:
+    """
+    Define a instrumentação padrão, usada pelas instâncias da biblioteca
+    criadas a partir de então (instâncias já existentes não são afetadas;
+    para estas, veja :attr:`ACBrLibReferencia.instrumentacao
+    <acbrlib_python.proto.ACBrLibReferencia.instrumentacao>`).
+
+    :return: A instrumentação padrão.
+    """
+    global _padrao
+    _padrao = Instrumentacao(*coletores)
+    return _padrao
+
+
+def desativar() -> None:
+    """Remove a instrumentação padrão. Veja :func:`ativar`."""
+    global _padrao
+    _padrao = None
+
+
+def padrao() -> Optional[Instrumentacao]:
+    """Resulta a instrumentação padrão ou ``None``. Veja :func:`ativar`."""
+    return _padrao
+
+
+class MetricasMetodo(object):
+    """Métricas acumuladas para uma função da biblioteca."""
+
+    __slots__ = (
+            'chamadas',
+            'duracao_total',
+            'histograma',
+            'retornos',
+            'releituras',
+        )
+
+    def __init__(self, intervalos: int):
+        self.chamadas = 0
+        self.duracao_total = 0.0
+        # contagens por intervalo (não acumuladas); o último intervalo é o
+        # das durações acima do maior limite
+        self.histograma = [0] * (intervalos + 1)
+        # contagens de cada código de retorno diferente de zero
+        self.retornos = {}
+        self.releituras = 0
+
+    @property
+    def erros(self) -> int:
+        return sum(self.retornos.values())
+
+    @property
+    def duracao_media(self) -> float:
+        return self.duracao_total / self.chamadas if self.chamadas else 0.0
+
+    def copiar(self) -> 'MetricasMetodo':
+        copia = MetricasMetodo(len(self.histograma) - 1)
+        copia.chamadas = self.chamadas
+        copia.duracao_total = self.duracao_total
+        copia.histograma = self.histograma[:]
+        copia.retornos = dict(self.retornos)
+        copia.releituras = self.releituras
+        return copia
+
+    def __repr__(self):
+        return (
+                f'{self.__class__.__name__}(chamadas={self.chamadas!r}, '
+                f'erros={self.erros!r}, releituras={self.releituras!r}, '
+                f'duracao_media={self.duracao_media!r})'
+            )
+
+
+class ColetorMemoria(Coletor):
+    """
+    Acumula, em memória, as métricas de cada função da biblioteca: a
+    quantidade de chamadas, o histograma das latências, as contagens dos
+    códigos de retorno diferentes de zero e a quantidade de releituras de
+    buffer. Pode ser compartilhado entre *threads*.
+
+    :param limites: Limites superiores, em segundos e em ordem crescente,
+        dos intervalos do histograma.
+    """
+
+    def __init__(self, limites: Iterable[float] = LIMITES_PADRAO):
+        self._limites = tuple(limites)
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def limites(self) -> Sequence[float]:
+        return self._limites
+
+    def _obter(self, metodo: str) -> MetricasMetodo:
+        metricas = self._metricas.get(metodo)
+        if metricas is None:
+            metricas = self._metricas[metodo] = MetricasMetodo(len(self._limites))
+        return metricas
+
+    def registrar_chamada(self, metodo: str, duracao: float, retorno: int) -> None:
+        intervalo = bisect.bisect_left(self._limites, duracao)
+        with self._lock:
+            metricas = self._obter(metodo)
+            metricas.chamadas += 1
+            metricas.duracao_total += duracao
+            metricas.histograma[intervalo] += 1
+            if retorno != 0:
+                metricas.retornos[retorno] = metricas.retornos.get(retorno, 0) + 1
+
+    def registrar_releitura(self, metodo: str, tamanho: int) -> None:
+        with self._lock:
+            self._obter(metodo).releituras += 1
+
+    def metricas(self) -> Dict[str, MetricasMetodo]:
+        """Resulta uma cópia das métricas de cada função."""
+        with self._lock:
+            return {m: v.copiar() for m, v in self._metricas.items()}
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._metricas.clear()
+
+
+class ColetorLogging(Coletor):
+    """
+    Registra cada chamada em um *logger*. Chamadas com código de retorno
+    diferente de zero e chamadas mais lentas que ``limiar`` são registradas
+    com o nível ``logging.WARNING``; as demais com o nível ``nivel``.
+
+    :param logger: Opcional. O *logger*; por padrão, o *logger* deste
+        módulo.
+    :param nivel: Nível das chamadas bem sucedidas e das releituras.
+    :param limiar: Opcional. Duração, em segundos, a partir da qual uma
+        chamada é considerada lenta.
+    """
+
+    def __init__(
+            self,
+            logger: Optional[logging.Logger] = None,
+            nivel: int = logging.DEBUG,
+            limiar: Optional[float] = None):
+        self._logger = logger or logging.getLogger(__name__)
+        self._nivel = nivel
+        self._limiar = limiar
+
+    def registrar_chamada(self, metodo: str, duracao: float, retorno: int) -> None:
+        lenta = self._limiar is not None and duracao >= self._limiar
+        nivel = logging.WARNING if retorno != 0 or lenta else self._nivel
+        if self._logger.isEnabledFor(nivel):
+            self._logger.log(
+                    nivel,
+                    '%s: retorno %d em %.3f ms',
+                    metodo,
+                    retorno,
+                    duracao * 1000
+                )
+
+    def registrar_releitura(self, metodo: str, tamanho: int) -> None:
+        if self._logger.isEnabledFor(self._nivel):
+            self._logger.log(
+                    self._nivel,
+                    '%s: resposta de %d bytes relida',
+                    metodo,
+                    tamanho
+                )
+
+
+def exportar_prometheus(coletor: ColetorMemoria, prefixo: str = 'acbrlib') -> str:
+    """
+    Resulta as métricas do coletor no formato texto de exposição do
+    Prometheus, para ser servido por um *endpoint* ``/metrics``.
+
+    :param coletor: O coletor cujas métricas serão exportadas.
+    :param prefixo: Prefixo dos nomes das métricas.
+    """
+    metricas = coletor.metricas()
+    linhas: List[str] = []
+
+    def cabecalho(nome, tipo, ajuda):
+        linhas.append(f'# HELP {prefixo}_{nome} {ajuda}')
+        linhas.append(f'# TYPE {prefixo}_{nome} {tipo}')
+
+    cabecalho(
+            'chamada_duracao_segundos',
+            'histogram',
+            'Duracao das chamadas as funcoes da biblioteca.'
+        )
+    for metodo, m in sorted(metricas.items()):
+        acumulado = 0
+        for limite, quantidade in zip(coletor.limites, m.histograma):
+            acumulado += quantidade
+            linhas.append(
+                    f'{prefixo}_chamada_duracao_segundos_bucket'
+                    f'{{metodo="{metodo}",le="{limite!r}"}} {acumulado}'
+                )
+        linhas.append(
+                f'{prefixo}_chamada_duracao_segundos_bucket'
+                f'{{metodo="{metodo}",le="+Inf"}} {m.chamadas}'
+            )
+        linhas.append(
+                f'{prefixo}_chamada_duracao_segundos_sum'
+                f'{{metodo="{metodo}"}} {m.duracao_total!r}'
+            )
+        linhas.append(
+                f'{prefixo}_chamada_duracao_segundos_count'
+                f'{{metodo="{metodo}"}} {m.chamadas}'
+            )
+
+    cabecalho(
+            'chamada_erros_total',
+            'counter',
+            'Chamadas com codigo de retorno diferente de zero.'
+        )
+    for metodo, m in sorted(metricas.items()):
+        for retorno, quantidade in sorted(m.retornos.items()):
+            linhas.append(
+                    f'{prefixo}_chamada_erros_total'
+                    f'{{metodo="{metodo}",retorno="{retorno}"}} {quantidade}'
+                )
+
+    cabecalho(
+            'buffer_releituras_total',
+            'counter',
+            'Respostas que nao couberam no buffer e foram relidas.'
+        )
+    for metodo, m in sorted(metricas.items()):
+        linhas.append(
+                f'{prefixo}_buffer_releituras_total'
+                f'{{metodo="{metodo}"}} {m.releituras}'
+            )
+
+    return '\n'.join(linhas) + '\n'
@@ -19,11 +19,28 @@
 
 from ctypes import byref
 from ctypes import c_int
-from ctypes import create_string_buffer
+from types import MappingProxyType
+from typing import Mapping
 
+from . import ini
 from .constantes import BUFFER_LENGTH
 from .proto import ACBrLibMixin
 from .proto import read_string_buffer
+from .rastreamento import METODO
+from .rastreamento import RETORNO
+from .rastreamento import TAMANHO_RESPOSTA
+from .rastreamento import span
+
+_CONFIGURACAO = 'configuracao'
+
+
+def _invocar_rastreado(impl, metodo: str, *args) -> int:
+    # invoca um método que resulta apenas o código de retorno, num span
+    # próprio, tal como os métodos que leem uma resposta (veja read_buffer)
+    with span(impl._rastreador, metodo, {METODO: metodo}) as s:
+        retorno = impl._invocar(metodo)(*args)
+        s.definir_atributo(RETORNO, retorno)
+    return retorno
 
 
 class ACBrLibCommonMixin(ACBrLibMixin):
@@ -37,16 +54,55 @@ class ACBrLibCommonMixin(ACBrLibMixin):
     * ``XXX_Nome``
     * ``XXX_Versao``
 
+    Quando várias instâncias compartilham a mesma biblioteca (veja
+    :func:`~acbrlib_python.proto.shared_library`), apenas a primeira a
+    inicializa, com a sua configuração, e apenas a última a finaliza. As
+    demais devem inicializá-la com os mesmos ``arq_config`` e
+    ``chave_crypt``, pois não há como aplicar outra configuração a uma
+    biblioteca já inicializada. Finalizar uma instância que não foi
+    inicializada não tem efeito.
+
     Este mixin requer que a classe herde de
     :class:`~acbrlib_python.base.ACBrLibReferencia`.
     """
 
+    _em_uso = False
+
+    @property
+    def inicializada(self) -> bool:
+        """Se esta instância inicializou a biblioteca (ou passou a usá-la,
+        se compartilhada) e ainda não a finalizou."""
+        return self._em_uso
+
     def inicializar(self, arq_config: str, chave_crypt: str) -> None:
+        """
+        :raise ValueError: Se a biblioteca, compartilhada, já foi
+            inicializada por outra instância com outros ``arq_config`` ou
+            ``chave_crypt``.
+        """
         metodo = f'{self._prefixo}_Inicializar'
-        retorno = self._invocar(metodo)(self._b(arq_config), self._b(chave_crypt))
+        if not self._em_uso:
+            argumentos = (arq_config, chave_crypt)
+            if not self._biblioteca.acquire(argumentos):
+                # já inicializada por outra instância que a compartilha
+                if self._biblioteca.arguments != argumentos:
+                    self._biblioteca.release()
+                    raise ValueError(
+                            'A biblioteca ja foi inicializada por outra '
+                            'instancia com outro arquivo de configuracao '
+                            'ou outra chave'
+                        )
+                self._em_uso = True
+                return
+            self._em_uso = True
+        retorno = _invocar_rastreado(self, metodo, self._b(arq_config), self._b(chave_crypt))
+        # a configuração é lida novamente pela biblioteca
+        self._biblioteca.cache.clear()
         if retorno == 0:
             return
         else:
+            self._em_uso = False
+            self._biblioteca.release()
             codigos_erro = {
                     -1: 'Falha na inicialização da biblioteca',
                     -5: 'Não foi possível localizar o arquivo INI informado',
@@ -60,7 +116,15 @@ class ACBrLibCommonMixin(ACBrLibMixin):
 
     def finalizar(self) -> None:
         metodo = f'{self._prefixo}_Finalizar'
-        retorno = self._invocar(metodo)()
+        if not self._em_uso:
+            # esta instância não inicializou a biblioteca (ou já a
+            # finalizou); se compartilhada, ela pertence às demais
+            return
+        self._em_uso = False
+        if not self._biblioteca.release():
+            # ainda em uso por outras instâncias
+            return
+        retorno = _invocar_rastreado(self, metodo)
         if retorno == 0:
             return
         else:
@@ -73,12 +137,26 @@ class ACBrLibCommonMixin(ACBrLibMixin):
                     mensagem=codigos_erro.get(retorno)
                 )
 
-    def ultimo_retorno(self, buffer_len=BUFFER_LENGTH) -> str:
+    def ultimo_retorno(self, buffer_len=BUFFER_LENGTH, como_memoryview=False) -> str:
+        """
+        Obtém a resposta do último método invocado.
+
+        :param buffer_len: Tamanho mínimo do buffer.
+        :param como_memoryview: Se verdadeiro, resulta um ``memoryview`` da
+            resposta, sem decodificá-la, diretamente sobre o buffer, que é
+            válido apenas até a próxima chamada a este método.
+        """
         metodo = f'{self._prefixo}_UltimoRetorno'
-        resposta = create_string_buffer(buffer_len)
+        resposta = self.buffers.acquire(metodo, buffer_len)
+        buffer_len = len(resposta)
         tamanho = c_int(buffer_len)
-        retorno = self._invocar(metodo)(resposta, byref(tamanho))
+        with span(self._rastreador, metodo, {METODO: metodo}) as s:
+            retorno = self._invocar(metodo)(resposta, byref(tamanho))
+            s.definir_atributo(RETORNO, retorno)
+            s.definir_atributo(TAMANHO_RESPOSTA, tamanho.value)
         if retorno == 0:
+            if como_memoryview:
+                return memoryview(resposta)[:min(tamanho.value, buffer_len)]
             return self._s(resposta.value)
         else:
             codigos_erro = {
@@ -111,13 +189,18 @@ class ACBrLibConfigMixin(ACBrLibMixin):
     * ``XXX_ConfigImportar``
     * ``XXX_ConfigExportar``
 
+    Além disso, fornece uma visão da configuração exportada, já lida, que é
+    mantida até que a configuração seja alterada através desta ou de outra
+    instância que compartilhe a biblioteca (veja :meth:`configuracao`).
+
     Este mixin requer que a classe herde de
     :class:`~acbrlib_python.base.ACBrLibReferencia`.
     """
 
     def config_ler(self, arq_config: str) -> None:
         metodo = f'{self._prefixo}_ConfigLer'
-        retorno = self._invocar(metodo)(self._b(arq_config))
+        retorno = _invocar_rastreado(self, metodo, self._b(arq_config))
+        self.descartar_configuracao()
         if retorno != 0:
             codigos_erro = {
                     -5: 'Não foi possível localizar o arquivo INI informado',
@@ -132,7 +215,7 @@ class ACBrLibConfigMixin(ACBrLibMixin):
 
     def config_gravar(self, arq_config: str) -> None:
         metodo = f'{self._prefixo}_ConfigGravar'
-        retorno = self._invocar(metodo)(self._b(arq_config))
+        retorno = _invocar_rastreado(self, metodo, self._b(arq_config))
         if retorno != 0:
             codigos_erro = {
                     -5: 'Não foi possível localizar o arquivo INI informado',
@@ -147,30 +230,22 @@ class ACBrLibConfigMixin(ACBrLibMixin):
 
     def config_ler_valor(self, sessao: str, chave: str) -> str:
         metodo = f'{self._prefixo}_ConfigLerValor'
-        resposta = create_string_buffer(BUFFER_LENGTH)
-        tamanho = c_int(BUFFER_LENGTH)
-        retorno = self._invocar(metodo)(
+        codigos_erro = {
+                -1: 'A biblioteca não foi inicializada',
+                -3: 'Erro ao ler a configuração informada',
+            }
+        return read_string_buffer(
+                self,
+                metodo,
                 self._b(sessao),
                 self._b(chave),
-                resposta,
-                byref(tamanho)
+                mensagens=codigos_erro
             )
-        if retorno == 0:
-            return self._s(resposta.value)
-        else:
-            codigos_erro = {
-                    -1: 'A biblioteca não foi inicializada',
-                    -3: 'Erro ao ler a configuração informada',
-                }
-            raise self._base_exception(
-                    metodo=metodo,
-                    retorno=retorno,
-                    mensagem=codigos_erro.get(retorno)
-                )
 
     def config_gravar_valor(self, sessao: str, chave: str, valor: str) -> None:
         metodo = f'{self._prefixo}_ConfigGravarValor'
-        retorno = self._invocar(metodo)(self._b(sessao), self._b(chave), self._b(valor))
+        retorno = _invocar_rastreado(self, metodo, self._b(sessao), self._b(chave), self._b(valor))
+        self.descartar_configuracao()
         if retorno != 0:
             codigos_erro = {
                     -1: 'A biblioteca não foi inicializada',
@@ -184,7 +259,8 @@ class ACBrLibConfigMixin(ACBrLibMixin):
 
     def config_importar(self, arq_config: str) -> None:
         metodo = f'{self._prefixo}_ConfigImportar'
-        retorno = self._invocar(metodo)(self._b(arq_config))
+        retorno = _invocar_rastreado(self, metodo, self._b(arq_config))
+        self.descartar_configuracao()
         if retorno != 0:
             codigos_erro = {
                     -5: 'Não foi possível localizar o arquivo INI informado',
@@ -199,17 +275,37 @@ class ACBrLibConfigMixin(ACBrLibMixin):
 
     def config_exportar(self) -> str:
         metodo = f'{self._prefixo}_ConfigExportar'
-        resposta = create_string_buffer(BUFFER_LENGTH)
-        tamanho = c_int(BUFFER_LENGTH)
-        retorno = self._invocar(metodo)(resposta, byref(tamanho))
-        if retorno == 0:
-            return self._s(resposta.value)
-        else:
-            codigos_erro = {
-                    -10: 'Houve uma falha na execução do método'
-                }
-            raise self._base_exception(
-                    metodo=metodo,
-                    retorno=retorno,
-                    mensagem=codigos_erro.get(retorno)
-                )
+        codigos_erro = {
+                -10: 'Houve uma falha na execução do método'
+            }
+        return read_string_buffer(self, metodo, mensagens=codigos_erro)
+
+    def configuracao(self) -> Mapping[str, Mapping[str, str]]:
+        """
+        Obtém a configuração exportada (veja :meth:`config_exportar`) já
+        lida, como um mapeamento (somente leitura) dos nomes das seções para
+        mapeamentos das chaves (em minúsculas) e valores de cada seção:
+
+        .. sourcecode:: python
+
+            webservice = cep.configuracao()['CEP']['webservice']
+
+        A configuração é exportada e lida apenas uma vez e mantida até que
+        seja alterada através de qualquer instância que compartilhe a
+        biblioteca, por :meth:`config_ler`, :meth:`config_importar`,
+        :meth:`config_gravar_valor` ou ``inicializar``. Se a configuração
+        for alterada por outros meios, use :meth:`descartar_configuracao`.
+        """
+        configuracao = self._biblioteca.cache.get(_CONFIGURACAO)
+        if configuracao is None:
+            secoes = ini.ler(self.config_exportar())
+            configuracao = MappingProxyType({
+                    nome: MappingProxyType(secao) for nome, secao in secoes.items()
+                })
+            self._biblioteca.cache[_CONFIGURACAO] = configuracao
+        return configuracao
+
+    def descartar_configuracao(self) -> None:
+        """Descarta a configuração mantida por :meth:`configuracao`, para
+        todas as instâncias que compartilham a biblioteca."""
+        self._biblioteca.cache.pop(_CONFIGURACAO, None)
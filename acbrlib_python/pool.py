@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/pool.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+from contextlib import contextmanager
+from typing import Callable
+from typing import List
+from typing import Optional
+
+from .excecoes import ACBrLibPoolEsgotado
+from .proto import ACBrLibReferencia
+
+logger = logging.getLogger(__name__)
+
+# colocado na fila das instâncias livres ao fechar o pool, para acordar
+# quem estiver aguardando por uma instância
+_FECHADO = object()
+
+
+class ACBrLibPool(object):
+    """
+    Mantém um conjunto de instâncias de :class:`ACBrLibReferencia` já
+    inicializadas, que podem ser emprestadas a uma *thread* de cada vez.
+
+    As instâncias são criadas pela ``fabrica``, que recebe o índice da
+    instância (de ``0`` até ``tamanho - 1``) e deve resultar em uma
+    instância já inicializada. Ao fechar o *pool* todas as instâncias são
+    finalizadas.
+
+    :param fabrica: Função que cria e inicializa a instância de índice
+        indicado.
+    :param tamanho: Quantidade de instâncias do *pool*.
+    :param timeout: Opcional. Tempo máximo de espera (em segundos) padrão
+        para obter uma instância. Se não for informado, aguarda
+        indefinidamente.
+    """
+
+    def __init__(
+            self,
+            fabrica: Callable[[int], ACBrLibReferencia],
+            tamanho: int,
+            timeout: Optional[float] = None):
+        if tamanho < 1:
+            raise ValueError(f'Tamanho do pool deve ser positivo: {tamanho!r}')
+        self._fabrica = fabrica
+        self._tamanho = tamanho
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._livres = queue.Queue()
+        self._indices = {}
+        self._fechado = False
+        try:
+            for indice in range(tamanho):
+                self._adicionar(indice)
+        except BaseException:
+            self.fechar()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.fechar()
+
+    @property
+    def tamanho(self) -> int:
+        return self._tamanho
+
+    @property
+    def disponiveis(self) -> int:
+        with self._lock:
+            return 0 if self._fechado else self._livres.qsize()
+
+    def obter(self, timeout: Optional[float] = None) -> ACBrLibReferencia:
+        """
+        Obtém uma instância livre, que deverá ser devolvida através de
+        :meth:`devolver`. Prefira usar :meth:`emprestar`.
+
+        :param timeout: Opcional. Tempo máximo de espera, em segundos. Se
+            não for informado, será usado o tempo de espera padrão do *pool*.
+        :raise ACBrLibPoolEsgotado: Se nenhuma instância ficar disponível
+            dentro do tempo de espera.
+        :raise RuntimeError: Se o *pool* estiver fechado ou for fechado
+            durante a espera.
+        """
+        with self._lock:
+            if self._fechado:
+                raise RuntimeError('Pool fechado')
+        timeout = self._timeout if timeout is None else timeout
+        try:
+            instancia = self._livres.get(timeout=timeout)
+        except queue.Empty:
+            raise ACBrLibPoolEsgotado(
+                    f'Nenhuma das {self._tamanho} instancias ficou '
+                    f'disponivel em {timeout!r} segundos'
+                ) from None
+        if instancia is _FECHADO:
+            # devolvido à fila para acordar o próximo que estiver aguardando
+            self._livres.put(_FECHADO)
+            raise RuntimeError('Pool fechado')
+        return instancia
+
+    def devolver(self, instancia: ACBrLibReferencia, verificar: bool = False) -> None:
+        """
+        Devolve uma instância obtida através de :meth:`obter`.
+
+        :param verificar: Se a saúde da instância deve ser verificada antes
+            da devolução. Uma instância com problemas será finalizada e
+            substituída por uma nova instância.
+        """
+        if verificar and not self.saudavel(instancia):
+            instancia = self._substituir(instancia)
+            if instancia is None:
+                return
+        self._recolocar(instancia)
+
+    @contextmanager
+    def emprestar(self, timeout: Optional[float] = None):
+        """
+        Empresta uma instância durante o bloco ``with``. Se o bloco resultar
+        em uma exceção, a saúde da instância será verificada antes que ela
+        seja devolvida ao *pool*.
+        """
+        instancia = self.obter(timeout=timeout)
+        try:
+            yield instancia
+        except BaseException:
+            self.devolver(instancia, verificar=True)
+            raise
+        else:
+            self.devolver(instancia)
+
+    def saudavel(self, instancia: ACBrLibReferencia) -> bool:
+        """
+        Verifica a saúde de uma instância, invocando os métodos ``nome`` e
+        ``versao`` da biblioteca.
+        """
+        try:
+            instancia.nome()
+            instancia.versao()
+        except Exception:
+            logger.exception('instancia %r com problemas', instancia)
+            return False
+        return True
+
+    def verificar(self) -> int:
+        """
+        Verifica a saúde de todas as instâncias livres, substituindo as que
+        apresentarem problemas. Instâncias emprestadas não são verificadas.
+
+        :return: A quantidade de instâncias substituídas.
+        """
+        substituidas = 0
+        for _ in range(self._livres.qsize()):
+            try:
+                instancia = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            if instancia is _FECHADO:
+                self._livres.put(_FECHADO)
+                break
+            if not self.saudavel(instancia):
+                substituidas += 1
+                instancia = self._substituir(instancia)
+                if instancia is None:
+                    continue
+            self._recolocar(instancia)
+        return substituidas
+
+    def fechar(self) -> None:
+        """
+        Finaliza as instâncias livres. As instâncias emprestadas serão
+        finalizadas à medida em que forem devolvidas. Quem estiver
+        aguardando por uma instância (veja :meth:`obter`) recebe um
+        ``RuntimeError``.
+        """
+        with self._lock:
+            if self._fechado:
+                return
+            # a partir daqui, as instâncias devolvidas são finalizadas em
+            # vez de voltarem à fila (veja _recolocar)
+            self._fechado = True
+        while True:
+            try:
+                instancia = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            if instancia is not _FECHADO:
+                self._finalizar(instancia)
+        self._livres.put(_FECHADO)
+
+    def _adicionar(self, indice: int) -> ACBrLibReferencia:
+        instancia = self._fabrica(indice)
+        with self._lock:
+            self._indices[id(instancia)] = indice
+        self._livres.put(instancia)
+        return instancia
+
+    def _recolocar(self, instancia: ACBrLibReferencia) -> None:
+        # a verificação e a devolução à fila são atômicas em relação a
+        # fechar(), de modo que nenhuma instância devolvida fique na fila
+        # de um pool já fechado sem ser finalizada
+        with self._lock:
+            if not self._fechado:
+                self._livres.put(instancia)
+                return
+        self._finalizar(instancia)
+
+    def _substituir(self, instancia: ACBrLibReferencia) -> Optional[ACBrLibReferencia]:
+        with self._lock:
+            indice = self._indices.pop(id(instancia))
+        self._finalizar(instancia)
+        try:
+            nova = self._fabrica(indice)
+        except Exception:
+            # a instância é perdida; o pool fica menor até ser recriado
+            logger.exception('falha ao substituir a instancia %d', indice)
+            return None
+        with self._lock:
+            self._indices[id(nova)] = indice
+        return nova
+
+    def _finalizar(self, instancia: ACBrLibReferencia) -> None:
+        with self._lock:
+            self._indices.pop(id(instancia), None)
+        try:
+            instancia.finalizar()
+        except Exception:
+            logger.exception('falha ao finalizar a instancia %r', instancia)
+
+
+def copiar_biblioteca(
+        caminho_biblioteca: str,
+        quantidade: int,
+        diretorio: Optional[str] = None) -> List[str]:
+    """
+    Cria cópias do arquivo da biblioteca. Uma mesma biblioteca carregada
+    várias vezes a partir do mesmo caminho compartilha o estado global da
+    biblioteca (nas versões *single-thread* da ACBrLib), enquanto cada cópia
+    é carregada como uma biblioteca independente.
+
+    :param caminho_biblioteca: Caminho para a biblioteca original.
+    :param quantidade: Quantidade de cópias.
+    :param diretorio: Opcional. Diretório onde as cópias serão criadas. Se
+        não for informado, será criado um diretório temporário.
+
+    :return: Lista com os caminhos das cópias.
+    """
+    if diretorio is None:
+        diretorio = tempfile.mkdtemp(prefix='acbrlib-')
+    nome = os.path.basename(caminho_biblioteca)
+    copias = []
+    for indice in range(quantidade):
+        destino = os.path.join(diretorio, f'{indice}-{nome}')
+        shutil.copy2(caminho_biblioteca, destino)
+        copias.append(destino)
+    return copias
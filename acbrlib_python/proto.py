@@ -17,8 +17,12 @@
 # limitations under the License.
 #
 
+import os
 import sys
+import threading
 
+from collections import OrderedDict
+from collections import deque
 from ctypes import CDLL
 from ctypes import POINTER
 from ctypes import byref
@@ -27,6 +31,7 @@ from ctypes import c_int
 from ctypes import create_string_buffer
 
 from typing import Any
+from typing import Callable
 from typing import List
 from typing import Mapping
 from typing import Optional
@@ -34,8 +39,18 @@ from typing import Type
 from typing import Union
 
 from .constantes import AUTO
+from .constantes import STANDARD_C
+from .constantes import WINDOWS_STDCALL
 from .constantes import BUFFER_LENGTH
+from .constantes import MAX_BUFFER_LENGTH
 from .excecoes import ACBrLibException
+from .instrumentacao import Instrumentacao
+from .instrumentacao import padrao as instrumentacao_padrao
+from .rastreamento import METODO
+from .rastreamento import RETORNO
+from .rastreamento import TAMANHO_RESPOSTA
+from .rastreamento import Rastreador
+from .rastreamento import padrao as rastreador_padrao
 
 
 class Signature(object):
@@ -59,24 +74,421 @@ class Signature(object):
         return self._restype
 
 
+class BufferStats(object):
+    """
+    Contadores de uso dos buffers de um método: respostas lidas na primeira
+    chamada (``hits``), respostas que precisaram ser relidas através de
+    ``XXX_UltimoRetorno`` (``rereads``), maior resposta observada
+    (``largest``) e quantas releituras foram evitadas (``avoided``), isto é,
+    respostas maiores que o buffer inicial que couberam no buffer ampliado.
+    """
+
+    __slots__ = ('hits', 'rereads', 'largest', 'avoided')
+
+    def __init__(self):
+        self.hits = 0
+        self.rereads = 0
+        self.largest = 0
+        self.avoided = 0
+
+    def __repr__(self):
+        return (
+                f'{self.__class__.__name__}(hits={self.hits!r}, '
+                f'rereads={self.rereads!r}, largest={self.largest!r}, '
+                f'avoided={self.avoided!r})'
+            )
+
+
+class SizingStrategy(object):
+    """
+    Estratégia de dimensionamento do buffer de um método, a partir dos
+    tamanhos das respostas observadas. Uma instância é criada para cada
+    método (veja o parâmetro ``strategy`` de :class:`StringBufferPool`).
+    """
+
+    def observe(self, size: int) -> None:
+        """Registra o tamanho (em *bytes*) de uma resposta."""
+        raise NotImplementedError()
+
+    def suggest(self) -> int:
+        """Resulta o tamanho de resposta que o buffer deveria comportar."""
+        raise NotImplementedError()
+
+
+class MaxSizeStrategy(SizingStrategy):
+    """Dimensiona o buffer para a maior resposta já observada. Uma vez
+    ampliado, o buffer nunca é reduzido."""
+
+    __slots__ = ('_largest',)
+
+    def __init__(self):
+        self._largest = 0
+
+    def observe(self, size: int) -> None:
+        if size > self._largest:
+            self._largest = size
+
+    def suggest(self) -> int:
+        return self._largest
+
+
+class PercentileSizeStrategy(SizingStrategy):
+    """
+    Dimensiona o buffer para um percentil dos tamanhos das últimas
+    respostas observadas. Respostas excepcionalmente grandes continuam
+    sendo relidas, sem que o buffer cresça por causa delas, e o buffer é
+    reduzido quando as respostas grandes deixam de ocorrer.
+
+    :param percentile: Percentil, entre 0 e 1.
+    :param window: Quantidade de respostas consideradas.
+    """
+
+    __slots__ = ('_percentile', '_sizes')
+
+    def __init__(self, percentile: float = 0.95, window: int = 64):
+        if not 0 < percentile <= 1:
+            raise ValueError(f'Percentil invalido: {percentile!r}')
+        self._percentile = percentile
+        self._sizes = deque(maxlen=window)
+
+    def observe(self, size: int) -> None:
+        self._sizes.append(size)
+
+    def suggest(self) -> int:
+        if not self._sizes:
+            return 0
+        sizes = sorted(self._sizes)
+        return sizes[min(len(sizes) - 1, int(self._percentile * len(sizes)))]
+
+
+class StringBufferPool(object):
+    """
+    Mantém um buffer string para cada método, reutilizado entre as
+    chamadas. O buffer de um método é dimensionado, a partir das respostas
+    observadas, por uma :class:`SizingStrategy` (por padrão, para a maior
+    resposta já observada), de modo que respostas grandes e repetidas sejam
+    lidas em uma única chamada, sem a releitura através de
+    ``XXX_UltimoRetorno``.
+
+    Assim como as instâncias de :class:`ACBrLibReferencia` que os utilizam,
+    os buffers não devem ser compartilhados entre *threads*.
+
+    :param initial_length: Tamanho inicial dos buffers.
+    :param max_length: Tamanho máximo de cada buffer mantido; buffers
+        maiores são temporários.
+    :param strategy: Classe (ou função sem argumentos) que resulta uma
+        :class:`SizingStrategy` para cada método.
+    :param memory_cap: Opcional. Limite, em *bytes*, da soma dos tamanhos
+        dos buffers mantidos. Para ampliar um buffer, os buffers usados há
+        mais tempo são descartados; se ainda assim o limite for excedido, o
+        buffer ampliado será temporário.
+    :param review_interval: A cada quantas respostas lidas na primeira
+        chamada a estratégia é consultada novamente, o que permite reduzir
+        um buffer (as releituras sempre consultam a estratégia).
+    """
+
+    def __init__(
+            self,
+            initial_length: int = BUFFER_LENGTH,
+            max_length: int = MAX_BUFFER_LENGTH,
+            strategy: Callable[[], SizingStrategy] = MaxSizeStrategy,
+            memory_cap: Optional[int] = None,
+            review_interval: int = 64):
+        self._initial_length = initial_length
+        self._max_length = max_length
+        self._strategy = strategy
+        self._memory_cap = memory_cap
+        self._review_interval = review_interval
+        self._buffers = OrderedDict()
+        self._strategies = {}
+        self._stats = {}
+        self._memory = 0
+
+    @property
+    def max_length(self):
+        return self._max_length
+
+    @property
+    def memory_cap(self) -> Optional[int]:
+        return self._memory_cap
+
+    @property
+    def memory(self) -> int:
+        """Soma dos tamanhos, em *bytes*, dos buffers mantidos."""
+        return self._memory
+
+    def acquire(self, method_name: str, length: Optional[int] = None):
+        """
+        Obtém o buffer para o método indicado.
+
+        :param method_name: Nome do método.
+        :param length: Opcional. Tamanho mínimo do buffer. Se for maior que
+            ``max_length`` (ou não couber em ``memory_cap``) será obtido um
+            buffer temporário, que não será reutilizado. Se não for
+            informado, será obtido o buffer atual do método ou um novo
+            buffer com o tamanho inicial.
+        """
+        str_buffer = self._buffers.get(method_name)
+        if str_buffer is not None and (length is None or len(str_buffer) >= length):
+            if self._memory_cap is not None:
+                self._buffers.move_to_end(method_name)
+            return str_buffer
+        return self._replace(method_name, length or self._initial_length)
+
+    def hit(self, method_name: str, size: int) -> None:
+        """Registra que a resposta do método (de tamanho ``size``) foi lida
+        na primeira chamada."""
+        stats = self.stats(method_name)
+        stats.hits += 1
+        if size > stats.largest:
+            stats.largest = size
+        if size > self._initial_length:
+            stats.avoided += 1
+        strategy = self._strategy_for(method_name)
+        strategy.observe(size)
+        if stats.hits % self._review_interval == 0:
+            self._resize(method_name, strategy.suggest())
+
+    def reread(self, method_name: str, size: int) -> None:
+        """
+        Registra que a resposta do método (de tamanho ``size``) não coube no
+        buffer e precisou ser relida. O buffer do método é redimensionado
+        conforme a estratégia, respeitando ``max_length`` e ``memory_cap``.
+        """
+        stats = self.stats(method_name)
+        stats.rereads += 1
+        if size > stats.largest:
+            stats.largest = size
+        strategy = self._strategy_for(method_name)
+        strategy.observe(size)
+        self._resize(method_name, strategy.suggest())
+
+    def stats(self, method_name: str) -> BufferStats:
+        stats = self._stats.get(method_name)
+        if stats is None:
+            stats = self._stats[method_name] = BufferStats()
+        return stats
+
+    def all_stats(self) -> Mapping[str, BufferStats]:
+        return dict(self._stats)
+
+    def total_stats(self) -> BufferStats:
+        """Resulta a soma dos contadores de todos os métodos (``largest``
+        é a maior resposta entre todos os métodos)."""
+        total = BufferStats()
+        for stats in self._stats.values():
+            total.hits += stats.hits
+            total.rereads += stats.rereads
+            total.avoided += stats.avoided
+            total.largest = max(total.largest, stats.largest)
+        return total
+
+    def clear(self) -> None:
+        """Descarta todos os buffers (os contadores e o que as estratégias
+        aprenderam são mantidos)."""
+        self._buffers.clear()
+        self._memory = 0
+
+    def _strategy_for(self, method_name: str) -> SizingStrategy:
+        strategy = self._strategies.get(method_name)
+        if strategy is None:
+            strategy = self._strategies[method_name] = self._strategy()
+        return strategy
+
+    def _resize(self, method_name: str, size: int) -> None:
+        # reserva espaço para o terminador nulo; o buffer cresce sempre que
+        # necessário, mas só é reduzido se couber em menos da metade dele
+        length = max(size + 1, self._initial_length)
+        current = self._buffers.get(method_name)
+        current_length = self._initial_length if current is None else len(current)
+        if length > current_length or length < current_length // 2:
+            if length <= self._max_length and self._reserve(method_name, length):
+                self._buffers[method_name] = create_string_buffer(length)
+
+    def _replace(self, method_name: str, length: int):
+        str_buffer = create_string_buffer(length)
+        if length <= self._max_length and self._reserve(method_name, length):
+            self._buffers[method_name] = str_buffer
+        return str_buffer
+
+    def _reserve(self, method_name: str, length: int) -> bool:
+        # libera o espaço para um novo buffer do método, que substituirá o
+        # atual, descartando os buffers dos outros métodos usados há mais
+        # tempo se necessário; um buffer maior que o limite nunca é mantido
+        current = self._buffers.get(method_name)
+        released = 0 if current is None else len(current)
+        if self._memory_cap is not None:
+            if length > self._memory_cap:
+                return False
+            for other in list(self._buffers):
+                if self._memory - released + length <= self._memory_cap:
+                    break
+                if other != method_name:
+                    self._memory -= len(self._buffers.pop(other))
+        if current is not None:
+            del self._buffers[method_name]
+            self._memory -= released
+        self._memory += length
+        return True
+
+
 class ReferenceLibrary(object):
 
     def __init__(self, library_path, calling_convention=AUTO, lazy_load=True):
         self._path = library_path
         self._calling_convention = calling_convention
         self._lazy_load = lazy_load
-        self._ref = None if self._lazy_load else self._load_library()
+        self._ref = None
+        self._lock = threading.Lock()
+        self._users = 0
+        self._arguments = None
+        self._cache = {}
+        if not self._lazy_load:
+            self._load_library()
 
     @property
     def ref(self):
-        if self._ref is None:
+        ref = self._ref
+        if ref is None:
+            # várias threads podem obter a referência ao mesmo tempo, mas a
+            # biblioteca deve ser carregada apenas uma vez
+            with self._lock:
+                if self._ref is None:
+                    self._load_library()
+                ref = self._ref
+        return ref
+
+    @property
+    def lazy_load(self):
+        return self._lazy_load
+
+    @property
+    def users(self) -> int:
+        """Quantidade de instâncias que inicializaram a biblioteca e ainda
+        não a finalizaram (veja :meth:`acquire`)."""
+        return self._users
+
+    @property
+    def arguments(self):
+        """Argumentos informados pela primeira instância ao registrar-se
+        (veja :meth:`acquire`), ou ``None`` se não houver instâncias
+        usando a biblioteca."""
+        return self._arguments
+
+    @property
+    def cache(self) -> dict:
+        """
+        Dados obtidos da biblioteca (como a configuração já lida),
+        compartilhados por todas as instâncias que a usam, de modo que o
+        que for descartado por uma delas é descartado para todas.
+        """
+        return self._cache
+
+    def acquire(self, arguments=None) -> bool:
+        """
+        Registra mais uma instância usando a biblioteca.
+
+        :param arguments: Opcional. Argumentos com que a biblioteca será
+            inicializada, mantidos se esta for a primeira instância (veja
+            :attr:`arguments`).
+
+        :return: Verdadeiro se for a primeira, ou seja, se a biblioteca
+            precisar ser inicializada.
+        """
+        with self._lock:
+            self._users += 1
+            if self._users == 1:
+                self._arguments = arguments
+            return self._users == 1
+
+    def release(self) -> bool:
+        """
+        Registra que uma instância deixou de usar a biblioteca.
+
+        :return: Verdadeiro se não houver mais instâncias usando a
+            biblioteca, ou seja, se ela puder ser finalizada.
+        """
+        with self._lock:
+            if self._users > 0:
+                self._users -= 1
+            if self._users == 0:
+                self._arguments = None
+            return self._users == 0
+
+    def reload(self):
+        """
+        Descarta a referência atual e carrega a biblioteca novamente. Os
+        ponteiros de função resolvidos a partir da referência anterior são
+        descartados automaticamente por :class:`ACBrLibReferencia` na
+        próxima invocação.
+        """
+        with self._lock:
+            self._ref = None
+            self._cache.clear()
             self._load_library()
-        return self._ref
 
     def _load_library(self):
         self._ref = loader(self._path, self._calling_convention)
 
 
+_shared_libraries = {}
+
+_shared_libraries_lock = threading.Lock()
+
+
+def shared_library(library_path, calling_convention=AUTO) -> ReferenceLibrary:
+    """
+    Obtém a :class:`ReferenceLibrary` compartilhada por todo o processo para
+    a biblioteca indicada. Como uma biblioteca é carregada uma única vez por
+    processo (e o seu estado é o mesmo para todas as referências), as
+    instâncias que a usam devem compartilhar a mesma referência, inclusive
+    para que ela seja finalizada apenas quando nenhuma instância a estiver
+    usando (veja :meth:`ReferenceLibrary.acquire`).
+
+    As referências são identificadas pelo caminho real da biblioteca
+    (após resolver *links* simbólicos) e pela convenção de chamada
+    efetiva (``auto`` é resolvida pela extensão do arquivo). O registro
+    não é herdado por processos filhos criados através de ``fork``.
+    """
+    key = _shared_library_key(library_path, calling_convention)
+    with _shared_libraries_lock:
+        library = _shared_libraries.get(key)
+        if library is None:
+            library = ReferenceLibrary(library_path, calling_convention=key[1])
+            _shared_libraries[key] = library
+        return library
+
+
+def discard_shared_library(library_path, calling_convention=AUTO) -> None:
+    """Remove do registro a referência compartilhada para a biblioteca
+    indicada (por exemplo, quando o arquivo da biblioteca for removido)."""
+    key = _shared_library_key(library_path, calling_convention)
+    with _shared_libraries_lock:
+        _shared_libraries.pop(key, None)
+
+
+def _reset_shared_libraries():
+    # um processo filho (fork) herda a memória do processo pai, inclusive
+    # o registro, com as contagens de uso e os argumentos de inicialização
+    # das instâncias do pai; no filho, nenhuma delas existe, de modo que a
+    # biblioteca deve ser inicializada novamente por quem a usar
+    global _shared_libraries_lock
+    _shared_libraries_lock = threading.Lock()
+    _shared_libraries.clear()
+
+
+os.register_at_fork(after_in_child=_reset_shared_libraries)
+
+
+def _shared_library_key(library_path, calling_convention):
+    if calling_convention == AUTO:
+        if library_path.endswith(('.DLL', '.dll')):
+            calling_convention = WINDOWS_STDCALL
+        else:
+            calling_convention = STANDARD_C
+    return os.path.realpath(library_path), calling_convention
+
+
 class ACBrLibMixin:
     pass
 
@@ -89,23 +501,122 @@ class ACBrLibReferencia(object):
             biblioteca: ReferenceLibrary,
             prototipos: Mapping[str, Signature],
             base_exception: Type[ACBrLibException],
-            encoding: str = 'utf-8'):
+            encoding: str = 'utf-8',
+            buffers: Optional[StringBufferPool] = None):
         self._prefixo = prefixo
         self._biblioteca = biblioteca
         self._prototipos = prototipos
         self._base_exception = base_exception
         self._encoding = encoding
+        self._funcoes = {}
+        self._funcoes_ref = None
+        self._buffers = StringBufferPool() if buffers is None else buffers
+        self._instrumentacao = instrumentacao_padrao()
+        self._rastreador = rastreador_padrao()
+        if not biblioteca.lazy_load:
+            self.resolver_funcoes()
+
+    @property
+    def biblioteca(self) -> ReferenceLibrary:
+        """A :class:`ReferenceLibrary` usada por esta instância, possivelmente
+        compartilhada com outras (veja :func:`shared_library`)."""
+        return self._biblioteca
+
+    @property
+    def buffers(self) -> StringBufferPool:
+        """
+        Os buffers reutilizados nas leituras das respostas. Podem ser
+        substituídos por um :class:`StringBufferPool` com outra estratégia de
+        dimensionamento ou limite de memória, por exemplo:
+
+        .. sourcecode:: python
+
+            cep.buffers = StringBufferPool(
+                    strategy=PercentileSizeStrategy,
+                    memory_cap=4 * 1024 * 1024
+                )
+        """
+        return self._buffers
+
+    @buffers.setter
+    def buffers(self, value: StringBufferPool):
+        self._buffers = value
+
+    @property
+    def instrumentacao(self) -> Optional[Instrumentacao]:
+        """
+        A :class:`~acbrlib_python.instrumentacao.Instrumentacao` das chamadas
+        à biblioteca, ou ``None``. Por padrão, a instrumentação ativa quando
+        a instância foi criada (veja
+        :func:`~acbrlib_python.instrumentacao.ativar`).
+        """
+        return self._instrumentacao
+
+    @instrumentacao.setter
+    def instrumentacao(self, value: Optional[Instrumentacao]):
+        self._instrumentacao = value
+        # os ponteiros de função são (ou não) instrumentados ao serem
+        # resolvidos, de modo que não haja custo algum sem instrumentação
+        self.descartar_funcoes()
+
+    @property
+    def rastreador(self) -> Optional[Rastreador]:
+        """
+        O :class:`~acbrlib_python.rastreamento.Rastreador` das operações
+        desta instância, ou ``None``. Por padrão, o rastreador ativo quando
+        a instância foi criada (veja
+        :func:`~acbrlib_python.rastreamento.ativar`).
+        """
+        return self._rastreador
+
+    @rastreador.setter
+    def rastreador(self, value: Optional[Rastreador]):
+        self._rastreador = value
+
+    def resolver_funcoes(self) -> None:
+        """
+        Resolve antecipadamente todos os ponteiros de função descritos nos
+        protótipos, em vez de resolvê-los conforme forem sendo invocados.
+        """
+        for metodo in self._prototipos:
+            self._invocar(metodo)
+
+    def descartar_funcoes(self) -> None:
+        """
+        Descarta os ponteiros de função já resolvidos. Serão resolvidos
+        novamente, a partir da referência atual da biblioteca, conforme
+        forem sendo invocados.
+        """
+        self._funcoes = {}
+        self._funcoes_ref = None
 
     def _invocar(self, metodo: str):
-        if metodo not in self._prototipos:
-            raise ValueError(f'Metodo/funcao desconhecido: {metodo}')
-        proto = self._prototipos.get(metodo)
-        fptr = getattr(self._biblioteca.ref, metodo)
-        fptr.argtypes = proto.argtypes
-        fptr.restype = proto.restype
+        ref = self._biblioteca.ref
+        if ref is not self._funcoes_ref:
+            # a biblioteca foi (re)carregada; os ponteiros de função
+            # resolvidos anteriormente não são mais válidos
+            self._funcoes = {}
+            self._funcoes_ref = ref
+        fptr = self._funcoes.get(metodo)
+        if fptr is None:
+            if metodo not in self._prototipos:
+                raise ValueError(f'Metodo/funcao desconhecido: {metodo}')
+            proto = self._prototipos.get(metodo)
+            # acessar por item (e não como atributo) resulta em um novo
+            # ponteiro de função, cujos tipos de argumentos não serão
+            # compartilhados com outras instâncias que usem a mesma CDLL
+            fptr = ref[metodo]
+            fptr.argtypes = proto.argtypes
+            fptr.restype = proto.restype
+            if self._instrumentacao is not None:
+                fptr = self._instrumentacao.instrumentar(metodo, fptr)
+            self._funcoes[metodo] = fptr
         return fptr
 
-    def _b(self, value: str) -> bytes:
+    def _b(self, value: Union[str, bytes]) -> bytes:
+        if isinstance(value, bytes):
+            # argumentos já codificados são repassados sem cópia
+            return value
         return value.encode(self._encoding)
 
     def _s(self, value: bytes) -> str:
@@ -133,24 +644,86 @@ def read_string_buffer(
         Se houver um parâmetro chamado ``buffer_len`` (*int*), ele será
         utilizado como referência para o tamanho do buffer a ser lido.
         Se não for informado será usado o valor da constante
-        :attr:`acbrlib_python.constantes.BUFFER_LENGTH`.
+        :attr:`acbrlib_python.constantes.BUFFER_LENGTH`. Um parâmetro
+        chamado ``mensagens`` (veja :func:`read_buffer`) também não é
+        passado para o método.
 
     :return: Retorna o buffer string já convertido para o encoding da
         implementação definido em :class:`ACBrLibReferencia`.
+
+    Se a implementação possuir um :class:`StringBufferPool` (atributo
+    ``buffers``) o buffer do método será reutilizado e, se a resposta não
+    couber, ampliado para as próximas chamadas. Neste caso, ``buffer_len``
+    será considerado apenas para o primeiro buffer do método.
     """
-    buffer_len = kwargs.pop('buffer_len', BUFFER_LENGTH)
-    str_buffer = create_string_buffer(buffer_len)
+    return read_buffer(impl, method_name, *args, **kwargs)
+
+
+def read_buffer(
+        impl: Union[ACBrLibReferencia, ACBrLibMixin],
+        method_name: str,
+        *args,
+        processar: Optional[Callable[[memoryview], Any]] = None,
+        mensagens: Optional[Mapping[int, str]] = None,
+        **kwargs):
+    """
+    Como :func:`read_string_buffer`, mas, se ``processar`` for informado, a
+    resposta não é copiada nem decodificada: ``processar`` é invocada com um
+    ``memoryview`` da resposta (sem o terminador nulo) diretamente sobre o
+    buffer ``ctypes`` e o seu resultado é retornado. Como o buffer pode ser
+    reutilizado na próxima chamada, ``processar`` não deve manter referências
+    ao ``memoryview`` após retornar.
+
+    :param mensagens: Opcional. Mensagens da exceção para cada código de
+        retorno de erro do método.
+    """
+    buffer_len = kwargs.pop('buffer_len', None)
+    pool = getattr(impl, 'buffers', None)
+    if pool is None:
+        str_buffer = create_string_buffer(buffer_len or BUFFER_LENGTH)
+    else:
+        str_buffer = pool.acquire(method_name, buffer_len)
+    buffer_len = len(str_buffer)
     int_size = c_int(buffer_len)
     mod_args = list(args) + [str_buffer, byref(int_size)]
-    retval = getattr(impl, '_invocar')(method_name)(*mod_args, **kwargs)
+    fptr = getattr(impl, '_invocar')(method_name)
+    rastreador = getattr(impl, '_rastreador', None)
+    if rastreador is None:
+        retval = fptr(*mod_args, **kwargs)
+    else:
+        with rastreador.iniciar(method_name, {METODO: method_name}) as span:
+            retval = fptr(*mod_args, **kwargs)
+            span.definir_atributo(RETORNO, retval)
+            span.definir_atributo(TAMANHO_RESPOSTA, int_size.value)
     if retval == 0:
         if int_size.value > buffer_len:
-            return impl.ultimo_retorno(buffer_len=int_size.value)
+            if pool is not None:
+                pool.reread(method_name, int_size.value)
+            instr = getattr(impl, '_instrumentacao', None)
+            if instr is not None:
+                instr.releitura(method_name, int_size.value)
+            bruto = processar is not None
+            if rastreador is None:
+                resposta = impl.ultimo_retorno(int_size.value, como_memoryview=bruto)
+            else:
+                with rastreador.iniciar('ultimo_retorno', {
+                        METODO: method_name,
+                        TAMANHO_RESPOSTA: int_size.value}):
+                    resposta = impl.ultimo_retorno(int_size.value, como_memoryview=bruto)
+            return processar(resposta) if bruto else resposta
         else:
+            if pool is not None:
+                pool.hit(method_name, int_size.value)
+            if processar is not None:
+                return processar(memoryview(str_buffer)[:int_size.value])
             return getattr(impl, '_s')(str_buffer.value)
     else:
         exc = getattr(impl, '_base_exception')
-        raise exc(metodo=method_name, retorno=retval)
+        raise exc(
+                metodo=method_name,
+                retorno=retval,
+                mensagem=mensagens.get(retval) if mensagens else None
+            )
 
 
 def common_method_prototypes(
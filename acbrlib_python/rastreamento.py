@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+#
+# acbrlib_python/rastreamento.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Rastreamento (*tracing*) das operações da biblioteca. Quando um
+:class:`Rastreador` é associado a uma instância, cada busca resulta em um
+*span* com *spans* filhos para a chamada à função nativa, para a releitura
+da resposta através de ``XXX_UltimoRetorno`` (se houver) e para o
+processamento da resposta, de modo que uma busca lenta possa ser atribuída
+à biblioteca nativa ou ao processamento em Python.
+
+Não há dependência de qualquer biblioteca de rastreamento. Para enviar os
+*spans* ao OpenTelemetry (que precisa estar instalado):
+
+.. sourcecode:: python
+
+    from acbrlib_python import rastreamento
+
+    rastreamento.ativar(rastreamento.RastreadorOpenTelemetry())
+
+Os atributos registrados nos *spans* são:
+
+* ``acbrlib.metodo``: o nome da função nativa;
+* ``acbrlib.retorno``: o código de retorno da função nativa;
+* ``acbrlib.tamanho_resposta``: o tamanho da resposta, em *bytes*;
+* ``acbrlib.enderecos``: a quantidade de endereços resultante;
+* ``acbrlib.origem``: de onde veio o resultado de uma busca, sem ou antes
+  de invocar a biblioteca: ``indice``, ``cache``, ``coalescida`` (aguardou
+  a mesma busca, já em andamento) ou ``biblioteca``.
+"""
+
+import contextvars
+import threading
+import time
+
+from typing import Any
+from typing import List
+from typing import Mapping
+from typing import Optional
+
+METODO = 'acbrlib.metodo'
+
+RETORNO = 'acbrlib.retorno'
+
+TAMANHO_RESPOSTA = 'acbrlib.tamanho_resposta'
+
+ENDERECOS = 'acbrlib.enderecos'
+
+ORIGEM = 'acbrlib.origem'
+
+_padrao = None
+
+
+class Span(object):
+    """
+    Uma operação rastreada. É um *context manager*: o *span* termina ao
+    final do bloco e, se houver, a exceção é registrada (mas não
+    suprimida). Esta implementação não faz coisa alguma.
+    """
+
+    def definir_atributo(self, chave: str, valor: Any) -> None:
+        pass
+
+    def registrar_excecao(self, excecao: BaseException) -> None:
+        pass
+
+    def finalizar(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None:
+            self.registrar_excecao(exc_val)
+        self.finalizar()
+
+
+NULO = Span()
+"""*Span* que não faz coisa alguma, usado quando não há rastreador."""
+
+
+class Rastreador(object):
+    """Interface dos rastreadores."""
+
+    def iniciar(self, nome: str, atributos: Optional[Mapping[str, Any]] = None) -> Span:
+        """
+        Inicia um *span*, filho do *span* corrente (se houver), que se
+        tornará o *span* corrente até que termine.
+        """
+        raise NotImplementedError()
+
+
+def span(
+        rastreador: Optional[Rastreador],
+        nome: str,
+        atributos: Optional[Mapping[str, Any]] = None) -> Span:
+    """Inicia um *span* através do rastreador ou, se não houver, resulta
+    :data:`NULO`."""
+    if rastreador is None:
+        return NULO
+    return rastreador.iniciar(nome, atributos)
+
+
+def ativar(rastreador: Rastreador) -> Rastreador:
+    """
+    Define o rastreador padrão, usado pelas instâncias da biblioteca
+    criadas a partir de então (veja :attr:`ACBrLibReferencia.rastreador
+    <acbrlib_python.proto.ACBrLibReferencia.rastreador>`).
+    """
+    global _padrao
+    _padrao = rastreador
+    return rastreador
+
+
+def desativar() -> None:
+    """Remove o rastreador padrão. Veja :func:`ativar`."""
+    global _padrao
+    _padrao = None
+
+
+def padrao() -> Optional[Rastreador]:
+    """Resulta o rastreador padrão ou ``None``. Veja :func:`ativar`."""
+    return _padrao
+
+
+class SpanMemoria(Span):
+    """*Span* registrado por :class:`RastreadorMemoria`."""
+
+    def __init__(self, rastreador, nome, pai, atributos):
+        self._rastreador = rastreador
+        self.nome = nome
+        self.pai = pai
+        self.atributos = dict(atributos or {})
+        self.excecao = None
+        self.inicio = rastreador.relogio()
+        self.fim = None
+        self._token = rastreador._corrente.set(self)
+
+    @property
+    def duracao(self) -> Optional[float]:
+        return None if self.fim is None else self.fim - self.inicio
+
+    def definir_atributo(self, chave: str, valor: Any) -> None:
+        self.atributos[chave] = valor
+
+    def registrar_excecao(self, excecao: BaseException) -> None:
+        self.excecao = excecao
+
+    def finalizar(self) -> None:
+        if self.fim is None:
+            self.fim = self._rastreador.relogio()
+            self._rastreador._corrente.reset(self._token)
+            self._rastreador._registrar(self)
+
+    def __repr__(self):
+        return (
+                f'{self.__class__.__name__}(nome={self.nome!r}, '
+                f'atributos={self.atributos!r}, duracao={self.duracao!r})'
+            )
+
+
+class RastreadorMemoria(Rastreador):
+    """
+    Mantém em memória os *spans* terminados, na ordem em que terminaram.
+    Útil em testes e na investigação de problemas.
+    """
+
+    def __init__(self, relogio=time.perf_counter):
+        self.relogio = relogio
+        self._corrente = contextvars.ContextVar('span_corrente', default=None)
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def iniciar(self, nome: str, atributos: Optional[Mapping[str, Any]] = None) -> Span:
+        return SpanMemoria(self, nome, self._corrente.get(), atributos)
+
+    def _registrar(self, span: SpanMemoria) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[SpanMemoria]:
+        with self._lock:
+            return self._spans[:]
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class _SpanOpenTelemetry(Span):
+
+    def __init__(self, gerenciador):
+        self._gerenciador = gerenciador
+        self._span = gerenciador.__enter__()
+
+    def definir_atributo(self, chave: str, valor: Any) -> None:
+        self._span.set_attribute(chave, valor)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # o OpenTelemetry registra a exceção e o estado do span
+        return self._gerenciador.__exit__(exc_type, exc_val, exc_tb)
+
+    def finalizar(self) -> None:
+        self._gerenciador.__exit__(None, None, None)
+
+
+class RastreadorOpenTelemetry(Rastreador):
+    """
+    Adaptador para o OpenTelemetry, que é importado apenas quando este
+    rastreador for criado.
+
+    :param tracer: Opcional. O ``opentelemetry.trace.Tracer``. Se não for
+        informado, será obtido do *tracer provider* global.
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer('acbrlib_python')
+        self._tracer = tracer
+
+    def iniciar(self, nome: str, atributos: Optional[Mapping[str, Any]] = None) -> Span:
+        return _SpanOpenTelemetry(
+                self._tracer.start_as_current_span(nome, attributes=atributos)
+            )
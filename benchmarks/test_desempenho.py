@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+#
+# benchmarks/test_desempenho.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""
+Suíte de *benchmarks* (requer ``pytest-benchmark``), executada contra a
+biblioteca *stub* em ``tests/stub``. Não faz parte da execução normal dos
+testes; veja a seção "Benchmarks" do ``README.rst``.
+"""
+
+import configparser
+import gc
+import io
+import os
+import random
+import subprocess
+import sys
+import tracemalloc
+
+from unittest import mock
+
+import pytest
+
+from acbrlib_python.cep import impl
+from acbrlib_python.cep.impl import processar_resposta
+from acbrlib_python.cep.impl import processar_resposta_bytes
+from acbrlib_python.cep.modelos import Endereco
+from acbrlib_python.cep.modelos import EnderecoBatch
+from acbrlib_python.instrumentacao import ColetorMemoria
+from acbrlib_python.instrumentacao import Instrumentacao
+from acbrlib_python.proto import read_string_buffer
+from tests import stub
+
+pytest.importorskip('pytest_benchmark')
+
+# quantidade de endereços do relatório de memória; a base de CEPs tem
+# cerca de um milhão, mas o padrão é menor para que a suíte seja rápida
+QUANTIDADE_MEMORIA = int(os.environ.get('ACBRLIB_BENCH_ENDERECOS', 20_000))
+
+UFS = [
+        'AC', 'AL', 'AM', 'AP', 'BA', 'CE', 'DF', 'ES', 'GO', 'MA', 'MG',
+        'MS', 'MT', 'PA', 'PB', 'PE', 'PI', 'PR', 'RJ', 'RN', 'RO', 'RR',
+        'RS', 'SC', 'SE', 'SP', 'TO',
+    ]
+
+TIPOS = ['Rua', 'Avenida', 'Travessa', 'Alameda', 'Praça', 'Rodovia', 'Estrada']
+
+
+def resposta_sintetica(quantidade: int) -> str:
+    linhas = []
+    for i in range(quantidade):
+        cep = f'{18270000 + i:08d}'
+        linhas.extend([
+                f'[Endereco{i + 1}]',
+                'Bairro=Centro',
+                f'CEP={cep[:5]}-{cep[5:]}',
+                'Complemento=',
+                'IBGE_Municipio=3554003',
+                'IBGE_UF=35',
+                f'Logradouro=Rua Coronel Aureliano de Camargo {i}',
+                'Municipio=Tatuí',
+                'Tipo_Logradouro=Rua',
+                'UF=SP',
+                '',
+            ])
+    linhas.extend(['[CEP]', f'Quantidade={quantidade}'])
+    return '\n'.join(linhas)
+
+
+def processar_resposta_configparser(resposta: str):
+    # o processamento anterior, baseado em configparser, como referência
+    parser = configparser.ConfigParser()
+    parser.read_file(io.StringIO(resposta))
+    opcoes = [
+            'Tipo_Logradouro', 'Logradouro', 'Complemento', 'Bairro',
+            'Municipio', 'UF', 'CEP', 'IBGE_Municipio', 'IBGE_UF',
+        ]
+    enderecos = []
+    for i in range(parser.getint('CEP', 'Quantidade')):
+        secao = f'Endereco{i + 1}'
+        kwargs = {}
+        for opcao in opcoes:
+            if not parser.has_option(secao, opcao):
+                raise ValueError(opcao)
+            kwargs[opcao.lower()] = parser.get(secao, opcao)
+        enderecos.append(Endereco(**kwargs))
+    return enderecos
+
+
+def respostas_base_cep(quantidade: int, por_resposta: int = 1000):
+    # a distribuição dos valores imita a base de CEPs: 27 UFs, cerca de
+    # 5.570 municípios, algumas dezenas de milhares de bairros e
+    # logradouros e CEPs praticamente únicos
+    aleatorio = random.Random(42)
+    municipios = [
+            (f'Município {i}', f'{1100000 + i * 7:07d}', aleatorio.randrange(27))
+            for i in range(5570)
+        ]
+    bairros = [f'Bairro {i}' for i in range(40000)]
+    for inicio in range(0, quantidade, por_resposta):
+        linhas = []
+        total = min(por_resposta, quantidade - inicio)
+        for n in range(total):
+            municipio, ibge, uf = aleatorio.choice(municipios)
+            cep = f'{inicio + n + 1000000:08d}'
+            linhas.extend([
+                    f'[Endereco{n + 1}]',
+                    f'Tipo_Logradouro={aleatorio.choice(TIPOS)}',
+                    f'Logradouro=Logradouro {aleatorio.randrange(200000)}',
+                    'Complemento=',
+                    f'Bairro={aleatorio.choice(bairros)}',
+                    f'Municipio={municipio}',
+                    f'UF={UFS[uf]}',
+                    f'CEP={cep[:5]}-{cep[5:]}',
+                    f'IBGE_Municipio={ibge}',
+                    f'IBGE_UF={11 + uf}',
+                ])
+        linhas.extend(['[CEP]', f'Quantidade={total}'])
+        yield '\n'.join(linhas)
+
+
+@pytest.mark.parametrize('codigo', [
+        'pass',
+        'import acbrlib_python',
+        'import acbrlib_python.constantes',
+        'from acbrlib_python import ACBrLibCEP',
+        'from acbrlib_python import AsyncACBrLibCEP',
+    ], ids=['interpretador', 'pacote', 'constantes', 'ACBrLibCEP', 'AsyncACBrLibCEP'])
+def test_tempo_de_importacao(benchmark, codigo):
+    # cada rodada é um novo interpretador (inclusive o tempo de inicialização
+    # do próprio Python, medido à parte em "interpretador")
+    comando = [sys.executable, '-c', codigo]
+    benchmark.pedantic(subprocess.run, args=(comando,), kwargs={'check': True}, rounds=20)
+
+
+def test_invocar_resolucao(benchmark, cep):
+    benchmark(cep._invocar, 'CEP_Nome')
+
+
+def test_invocar_chamada(benchmark, cep):
+    fptr = cep._invocar('CEP_ConfigGravar')
+    assert benchmark(fptr, b'') == 0
+
+
+@pytest.mark.parametrize('instrumentada', [False, True], ids=['sem', 'com-instrumentacao'])
+def test_versao(benchmark, cep, instrumentada):
+    if instrumentada:
+        cep.instrumentacao = Instrumentacao(ColetorMemoria())
+    assert benchmark(cep.versao) == '0.0.1-stub'
+
+
+def test_read_string_buffer_resposta_pequena(benchmark, cep):
+    assert benchmark(read_string_buffer, cep, 'CEP_Versao') == '0.0.1-stub'
+
+
+@pytest.mark.parametrize('reutilizar', [False, True], ids=['releitura', 'buffer-ampliado'])
+def test_read_string_buffer_resposta_grande(benchmark, cep, biblioteca_stub, reutilizar):
+    # cerca de 44 KB: muito maior que o buffer inicial; sem reutilizar o
+    # buffer ampliado, toda chamada depende da releitura (CEP_UltimoRetorno)
+    stub.configurar(biblioteca_stub, enderecos_logradouro=250)
+    metodo = 'CEP_BuscarPorLogradouro'
+    argumentos = (cep, metodo, b'', b'', b'', b'', b'')
+    setup = None if reutilizar else cep.buffers.clear
+    read_string_buffer(*argumentos)
+    resposta = benchmark.pedantic(
+            read_string_buffer,
+            args=argumentos,
+            setup=setup,
+            rounds=500,
+            warmup_rounds=10
+        )
+    assert len(resposta) > 40000
+    estatisticas = cep.buffers.stats(metodo)
+    assert (estatisticas.rereads > 1) is not reutilizar
+
+
+@pytest.mark.parametrize('quantidade', [1, 20, 500])
+def test_processar_resposta(benchmark, quantidade):
+    resposta = resposta_sintetica(quantidade)
+    assert len(benchmark(processar_resposta, resposta)) == quantidade
+
+
+@pytest.mark.parametrize('quantidade', [1, 20, 500])
+def test_processar_resposta_configparser(benchmark, quantidade):
+    resposta = resposta_sintetica(quantidade)
+    enderecos = benchmark(processar_resposta_configparser, resposta)
+    assert enderecos == processar_resposta(resposta)
+
+
+@pytest.mark.parametrize('quantidade', [1, 20, 500])
+def test_processar_resposta_bytes(benchmark, quantidade):
+    resposta = memoryview(resposta_sintetica(quantidade).encode('utf-8'))
+    assert len(benchmark(processar_resposta_bytes, resposta)) == quantidade
+
+
+def test_buscar_por_cep(benchmark, cep):
+    enderecos = benchmark(cep.buscar_por_cep, '18270-170')
+    assert enderecos[0].cep == '18270-170'
+
+
+def test_buscar_por_cep_com_latencia(benchmark, cep, biblioteca_stub):
+    # 200 us por busca, simulando uma consulta a um serviço local
+    stub.configurar(biblioteca_stub, latencia_us=200)
+    enderecos = benchmark.pedantic(cep.buscar_por_cep, args=('18270170',), rounds=200)
+    assert len(enderecos) == 1
+
+
+def test_memoria_enderecos(benchmark):
+    # a memória ocupada pelos endereços, com e sem o internamento dos
+    # atributos que se repetem e num EnderecoBatch, é registrada nas
+    # informações extras do resultado (veja --benchmark-json); o tempo
+    # medido é o da construção do EnderecoBatch
+
+    def enderecos(resultado):
+        for resposta in respostas_base_cep(QUANTIDADE_MEMORIA):
+            resultado.extend(impl.processar_resposta(resposta))
+        return resultado
+
+    def memoria(construir):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            resultado = construir()
+            atual, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del resultado
+        return atual
+
+    with mock.patch.object(impl, 'internar', lambda valores: valores):
+        sem_internar = memoria(lambda: enderecos([]))
+    internados = memoria(lambda: enderecos([]))
+    em_lote = memoria(lambda: enderecos(EnderecoBatch()))
+    benchmark.extra_info.update({
+            'enderecos': QUANTIDADE_MEMORIA,
+            'mib_sem_internar': sem_internar / 2 ** 20,
+            'mib_internados': internados / 2 ** 20,
+            'mib_endereco_batch': em_lote / 2 ** 20,
+        })
+    assert internados < sem_internar
+    if QUANTIDADE_MEMORIA >= 20_000:
+        # com poucos endereços, os dicionários das colunas codificadas
+        # custam mais do que economizam
+        assert em_lote < internados
+    lote = benchmark.pedantic(lambda: enderecos(EnderecoBatch()), rounds=3)
+    assert len(lote) == QUANTIDADE_MEMORIA
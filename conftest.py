@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# conftest.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Fixtures compartilhadas pelos testes (``tests``) e pelos *benchmarks*
+(``benchmarks``)."""
+
+import subprocess
+
+import pytest
+
+from acbrlib_python import ACBrLibCEP
+from tests import stub
+
+
+@pytest.fixture(scope='session')
+def biblioteca_stub(tmp_path_factory):
+    """Caminho para a biblioteca *stub* da ACBrLibCEP, compilada."""
+    try:
+        return stub.compilar(str(tmp_path_factory.mktemp('stub')))
+    except (RuntimeError, subprocess.CalledProcessError) as ex:
+        pytest.skip(f'Nao foi possivel compilar a biblioteca stub: {ex}')
+
+
+@pytest.fixture
+def cep(biblioteca_stub):
+    """Instância inicializada da ACBrLibCEP, usando a biblioteca *stub*
+    com a configuração padrão (sem latência)."""
+    stub.configurar(
+            biblioteca_stub,
+            latencia_us=0,
+            enderecos_cep=1,
+            enderecos_logradouro=20
+        )
+    with ACBrLibCEP.usando(biblioteca_stub) as instancia:
+        yield instancia
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_assincrono.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from acbrlib_python.cep import AsyncACBrLibCEP
+
+
+class _FonteLenta:
+
+    tamanho = 2
+
+    def __init__(self, espera):
+        self.espera = espera
+        self.em_andamento = 0
+        self.maximo = 0
+        self._lock = threading.Lock()
+
+    def buscar_por_cep(self, numero):
+        with self._lock:
+            self.em_andamento += 1
+            self.maximo = max(self.maximo, self.em_andamento)
+        time.sleep(self.espera)
+        with self._lock:
+            self.em_andamento -= 1
+        return [numero]
+
+
+def test_usando_buscar_por_cep(biblioteca_stub):
+    async def buscar():
+        async with AsyncACBrLibCEP.usando(biblioteca_stub, tamanho=2) as cep:
+            return await asyncio.gather(
+                    cep.buscar_por_cep('18270170'),
+                    cep.buscar_por_cep('01001000'),
+                    cep.buscar_por_logradouro(logradouro='Rua'),
+                )
+    por_cep1, por_cep2, por_logradouro = asyncio.run(buscar())
+    assert por_cep1[0].cep == '18270-170'
+    assert por_cep2[0].cep == '01001-000'
+    assert len(por_logradouro) == 20
+
+
+def test_limite_de_chamadas_em_andamento():
+    fonte = _FonteLenta(0.02)
+
+    async def buscar():
+        cep = AsyncACBrLibCEP(fonte)
+        try:
+            return await asyncio.gather(*[cep.buscar_por_cep(str(i)) for i in range(8)])
+        finally:
+            cep.fechar(aguardar=True)
+
+    assert len(asyncio.run(buscar())) == 8
+    assert fonte.maximo == 2
+
+
+def test_timeout():
+    fonte = _FonteLenta(0.2)
+
+    async def buscar():
+        cep = AsyncACBrLibCEP(fonte, limite=1)
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await cep.buscar_por_cep('18270170', timeout=0.01)
+            # a vaga continua ocupada pela chamada abandonada
+            with pytest.raises(asyncio.TimeoutError):
+                await cep.buscar_por_cep('18270170', timeout=0.01)
+            return await cep.buscar_por_cep('18270170', timeout=1)
+        finally:
+            cep.fechar(aguardar=True)
+
+    assert asyncio.run(buscar()) == ['18270170']
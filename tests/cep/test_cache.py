@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_cache.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from concurrent.futures import ProcessPoolExecutor
+
+from acbrlib_python import ACBrLibCEP
+from acbrlib_python.cep.cache import CacheEnderecos
+from acbrlib_python.cep.cache import CachePersistente
+from acbrlib_python.cep.impl import chave_logradouro
+from acbrlib_python.cep.modelos import Endereco
+
+ENDERECO = Endereco(
+        tipo_logradouro='',
+        logradouro='Rua Coronel Aureliano de Camargo',
+        complemento='',
+        bairro='Centro',
+        municipio='Tatuí',
+        uf='SP',
+        cep='18270-170',
+        ibge_municipio='3554003',
+        ibge_uf='35'
+    )
+
+
+class _Relogio:
+
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_cache_ttl():
+    relogio = _Relogio()
+    cache = CacheEnderecos(ttl=10, ttl_negativo=1, relogio=relogio)
+    cache.guardar('18270170', [ENDERECO])
+    cache.guardar('00000000', [])
+    assert cache.obter('18270170') == [ENDERECO]
+    assert cache.obter('00000000') == []
+
+    relogio.agora = 5
+    assert cache.obter('18270170') == [ENDERECO]
+    assert cache.obter('00000000') is None
+
+    relogio.agora = 10
+    assert cache.obter('18270170') is None
+
+    estatisticas = cache.estatisticas
+    assert estatisticas.acertos == 3
+    assert estatisticas.acertos_negativos == 1
+    assert estatisticas.falhas == 2
+    assert estatisticas.expirados == 2
+
+
+def test_cache_lru():
+    cache = CacheEnderecos(tamanho_maximo=2)
+    cache.guardar('1', [ENDERECO])
+    cache.guardar('2', [ENDERECO])
+    assert cache.obter('1') is not None
+    cache.guardar('3', [ENDERECO])
+    assert cache.obter('2') is None
+    assert cache.obter('1') is not None
+    assert cache.estatisticas.descartados == 1
+
+
+def test_chave_logradouro():
+    assert chave_logradouro(logradouro=' Rua  Brasil ', uf='sp') == \
+        chave_logradouro(logradouro='RUA BRASIL', uf='SP')
+
+
+def test_buscar_por_cep_com_cache(biblioteca_stub):
+    cache = CacheEnderecos()
+    with ACBrLibCEP.usando(biblioteca_stub, cache=cache) as cep:
+        primeira = cep.buscar_por_cep('18270-170')
+        segunda = cep.buscar_por_cep('18270170')
+        cep.buscar_por_logradouro(logradouro='Rua Brasil')
+        cep.buscar_por_logradouro(logradouro='rua brasil')
+        chamadas = cep.buffers.stats('CEP_BuscarPorCEP').hits
+    assert primeira == segunda
+    assert chamadas == 1
+    assert cache.estatisticas.acertos == 2
+    assert cache.estatisticas.falhas == 2
+
+
+def _escrever(arquivo, inicio):
+    cache = CachePersistente(arquivo)
+    for i in range(inicio, inicio + 50):
+        cache.guardar(f'{i:08d}', [ENDERECO])
+
+
+def test_cache_persistente(tmp_path):
+    relogio = _Relogio()
+    arquivo = str(tmp_path / 'cep.sqlite')
+    cache = CachePersistente(arquivo, ttl=10, ttl_negativo=1, relogio=relogio)
+    cache.guardar('18270170', [ENDERECO])
+    cache.guardar('00000000', [])
+    cache.guardar(chave_logradouro(logradouro='Rua Brasil'), [ENDERECO, ENDERECO])
+
+    # outra instância (como em outro processo) enxerga as mesmas entradas
+    outro = CachePersistente(arquivo, ttl=10, relogio=relogio)
+    assert outro.obter('18270170') == [ENDERECO]
+    assert outro.obter('00000000') == []
+    assert outro.obter(chave_logradouro(logradouro='rua brasil')) == [ENDERECO] * 2
+
+    relogio.agora = 5
+    assert outro.obter('00000000') is None
+    assert outro.compactar() == 1
+
+    relogio.agora = 10
+    assert outro.obter('18270170') is None
+    assert outro.compactar(vacuum=False) == 2
+    assert outro.estatisticas.expirados == 2
+
+
+def test_cache_persistente_entre_processos(tmp_path):
+    arquivo = str(tmp_path / 'cep.sqlite')
+    CachePersistente(arquivo)
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_escrever, [arquivo] * 4, range(0, 200, 50)))
+    cache = CachePersistente(arquivo)
+    assert all(cache.obter(f'{i:08d}') == [ENDERECO] for i in range(200))
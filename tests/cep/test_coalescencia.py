@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_coalescencia.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import asyncio
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from acbrlib_python.cep.assincrono import CoalescedorAsync
+from acbrlib_python.cep.coalescencia import Coalescedor
+
+
+def _aguardar(condicao, timeout=5):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        assert time.monotonic() < limite
+        time.sleep(0.001)
+
+
+def test_coalescedor_uma_chamada():
+    liberar = threading.Event()
+    chamadas = []
+
+    def buscar():
+        chamadas.append(1)
+        liberar.wait(5)
+        return ['endereco']
+
+    coalescedor = Coalescedor()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futuros = [executor.submit(coalescedor.executar, '18270170', buscar) for _ in range(4)]
+        _aguardar(lambda: coalescedor.coalescidas == 3)
+        liberar.set()
+        resultados = [f.result() for f in futuros]
+    assert chamadas == [1]
+    assert resultados == [['endereco']] * 4
+    # cada chamada recebe a sua própria lista
+    assert len({id(r) for r in resultados}) == 4
+    assert coalescedor.em_andamento == 0
+    # concluída a busca, a próxima chamada busca novamente
+    coalescedor.executar('18270170', buscar)
+    assert chamadas == [1, 1]
+
+
+def test_coalescedor_mesma_excecao_para_todos():
+    liberar = threading.Event()
+
+    def buscar():
+        liberar.wait(5)
+        raise RuntimeError('falhou')
+
+    coalescedor = Coalescedor()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futuros = [executor.submit(coalescedor.executar, 'chave', buscar) for _ in range(3)]
+        _aguardar(lambda: coalescedor.coalescidas == 2)
+        liberar.set()
+        for futuro in futuros:
+            with pytest.raises(RuntimeError):
+                futuro.result()
+    assert coalescedor.em_andamento == 0
+
+
+def test_coalescedor_chaves_distintas_nao_coalescem():
+    coalescedor = Coalescedor()
+    assert coalescedor.executar('a', lambda: 1) == 1
+    assert coalescedor.executar('b', lambda: 2) == 2
+    assert coalescedor.coalescidas == 0
+
+
+def test_coalescedor_async():
+    chamadas = []
+
+    async def buscar():
+        chamadas.append(1)
+        await asyncio.sleep(0.01)
+        return ['endereco']
+
+    async def executar():
+        coalescedor = CoalescedorAsync()
+        resultados = await asyncio.gather(
+                *[coalescedor.executar('18270170', buscar) for _ in range(5)])
+        return coalescedor, resultados
+
+    coalescedor, resultados = asyncio.run(executar())
+    assert chamadas == [1]
+    assert coalescedor.coalescidas == 4
+    assert coalescedor.em_andamento == 0
+    assert resultados == [['endereco']] * 5
+
+
+def test_coalescedor_async_desistencia():
+    canceladas = []
+
+    async def buscar():
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            canceladas.append(1)
+            raise
+        return 'resultado'
+
+    async def executar():
+        coalescedor = CoalescedorAsync()
+        # quem desiste não afeta quem continua aguardando
+        desiste = asyncio.wait_for(coalescedor.executar('chave', buscar), 0.001)
+        aguarda = coalescedor.executar('chave', buscar)
+        resultados = await asyncio.gather(desiste, aguarda, return_exceptions=True)
+        assert isinstance(resultados[0], asyncio.TimeoutError)
+        assert resultados[1] == 'resultado'
+        assert canceladas == []
+        # se todos desistirem, a busca é cancelada
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(coalescedor.executar('chave', buscar), 0.001)
+        await asyncio.sleep(0)
+        assert canceladas == [1]
+        assert coalescedor.em_andamento == 0
+
+    asyncio.run(executar())
+
+
+def test_coalescedor_async_nova_chamada_apos_desistencia():
+    async def buscar():
+        await asyncio.sleep(0.02)
+        return 'resultado'
+
+    async def executar():
+        coalescedor = CoalescedorAsync()
+        desiste = asyncio.ensure_future(coalescedor.executar('chave', buscar))
+        await asyncio.sleep(0)
+        desiste.cancel()
+        await asyncio.sleep(0)
+        # todos desistiram e a task compartilhada foi cancelada, mas ainda
+        # não terminou: a nova chamada não deve aguardá-la
+        assert desiste.cancelled()
+        return await coalescedor.executar('chave', buscar)
+
+    assert asyncio.run(executar()) == 'resultado'
+
+
+def test_coalescedor_tempo_de_espera_de_quem_aguarda():
+    liberar = threading.Event()
+
+    def buscar():
+        liberar.wait(5)
+        return 'resultado'
+
+    coalescedor = Coalescedor()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        lider = executor.submit(coalescedor.executar, 'chave', buscar, 5)
+        _aguardar(lambda: coalescedor.em_andamento == 1)
+        with pytest.raises(TimeoutError):
+            coalescedor.executar('chave', buscar, timeout=0.01)
+        liberar.set()
+        assert lider.result() == 'resultado'
+    assert coalescedor.em_andamento == 0
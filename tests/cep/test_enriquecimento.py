@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_enriquecimento.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import csv
+import io
+import json
+
+import pytest
+
+from acbrlib_python.cep.__main__ import main
+from acbrlib_python.cep.enriquecimento import Progresso
+from acbrlib_python.cep.enriquecimento import enriquecer_arquivo
+
+
+def test_enriquecer_csv(biblioteca_stub, tmp_path):
+    entrada = tmp_path / 'clientes.csv'
+    entrada.write_text('nome,cep\nAna,18270-170\nBia,invalido\nCid,18270170\n')
+    saida = tmp_path / 'saida.csv'
+    assert main([
+            'enriquecer', str(entrada), str(saida),
+            '--biblioteca', biblioteca_stub,
+            '--trabalhadores', '2',
+            '--lote', '2',
+            '--prefixo', 'end_',
+            '--silencioso',
+        ]) == 0
+    with open(saida, newline='') as f:
+        linhas = list(csv.DictReader(f))
+    assert [linha['nome'] for linha in linhas] == ['Ana', 'Bia', 'Cid']
+    assert linhas[0]['end_cep'] == '18270-170'
+    assert linhas[0]['end_uf'] == 'SP'
+    assert linhas[0]['end_erro'] == ''
+    assert linhas[1]['end_logradouro'] == ''
+    assert 'nove digitos' in linhas[1]['end_erro']
+    assert linhas[2]['end_municipio'] == 'Tatuí'
+
+
+@pytest.mark.parametrize('lote', ['0', '-1'])
+def test_enriquecer_rejeita_lote_invalido(tmp_path, capsys, lote):
+    entrada = tmp_path / 'clientes.csv'
+    entrada.write_text('nome,cep\nAna,18270-170\n')
+    saida = tmp_path / 'saida.csv'
+    checkpoint = tmp_path / 'checkpoint.json'
+    with pytest.raises(SystemExit) as excinfo:
+        main([
+                'enriquecer', str(entrada), str(saida),
+                '--biblioteca', str(tmp_path / 'libacbrcep.so'),
+                '--lote', lote,
+                '--checkpoint', str(checkpoint),
+                '--silencioso',
+            ])
+    assert excinfo.value.code == 2
+    assert '--lote deve ser maior que zero' in capsys.readouterr().err
+    assert not saida.exists()
+    assert not checkpoint.exists()
+
+
+def test_enriquecer_retoma_do_checkpoint(tmp_path):
+    entrada = tmp_path / 'entrada.jsonl'
+    with open(entrada, 'w') as f:
+        for i in range(10):
+            f.write(json.dumps({'id': i, 'cep': f'{18270000 + i:08d}'}) + '\n')
+    saida = tmp_path / 'saida.jsonl'
+    checkpoint = str(tmp_path / 'progresso.json')
+    buscados = []
+
+    class Interrupcao(Exception):
+        pass
+
+    def buscar_varios_ceps(numeros):
+        for numero in numeros:
+            if len(buscados) == 5:
+                raise Interrupcao()
+            buscados.append(numero)
+            yield numero, []
+
+    try:
+        enriquecer_arquivo(
+                str(entrada), str(saida), buscar_varios_ceps,
+                tamanho_lote=3, checkpoint=checkpoint)
+    except Interrupcao:
+        pass
+    with open(saida, 'a') as f:
+        f.write('{"linha": "incompleta"')  # gravação interrompida
+
+    buscados.clear()
+
+    def buscar_varios_ceps(numeros):
+        for numero in numeros:
+            buscados.append(numero)
+            yield numero, []
+
+    assert enriquecer_arquivo(
+            str(entrada), str(saida), buscar_varios_ceps,
+            tamanho_lote=3, checkpoint=checkpoint) == 10
+    assert len(buscados) == 7  # as 3 primeiras linhas não são repetidas
+    with open(saida) as f:
+        linhas = [json.loads(texto) for texto in f]
+    assert [linha['id'] for linha in linhas] == list(range(10))
+
+
+def test_progresso():
+    tempos = iter([0.0, 10.0])
+    saida = io.StringIO()
+    progresso = Progresso(total=100, saida=saida, relogio=lambda: next(tempos))
+    progresso.atualizar(25, final=True)
+    assert saida.getvalue() == \
+        '\r25/100 (25.0%) linhas, 2.5 linhas/s, ETA 0:00:30\n'
+
+
+def test_enriquecer_sem_prefixo_preserva_cep_invalido(tmp_path):
+    entrada = tmp_path / 'entrada.csv'
+    entrada.write_text('cep\n18270170\n123\n')
+    saida = tmp_path / 'saida.csv'
+
+    def buscar_varios_ceps(numeros):
+        for numero in numeros:
+            if numero == '123':
+                yield numero, ValueError('invalido')
+            else:
+                yield numero, []
+
+    enriquecer_arquivo(str(entrada), str(saida), buscar_varios_ceps)
+    with open(saida, newline='') as f:
+        linhas = list(csv.DictReader(f))
+    assert [linha['cep'] for linha in linhas] == ['18270170', '123']
+    assert linhas[1]['erro'] == 'invalido'
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_impl.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pytest
+
+from acbrlib_python import ACBrLibCEP
+from acbrlib_python.cep.excecoes import ACBrLibCEPException
+
+
+def test_buscar_por_cep(biblioteca_stub):
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        enderecos = cep.buscar_por_cep('18270-170')
+    assert len(enderecos) == 1
+    assert enderecos[0].cep == '18270-170'
+    assert enderecos[0].municipio == 'Tatuí'
+
+
+def test_buscar_por_logradouro_resposta_maior_que_buffer(biblioteca_stub):
+    """
+    A resposta da busca por logradouro do *stub* é maior que o buffer
+    padrão, exigindo a releitura através de ``CEP_UltimoRetorno``.
+    """
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        enderecos = cep.buscar_por_logradouro(logradouro='Rua Coronel')
+    assert len(enderecos) == 20
+    assert enderecos[-1].cep == '18270-019'
+
+
+def test_buscar_por_logradouro_reutiliza_buffer_ampliado(biblioteca_stub):
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        for _ in range(3):
+            enderecos = cep.buscar_por_logradouro(logradouro='Rua Coronel')
+            assert len(enderecos) == 20
+        stats = cep.buffers.stats('CEP_BuscarPorLogradouro')
+    assert stats.rereads == 1
+    assert stats.hits == 2
+    assert stats.avoided == 2
+
+
+def test_iter_buscar_por_logradouro(biblioteca_stub):
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        enderecos = cep.iter_buscar_por_logradouro(logradouro='Rua Coronel')
+        primeiros = [next(enderecos) for _ in range(3)]
+        assert [e.cep for e in primeiros] == ['18270-000', '18270-001', '18270-002']
+        assert len(list(cep.iter_buscar_por_logradouro(logradouro='Rua'))) == 20
+
+
+def test_buscar_varios_ceps(biblioteca_stub):
+    from acbrlib_python.cep.lote import buscar_varios_ceps
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        resultados = list(cep.buscar_varios_ceps(
+                ['18270-170', '18270170', 'x', '18270171']))
+    assert [c for c, _ in resultados] == ['18270170', 'x', '18270171']
+    assert isinstance(resultados[1][1], ValueError)
+
+    consumidos = []
+
+    def numeros():
+        for i in range(100):
+            consumidos.append(i)
+            yield f'{i:08d}'
+
+    resultados = buscar_varios_ceps(
+            lambda c: [], numeros(), trabalhadores=2, janela=3)
+    next(resultados)
+    assert len(consumidos) <= 4  # a entrada é consumida sob demanda
+    resultados.close()
+
+
+def test_stub_configuravel(biblioteca_stub):
+    from tests import stub
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        stub.configurar(biblioteca_stub, enderecos_cep=3, enderecos_logradouro=200)
+        try:
+            assert len(cep.buscar_por_cep('18270170')) == 3
+            assert len(cep.buscar_por_logradouro(logradouro='Aureliano')) == 200
+        finally:
+            stub.configurar(biblioteca_stub, enderecos_cep=1, enderecos_logradouro=20)
+
+
+def test_argumentos_pre_codificados(biblioteca_stub):
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        argumento = 'Tatuí'.encode('utf-8')
+        assert cep._b(argumento) is argumento
+        assert cep.buscar_por_logradouro(logradouro=b'Aureliano', uf=b'SP') == \
+            cep.buscar_por_logradouro(logradouro='Aureliano', uf='SP')
+
+
+def test_config_valores_maiores_que_buffer(biblioteca_stub):
+    valor = 'x' * 3000
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        cep.config_gravar_valor('Principal', 'LogPath', valor)
+        assert cep.config_ler_valor('Principal', 'LogPath') == valor
+        exportada = cep.config_exportar()
+    assert f'LogPath={valor}\n' in exportada
+    assert exportada.endswith('[CEP]\nWebService=10\n')
+
+
+def test_configuracao_mantida_ate_ser_alterada(biblioteca_stub):
+    from acbrlib_python.instrumentacao import ColetorMemoria
+    from acbrlib_python.instrumentacao import Instrumentacao
+    coletor = ColetorMemoria()
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        cep.instrumentacao = Instrumentacao(coletor)
+        assert cep.configuracao()['CEP']['webservice'] == '10'
+        assert cep.configuracao() is cep.configuracao()
+        assert coletor.metricas()['CEP_ConfigExportar'].chamadas == 1
+
+        cep.config_gravar_valor('CEP', 'WebService', '4')
+        assert cep.configuracao()['CEP']['webservice'] == '4'
+        cep.config_ler('')
+        assert cep.configuracao()['CEP']['webservice'] == '10'
+        assert coletor.metricas()['CEP_ConfigExportar'].chamadas == 3
+
+        cep.descartar_configuracao()
+        cep.configuracao()
+        assert coletor.metricas()['CEP_ConfigExportar'].chamadas == 4
+
+
+def test_biblioteca_compartilhada_finalizada_pelo_ultimo(biblioteca_stub):
+    primeira = ACBrLibCEP.usar(biblioteca_stub)
+    segunda = ACBrLibCEP.usar(biblioteca_stub)
+    assert primeira._biblioteca is segunda._biblioteca
+    primeira.inicializar('', '')
+    segunda.inicializar('', '')
+    primeira.inicializar('', '')  # a mesma instância conta uma única vez
+    assert primeira._biblioteca.users == 2
+    # uma instância que não a inicializou não a finaliza
+    ACBrLibCEP.usar(biblioteca_stub).finalizar()
+    assert primeira._biblioteca.users == 2
+    primeira.finalizar()
+    primeira.finalizar()  # já finalizada, não tem efeito
+    # a biblioteca continua inicializada para a segunda instância
+    assert len(segunda.buscar_por_cep('18270170')) == 1
+    segunda.finalizar()
+    assert segunda._biblioteca.users == 0
+    with pytest.raises(ACBrLibCEPException):
+        segunda.buscar_por_cep('18270171')
+
+
+def test_configuracao_compartilhada_descartada_por_qualquer_instancia(biblioteca_stub):
+    primeira = ACBrLibCEP.usar(biblioteca_stub)
+    segunda = ACBrLibCEP.usar(biblioteca_stub)
+    primeira.inicializar('', '')
+    segunda.inicializar('', '')
+    try:
+        assert primeira.configuracao() is segunda.configuracao()
+        segunda.config_gravar_valor('CEP', 'WebService', '4')
+        assert primeira.configuracao()['CEP']['webservice'] == '4'
+    finally:
+        primeira.finalizar()
+        segunda.finalizar()
+
+
+def test_biblioteca_compartilhada_inicializada_com_outra_configuracao(biblioteca_stub):
+    primeira = ACBrLibCEP.usar(biblioteca_stub)
+    segunda = ACBrLibCEP.usar(biblioteca_stub)
+    primeira.inicializar('', '')
+    try:
+        with pytest.raises(ValueError):
+            segunda.inicializar('', 'outra chave')
+        assert primeira._biblioteca.users == 1
+        segunda.finalizar()  # não foi inicializada, não tem efeito
+        assert len(primeira.buscar_por_cep('18270170')) == 1
+    finally:
+        primeira.finalizar()
+
+
+def test_aquecer(biblioteca_stub):
+    from acbrlib_python.cep.impl import prototipos
+    with ACBrLibCEP.usando(biblioteca_stub, cep_canario='18270-170') as cep:
+        aquecimento = cep.aquecimento
+        assert set(cep._funcoes) == set(prototipos())
+        assert 'configuracao' in cep._biblioteca.cache
+        # aquecer uma instância já inicializada não a inicializa novamente
+        assert 'inicializar' not in cep.aquecer().fases
+    assert list(aquecimento.fases) == [
+            'carregar', 'inicializar', 'resolver', 'configuracao', 'canario']
+    assert aquecimento.total == sum(aquecimento.fases.values())
+
+
+def test_aquecer_canario_invalido(biblioteca_stub):
+    cep = ACBrLibCEP.usar(biblioteca_stub)
+    with pytest.raises(ValueError):
+        cep.aquecer(cep_canario='1827')
+    assert cep._biblioteca.users == 0
+    assert cep.aquecimento is None
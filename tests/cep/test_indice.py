@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_indice.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pytest
+
+from acbrlib_python import ACBrLibCEP
+from acbrlib_python.cep.indice import IndiceCEP
+from acbrlib_python.cep.indice import importar_csv
+
+CSV = '''\
+CEP;LOGRADOURO;BAIRRO;CIDADE;UF
+18270-170;Rua Coronel Aureliano de Camargo;Centro;Tatuí;SP
+01001000;Praça da Sé;Sé;São Paulo;SP
+15800-000;Rua Brasil;Centro;Catanduva;SP
+15800-000;Rua São Paulo;Centro;Catanduva;SP
+'''
+
+
+@pytest.fixture
+def indice(tmp_path):
+    entrada = tmp_path / 'dne.csv'
+    entrada.write_text(CSV, encoding='utf-8')
+    destino = str(tmp_path / 'cep.idx')
+    quantidade = importar_csv(
+            str(entrada),
+            destino,
+            delimitador=';',
+            colunas={
+                    'cep': 'CEP',
+                    'logradouro': 'LOGRADOURO',
+                    'bairro': 'BAIRRO',
+                    'municipio': 'CIDADE',
+                    'uf': 'UF',
+                }
+        )
+    assert quantidade == 4
+    with IndiceCEP(destino) as indice:
+        yield indice
+
+
+def test_indice_buscar(indice):
+    assert len(indice) == 4
+    enderecos = indice.buscar('01001-000')
+    assert len(enderecos) == 1
+    assert enderecos[0].cep == '01001-000'
+    assert enderecos[0].logradouro == 'Praça da Sé'
+    assert enderecos[0].municipio == 'São Paulo'
+    assert enderecos[0].complemento == ''
+
+    enderecos = indice.buscar('15800000')
+    assert {e.logradouro for e in enderecos} == {'Rua Brasil', 'Rua São Paulo'}
+
+    assert indice.buscar('99999999') == []
+    assert '18270170' in indice
+    assert '00000000' not in indice
+
+
+def test_buscar_por_cep_usa_indice(indice, biblioteca_stub):
+    with ACBrLibCEP.usando(biblioteca_stub, indice=indice) as cep:
+        assert cep.buscar_por_cep('18270170')[0].municipio == 'Tatuí'
+        assert cep.buscar_por_cep('11111111')[0].cep == '11111-111'
+        assert cep.buffers.stats('CEP_BuscarPorCEP').hits == 1
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_modelos.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import dataclasses
+import pickle
+import sys
+
+import pytest
+
+from acbrlib_python.cep.modelos import CAMPOS
+from acbrlib_python.cep.modelos import Endereco
+from acbrlib_python.cep.modelos import EnderecoBatch
+from acbrlib_python.cep.modelos import internar
+
+
+def _endereco(cep='18270-170', uf='SP'):
+    return Endereco(
+            tipo_logradouro='',
+            logradouro='Rua Coronel Aureliano de Camargo',
+            complemento='',
+            bairro='Centro',
+            municipio='Tatuí',
+            uf=uf,
+            cep=cep,
+            ibge_municipio='3554003',
+            ibge_uf='35'
+        )
+
+
+def test_endereco_com_slots():
+    e = _endereco()
+    assert not hasattr(e, '__dict__')
+    assert e == _endereco()
+    assert hash(e) == hash(_endereco())
+    assert pickle.loads(pickle.dumps(e)) == e
+    assert dataclasses.replace(e, uf='RJ').uf == 'RJ'
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        e.uf = 'RJ'
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        e.outro = ''
+
+
+def test_endereco_batch():
+    enderecos = [_endereco(cep=f'1827{i}-170') for i in range(5)]
+    lote = EnderecoBatch(enderecos)
+    assert len(lote) == 5
+    assert lote[2] == enderecos[2]
+    assert lote[-1] == enderecos[-1]
+    assert list(lote) == enderecos
+    assert lote[1:3] == EnderecoBatch(enderecos[1:3])
+    assert lote.coluna('cep') == tuple(e.cep for e in enderecos)
+    assert lote.linha(0) == dataclasses.astuple(enderecos[0])
+    assert enderecos[4] in lote
+    assert EnderecoBatch.de_linhas(lote.linha(i) for i in range(5)) == lote
+
+
+def test_internar_valores_repetidos():
+    valores = internar([''.join(['S', 'P'])] * len(CAMPOS))
+    uf = CAMPOS.index('uf')
+    cep = CAMPOS.index('cep')
+    assert valores[uf] is sys.intern('SP')
+    assert valores[cep] is not sys.intern('SP')
+
+
+def test_endereco_batch_codifica_colunas_repetidas():
+    enderecos = [_endereco(cep=f'1827{i}-170', uf=('SP', 'RJ')[i % 2]) for i in range(6)]
+    lote = EnderecoBatch(enderecos)
+    assert lote.coluna('uf') == ('SP', 'RJ') * 3
+    assert lote[3].uf == 'RJ'
+    assert lote[2:4] == EnderecoBatch(enderecos[2:4])
+    assert lote._colunas[CAMPOS.index('uf')].distintos == 2
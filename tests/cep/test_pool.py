@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_pool.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from acbrlib_python import mixins
+from acbrlib_python.cep import ACBrLibCEPPool
+from acbrlib_python.excecoes import ACBrLibPoolEsgotado
+
+
+def test_pool_buscas_concorrentes(biblioteca_stub):
+    ceps = [f'{18270000 + i:08d}' for i in range(50)]
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=3) as pool:
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            resultados = list(executor.map(pool.buscar_por_cep, ceps))
+        assert pool.disponiveis == 3
+    for cep, enderecos in zip(ceps, resultados):
+        assert enderecos[0].cep == f'{cep[:5]}-{cep[5:]}'
+
+
+def test_pool_esgotado(biblioteca_stub):
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=1) as pool:
+        with pool.emprestar():
+            with pytest.raises(ACBrLibPoolEsgotado):
+                pool.buscar_por_cep('18270170', timeout=0.01)
+        assert pool.buscar_por_cep('18270170', timeout=0.01)
+
+
+def test_pool_substitui_instancia_com_problemas(biblioteca_stub):
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=2) as pool:
+        cep = pool.obter()
+        cep._funcoes['CEP_Nome'] = lambda *args: -10  # força uma falha
+        pool.devolver(cep, verificar=True)
+        assert pool.disponiveis == 2
+        assert pool.verificar() == 0
+        obtidas = [pool.obter(), pool.obter()]
+        assert cep not in obtidas
+        for instancia in obtidas:
+            pool.devolver(instancia)
+
+
+def test_pool_buscar_varios_ceps(biblioteca_stub):
+    def numeros():
+        for i in range(40):
+            yield f'{18270000 + i % 20:08d}'  # cada CEP aparece duas vezes
+        yield '1827-017'
+
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=3) as pool:
+        resultados = dict(pool.buscar_varios_ceps(numeros(), janela=4))
+        assert pool.disponiveis == 3
+    assert len(resultados) == 21
+    assert isinstance(resultados.pop('1827-017'), ValueError)
+    for cep, enderecos in resultados.items():
+        assert enderecos[0].cep == f'{cep[:5]}-{cep[5:]}'
+
+
+def test_pool_aquecido(biblioteca_stub):
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=2, cep_canario='18270170') as pool:
+        aquecimentos = pool.aquecimentos
+    assert len(aquecimentos) == 2
+    for aquecimento in aquecimentos:
+        assert list(aquecimento.fases) == [
+                'carregar', 'inicializar', 'resolver', 'configuracao', 'canario']
+
+
+def test_pool_coalesce_buscas_identicas(biblioteca_stub, monkeypatch):
+    from acbrlib_python import instrumentacao
+    from acbrlib_python.instrumentacao import ColetorMemoria
+    # a latência é lida na inicialização de cada cópia da biblioteca
+    monkeypatch.setenv('ACBRCEP_STUB_LATENCIA_US', '50000')
+    from acbrlib_python.rastreamento import RastreadorMemoria
+    coletor = ColetorMemoria()
+    rastreador = RastreadorMemoria()
+    instrumentacao.ativar(coletor)
+    try:
+        with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=4) as pool:
+            pool.rastreador = rastreador
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                resultados = list(executor.map(pool.buscar_por_cep, ['18270-170'] * 8))
+            coalescidas = pool.coalescedor.coalescidas
+    finally:
+        instrumentacao.desativar()
+    assert all(r[0].cep == '18270-170' for r in resultados)
+    chamadas = coletor.metricas()['CEP_BuscarPorCEP'].chamadas
+    assert chamadas + coalescidas == 8
+    assert chamadas < 8
+    origens = [s.atributos['acbrlib.origem'] for s in rastreador.spans]
+    assert origens.count('coalescida') == coalescidas
+    assert origens.count('biblioteca') == chamadas
+
+
+def test_pool_coalescencia_respeita_o_tempo_de_espera_de_quem_aguarda(
+        biblioteca_stub, monkeypatch):
+    monkeypatch.setenv('ACBRCEP_STUB_LATENCIA_US', '300000')
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=2) as pool:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            lider = executor.submit(pool.buscar_por_cep, '18270170', timeout=5)
+            while pool.coalescedor.em_andamento == 0:
+                pass
+            # a busca do líder demora mais do que quem aguarda está disposto
+            # a esperar, embora haja instâncias livres no pool
+            with pytest.raises(ACBrLibPoolEsgotado):
+                pool.buscar_por_cep('18270-170', timeout=0.01)
+            assert lider.result()[0].cep == '18270-170'
+        assert pool.coalescedor.coalescidas == 1
+        assert pool.disponiveis == 2
+
+
+def test_pool_buscar_varios_ceps_em_lote(biblioteca_stub):
+    from acbrlib_python.cep.lote import ResultadosEmLote
+    numeros = [f'{18270000 + i:08d}' for i in range(20)] + ['1827-017']
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=3) as pool:
+        resultados = ResultadosEmLote(pool.buscar_varios_ceps(numeros))
+        esperados = dict(pool.buscar_varios_ceps(numeros))
+    assert len(resultados) == 21
+    assert set(resultados) == set(esperados)
+    assert isinstance(resultados['1827-017'], ValueError)
+    assert list(resultados.erros) == ['1827-017']
+    for cep in numeros[:-1]:
+        assert resultados[cep] == esperados[cep]
+    assert len(resultados.enderecos) == 20
+    assert set(resultados.enderecos.coluna('uf')) == {'SP'}
+
+
+def test_pool_fechado_acorda_quem_aguarda(biblioteca_stub):
+    pool = ACBrLibCEPPool.usando(biblioteca_stub, tamanho=1)
+    emprestada = pool.obter()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        aguardando = executor.submit(pool.obter)
+        pool.fechar()
+        with pytest.raises(RuntimeError):
+            aguardando.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        pool.obter()
+    assert emprestada._em_uso
+    # devolvida após o fechamento, a instância é finalizada
+    pool.devolver(emprestada)
+    assert not emprestada._em_uso
+    assert pool.disponiveis == 0
+
+
+def test_pool_devolucao_concorrente_ao_fechamento(biblioteca_stub):
+    pool = ACBrLibCEPPool.usando(biblioteca_stub, tamanho=1)
+    instancia = pool.obter()
+    colocar = pool._livres.put
+    fechamento = threading.Thread(target=pool.fechar)
+
+    def put(item, *args, **kwargs):
+        # o pool é fechado enquanto a instância está sendo devolvida
+        pool._livres.put = colocar
+        fechamento.start()
+        fechamento.join(0.1)
+        colocar(item, *args, **kwargs)
+
+    pool._livres.put = put
+    pool.devolver(instancia)
+    fechamento.join()
+    assert not instancia._em_uso
+
+
+def test_pool_substitui_instancia_da_biblioteca_compartilhada(
+        biblioteca_stub,
+        caplog,
+        monkeypatch):
+    invocados = []
+    invocar = mixins._invocar_rastreado
+
+    def _invocar_rastreado(impl, metodo, *args):
+        invocados.append(metodo)
+        return invocar(impl, metodo, *args)
+
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=2, copiar=False) as pool:
+        cep = pool.obter()
+        outra = pool.obter()
+        cep._funcoes['CEP_Nome'] = lambda *args: -10
+        monkeypatch.setattr(mixins, '_invocar_rastreado', _invocar_rastreado)
+        with caplog.at_level(logging.WARNING, logger='acbrlib_python.cep.pool'):
+            pool.devolver(cep, verificar=True)
+        monkeypatch.undo()
+        # a outra instância continua usando a biblioteca, que não é
+        # inicializada novamente nem finalizada
+        assert not cep.inicializada
+        assert outra.biblioteca.users == 2
+        assert 'CEP_Inicializar' not in invocados
+        assert 'CEP_Finalizar' not in invocados
+        assert 'sem reinicializar' in caplog.text
+        pool.devolver(outra)
+        assert pool.disponiveis == 2
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            resultados = list(executor.map(pool.buscar_por_cep, ['18270170', '18270171']))
+    assert [r[0].cep for r in resultados] == ['18270-170', '18270-171']
+
+
+def test_pool_substitui_unica_instancia_da_biblioteca(biblioteca_stub, caplog):
+    with ACBrLibCEPPool.usando(biblioteca_stub, tamanho=1, copiar=False) as pool:
+        cep = pool.obter()
+        # a biblioteca deixa de responder; como nenhuma outra instância a
+        # usa, ela é finalizada e inicializada novamente pela substituta
+        cep._invocar('CEP_Finalizar')()
+        cep._funcoes['CEP_Nome'] = lambda *args: -10
+        with caplog.at_level(logging.WARNING, logger='acbrlib_python.cep.pool'):
+            pool.devolver(cep, verificar=True)
+        assert 'sem reinicializar' not in caplog.text
+        assert pool.buscar_por_cep('18270170')[0].cep == '18270-170'
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_processos.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import multiprocessing
+
+from concurrent.futures import Future
+
+import pytest
+
+from acbrlib_python.cep import ACBrLibCEP
+from acbrlib_python.cep import ACBrLibCEPExecutor
+from acbrlib_python.cep.modelos import Endereco
+
+
+def test_executor_mapear(biblioteca_stub):
+    ceps = [f'{18270000 + i:08d}' for i in range(20)]
+    with ACBrLibCEPExecutor.usando(biblioteca_stub, processos=2) as executor:
+        resultados = list(executor.mapear(ceps, tamanho_lote=4))
+        futuro = executor.submeter_busca_por_cep('18270170')
+        assert futuro.result()[0].cep == '18270-170'
+    assert len(resultados) == len(ceps)
+    for cep, enderecos in zip(ceps, resultados):
+        assert isinstance(enderecos[0], Endereco)
+        assert enderecos[0].cep == f'{cep[:5]}-{cep[5:]}'
+
+
+def test_executor_propaga_excecoes(biblioteca_stub):
+    with ACBrLibCEPExecutor.usando(biblioteca_stub, processos=1) as executor:
+        with pytest.raises(ValueError):
+            executor.buscar_por_cep('123')
+        assert len(executor.buscar_por_logradouro(logradouro='Rua')) == 20
+
+
+def test_executor_buscar_varios_ceps(biblioteca_stub):
+    ceps = [f'{18270000 + i:08d}' for i in range(10)] * 2
+    with ACBrLibCEPExecutor.usando(biblioteca_stub, processos=2) as executor:
+        assert executor.processos == 2
+        resultados = dict(executor.buscar_varios_ceps(ceps))
+    assert sorted(resultados) == sorted(set(ceps))
+    assert all(enderecos[0].cep.replace('-', '') == cep
+               for cep, enderecos in resultados.items())
+
+
+def test_transferir_resultado_e_cancelamento():
+    from acbrlib_python.cep.processos import _transferir
+    origem = Future()
+    origem.set_result([('',) * 9])
+    # o destino cancelado antes da transferência a ignora
+    cancelado = Future()
+    assert cancelado.cancel()
+    _transferir(origem, cancelado)
+    assert cancelado.cancelled()
+    destino = Future()
+    _transferir(origem, destino)
+    assert isinstance(destino.result()[0], Endereco)
+    assert not destino.cancel()
+    # a busca cancelada cancela o destino
+    interrompida = Future()
+    interrompida.cancel()
+    destino = Future()
+    _transferir(interrompida, destino)
+    assert destino.cancelled()
+
+
+@pytest.mark.parametrize('arq_config', ['', 'outro.ini'])
+def test_executor_fork_dentro_de_instancia(biblioteca_stub, monkeypatch, arq_config):
+    # os processos trabalhadores não herdam o registro de bibliotecas
+    # compartilhadas do processo principal: cada um inicializa a sua
+    # biblioteca, lendo a configuração do ambiente, mesmo que o processo
+    # principal já a tenha inicializado, com quaisquer argumentos
+    contexto = multiprocessing.get_context('fork')
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        monkeypatch.setenv('ACBRCEP_STUB_ENDERECOS_CEP', '3')
+        with ACBrLibCEPExecutor.usando(
+                biblioteca_stub,
+                processos=1,
+                arq_config=arq_config,
+                contexto=contexto) as executor:
+            assert len(executor.buscar_por_cep('18270170')) == 3
+        assert len(cep.buscar_por_cep('18270170')) == 1
+        assert cep._biblioteca.users == 1
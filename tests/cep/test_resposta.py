@@ -19,21 +19,31 @@
 
 import pytest
 
+from acbrlib_python.cep.impl import iter_processar_resposta
 from acbrlib_python.cep.impl import processar_resposta
+from acbrlib_python.cep.impl import processar_resposta_bytes
 from acbrlib_python.cep.excecoes import ACBrLibCEPErroResposta
 
 
-def test_resposta_sem_resultados():
+@pytest.fixture(params=['str', 'bytes'])
+def processar(request):
+    """Processa a resposta decodificada ou diretamente sobre os bytes."""
+    if request.param == 'str':
+        return processar_resposta
+    return lambda resposta: processar_resposta_bytes(memoryview(resposta.encode('utf-8')))
+
+
+def test_resposta_sem_resultados(processar):
     """Uma resposta sem resultados deve resultar uma lista vazia."""
     conteudo = [
             '[CEP]',
             'Quantidade=0',
         ]
-    enderecos = processar_resposta('\n'.join(conteudo))
+    enderecos = processar('\n'.join(conteudo))
     assert len(enderecos) == 0
 
 
-def test_resposta_com_um_resultado():
+def test_resposta_com_um_resultado(processar):
     """Resposta normal, contendo um resultado."""
     conteudo = [
             '[Endereco1]',
@@ -50,7 +60,7 @@ def test_resposta_com_um_resultado():
             '[CEP]',
             'Quantidade = 1',
         ]
-    enderecos = processar_resposta('\n'.join(conteudo))
+    enderecos = processar('\n'.join(conteudo))
     assert len(enderecos) == 1
 
     e = enderecos[0]
@@ -65,7 +75,7 @@ def test_resposta_com_um_resultado():
     assert e.ibge_uf == '35'
 
 
-def test_resposta_mal_formada_sem_quantidade():
+def test_resposta_mal_formada_sem_quantidade(processar):
     """
     Testa uma resposta que não possui a seção que indica a quantidade de
     endereços encontrados.
@@ -75,10 +85,10 @@ def test_resposta_mal_formada_sem_quantidade():
             'Tipo_Logradouro = Rua',
         ]
     with pytest.raises(ACBrLibCEPErroResposta):
-        processar_resposta('\n'.join(conteudo))
+        processar('\n'.join(conteudo))
 
 
-def test_resposta_mal_formada_sem_enderecos():
+def test_resposta_mal_formada_sem_enderecos(processar):
     """
     Testa uma resposta que indica a existência de 1 endereço, mas que não
     possui nenhuma seção ``EnderecoN``.
@@ -88,4 +98,75 @@ def test_resposta_mal_formada_sem_enderecos():
             'Quantidade=1',
         ]
     with pytest.raises(ACBrLibCEPErroResposta):
-        processar_resposta('\n'.join(conteudo))
+        processar('\n'.join(conteudo))
+
+
+def test_resposta_mal_formada_sem_secao(processar):
+    """Testa uma resposta com conteúdo que não pertence a uma seção."""
+    conteudo = [
+            'Quantidade=1',
+            '[CEP]',
+        ]
+    with pytest.raises(ACBrLibCEPErroResposta):
+        processar('\n'.join(conteudo))
+
+
+def test_iter_processar_resposta_interrompida():
+    """
+    A iteração pode ser interrompida sem que as demais seções sejam
+    processadas, mesmo que estejam mal formadas.
+    """
+    conteudo = [
+            '[Endereco1]',
+            'Bairro = Centro',
+            'CEP = 18270-170',
+            'Complemento =',
+            'IBGE_Municipio = 3554003',
+            'IBGE_UF = 35',
+            'Logradouro = Rua Coronel Aureliano de Camargo',
+            'Municipio = Tatuí',
+            'Tipo_Logradouro =',
+            'UF = SP',
+            '',
+            '[Endereco2]',
+            'Bairro = Centro',
+            '',
+            '[CEP]',
+            'Quantidade = 2',
+        ]
+    enderecos = iter_processar_resposta('\n'.join(conteudo))
+    assert next(enderecos).cep == '18270-170'
+    with pytest.raises(ACBrLibCEPErroResposta):
+        next(enderecos)
+
+
+def test_iter_processar_resposta_sem_quantidade():
+    conteudo = [
+            '[Endereco1]',
+            'Tipo_Logradouro = Rua',
+        ]
+    with pytest.raises(ACBrLibCEPErroResposta):
+        next(iter_processar_resposta('\n'.join(conteudo)))
+
+
+def test_iter_processar_resposta_sem_enderecos():
+    conteudo = [
+            '[CEP]',
+            'Quantidade=1',
+        ]
+    with pytest.raises(ACBrLibCEPErroResposta):
+        list(iter_processar_resposta('\n'.join(conteudo)))
+
+
+@pytest.mark.parametrize('conteudo', [
+        '[Endereco1]\nCEP=18270-170\n[CEP]\nQuantidade=1',
+        '[CEP]\nQuantidade=2\n[Endereco1]',
+        '[CEP]',
+        'Quantidade=1',
+    ])
+def test_processar_resposta_bytes_mesmos_erros(conteudo):
+    with pytest.raises(ACBrLibCEPErroResposta) as esperado:
+        processar_resposta(conteudo)
+    with pytest.raises(ACBrLibCEPErroResposta) as obtido:
+        processar_resposta_bytes(conteudo.encode('utf-8'))
+    assert str(obtido.value) == str(esperado.value)
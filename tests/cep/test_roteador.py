@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#
+# tests/cep/test_roteador.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import time
+
+import pytest
+
+from acbrlib_python.cep.constantes import CEP_WS_CORREIOS
+from acbrlib_python.cep.constantes import CEP_WS_VIACEP
+from acbrlib_python.cep.roteador import ACBrLibCEPRoteador
+
+
+class _Provedor:
+    """Provedor de mentira: responde com o próprio nome após a espera
+    configurada, ou falha."""
+
+    def __init__(self, nome, espera=0.0, falhar=False):
+        self.nome = nome
+        self.espera = espera
+        self.falhar = falhar
+        self.buscas = 0
+
+    def buscar_por_cep(self, numero):
+        self.buscas += 1
+        time.sleep(self.espera)
+        if self.falhar:
+            raise RuntimeError(f'{self.nome} falhou')
+        return [self.nome, numero]
+
+    def buscar_por_logradouro(self, **kwargs):
+        return self.buscar_por_cep(kwargs['logradouro'])
+
+
+def test_prefere_o_provedor_mais_rapido():
+    lento = _Provedor('lento', espera=0.02)
+    rapido = _Provedor('rapido', espera=0.001)
+    roteador = ACBrLibCEPRoteador({'lento': lento, 'rapido': rapido})
+    # sem latências conhecidas, os provedores são usados na ordem e um
+    # provedor sem buscas só é usado depois dos que já responderam
+    assert roteador.buscar_por_cep('18270-170') == ['lento', '18270170']
+    assert roteador.buscar_por_cep('18270170')[0] == 'lento'
+    assert rapido.buscas == 0
+    # com ambos conhecidos e sem erros, prevalece o mais rápido
+    roteador._registrar(roteador._provedores[1], 0.001)
+    for _ in range(5):
+        assert roteador.buscar_por_cep('18270170')[0] == 'rapido'
+    assert lento.buscas == 2
+    estatisticas = roteador.estatisticas()
+    assert estatisticas['rapido'].chamadas == 6
+    assert estatisticas['rapido'].latencia < estatisticas['lento'].latencia
+    assert roteador.buscar_por_logradouro(logradouro='Rua')[0] == 'rapido'
+
+
+def test_classificacao_por_taxa_de_erros_e_latencia():
+    roteador = ACBrLibCEPRoteador(
+            {nome: _Provedor(nome) for nome in ('instavel', 'lento', 'novo', 'rapido')},
+            minimo_amostras=100
+        )
+    instavel, lento, novo, rapido = roteador._provedores
+    for i in range(10):
+        # o instável é o mais rápido, mas falha em 40% das buscas
+        roteador._registrar(instavel, 0.001, falhou=i % 5 < 2)
+        roteador._registrar(lento, 0.2)
+        roteador._registrar(rapido, 0.05)
+    candidatos = [p.provedor for p in roteador._candidatos()]
+    assert candidatos == ['rapido', 'lento', 'novo', 'instavel']
+
+
+def test_falhas_contam_como_penalidade():
+    roteador = ACBrLibCEPRoteador(
+            {nome: _Provedor(nome) for nome in ('a', 'b')},
+            penalidade=1.0,
+            minimo_amostras=100
+        )
+    a, b = roteador._provedores
+    # mesma taxa de erros, mas as falhas de "a" demoram mais do que a
+    # penalidade e as de "b" são imediatas, contando como a penalidade
+    roteador._registrar(a, 0.01)
+    roteador._registrar(b, 0.5)
+    for _ in range(2):
+        roteador._registrar(a, 2.0, falhou=True)
+        roteador._registrar(b, 0.0, falhou=True)
+    assert [p.provedor for p in roteador._candidatos()] == ['b', 'a']
+    # as latências informadas são apenas as das buscas bem sucedidas
+    assert roteador.estatisticas()['a'].latencia == 0.01
+
+
+def test_falha_repetida_no_proximo_provedor_e_suspensao():
+    agora = [0.0]
+    falho = _Provedor('falho', falhar=True)
+    reserva = _Provedor('reserva', espera=0.001)
+    roteador = ACBrLibCEPRoteador(
+            {'falho': falho, 'reserva': reserva},
+            minimo_amostras=2,
+            limite_erros=0.75,
+            suspensao=10,
+            relogio=lambda: agora[0]
+        )
+    assert roteador.buscar_por_cep('18270170')[0] == 'reserva'
+    # com erros, o provedor que falhou passa a ser tentado depois
+    reserva.falhar = True
+    with pytest.raises(RuntimeError, match='falho falhou'):
+        roteador.buscar_por_cep('18270170')
+    reserva.falhar = False
+    assert (falho.buscas, reserva.buscas) == (2, 2)
+    estatisticas = roteador.estatisticas()
+    assert (estatisticas['falho'].erros, estatisticas['falho'].suspenso) == (2, True)
+    assert (estatisticas['reserva'].erros, estatisticas['reserva'].suspenso) == (1, False)
+    buscas = falho.buscas
+    for _ in range(3):
+        assert roteador.buscar_por_cep('18270170')[0] == 'reserva'
+    assert falho.buscas == buscas
+    agora[0] = 11  # fim da suspensão
+    assert roteador.estatisticas()['falho'].suspenso is False
+
+
+def test_todos_os_provedores_falham():
+    roteador = ACBrLibCEPRoteador({
+            'a': _Provedor('a', falhar=True),
+            'b': _Provedor('b', falhar=True),
+        })
+    with pytest.raises(RuntimeError, match='b falhou'):
+        roteador.buscar_por_cep('18270170')
+    with pytest.raises(ValueError):
+        roteador.buscar_por_cep('1827')
+
+
+def test_hedge_apos_o_prazo():
+    primario = _Provedor('primario', espera=0.001)
+    secundario = _Provedor('secundario', espera=0.05)
+    with ACBrLibCEPRoteador(
+            {'primario': primario, 'secundario': secundario},
+            hedge=True,
+            minimo_amostras=3) as roteador:
+        respostas = [roteador.buscar_por_cep('18270170')[0] for _ in range(6)]
+        # o secundário, sem buscas, só é usado depois do primário
+        assert set(respostas) == {'primario'}
+        hedges = roteador.hedges
+        # o primário fica lento: a busca é enviada também ao secundário
+        primario.espera = 0.5
+        inicio = time.perf_counter()
+        assert roteador.buscar_por_cep('18270170')[0] == 'secundario'
+        assert time.perf_counter() - inicio < 0.4
+        assert roteador.hedges == hedges + 1
+
+
+def test_hedge_com_falha_do_primario():
+    with ACBrLibCEPRoteador({
+            'a': _Provedor('a', falhar=True),
+            'b': _Provedor('b')}, hedge=True) as roteador:
+        assert roteador.buscar_por_cep('18270170')[0] == 'b'
+        assert roteador.hedges == 0
+
+
+def test_usando_um_pool_por_provedor(biblioteca_stub):
+    with ACBrLibCEPRoteador.usando(
+            biblioteca_stub,
+            provedores=[CEP_WS_VIACEP, CEP_WS_CORREIOS]) as roteador:
+        for provedor, pool in roteador.fontes.items():
+            with pool.emprestar() as cep:
+                assert cep.config_ler_valor('CEP', 'WebService') == str(provedor)
+        enderecos = roteador.buscar_por_cep('18270170')
+    assert enderecos[0].cep == '18270-170'
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+#
+# tests/stub/__init__.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import ctypes
+import os
+import shutil
+import subprocess
+
+FONTE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'acbrcep_stub.c')
+
+
+def compilar(diretorio: str) -> str:
+    """
+    Compila a biblioteca *stub* da ACBrLibCEP no diretório indicado.
+
+    :return: Caminho completo para o *shared object* compilado.
+    :raise RuntimeError: Se não houver um compilador C disponível.
+    """
+    compilador = os.getenv('CC') or shutil.which('cc') or shutil.which('gcc')
+    if not compilador:
+        raise RuntimeError('Nenhum compilador C disponivel')
+    destino = os.path.join(diretorio, 'libacbrcep_stub.so')
+    subprocess.run(
+            [compilador, '-O2', '-shared', '-fPIC', '-o', destino, FONTE],
+            check=True
+        )
+    return destino
+
+
+def configurar(
+        caminho: str,
+        latencia_us: int = -1,
+        enderecos_cep: int = -1,
+        enderecos_logradouro: int = -1) -> None:
+    """
+    Configura a biblioteca *stub* já compilada, através de
+    ``STUB_Configurar``. Como a biblioteca é carregada uma única vez por
+    processo, a configuração vale para as instâncias que usarem o mesmo
+    caminho (cópias da biblioteca, como as de um *pool*, precisam ser
+    configuradas individualmente ou através das variáveis de ambiente
+    ``ACBRCEP_STUB_*``, lidas em ``CEP_Inicializar``).
+
+    :param latencia_us: Latência de cada busca, em microssegundos.
+    :param enderecos_cep: Quantidade de endereços da resposta de
+        ``CEP_BuscarPorCEP``.
+    :param enderecos_logradouro: Quantidade de endereços da resposta de
+        ``CEP_BuscarPorLogradouro``.
+
+    Valores negativos mantêm a configuração atual.
+    """
+    funcao = ctypes.CDLL(caminho).STUB_Configurar
+    funcao.argtypes = [ctypes.c_long, ctypes.c_int, ctypes.c_int]
+    funcao(latencia_us, enderecos_cep, enderecos_logradouro)
@@ -0,0 +1,327 @@
+/*
+ * tests/stub/acbrcep_stub.c
+ *
+ * Copyright 2021 Base4 Sistemas
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ *
+ * Biblioteca "de mentira" que implementa as exportações CEP_* da ACBrLibCEP
+ * (versão single-thread), usada em testes e benchmarks para exercitar o
+ * caminho ctypes sem depender da biblioteca proprietária. Nenhum serviço
+ * de consulta é acessado: as respostas são montadas localmente.
+ *
+ * A latência das buscas e a quantidade de endereços de cada resposta podem
+ * ser configuradas através de STUB_Configurar ou, na inicialização, através
+ * das variáveis de ambiente ACBRCEP_STUB_LATENCIA_US,
+ * ACBRCEP_STUB_ENDERECOS_CEP e ACBRCEP_STUB_ENDERECOS_LOGRADOURO.
+ *
+ * A configuração é mantida apenas em memória: CEP_ConfigGravarValor altera
+ * ou inclui valores e CEP_Inicializar, CEP_ConfigLer e CEP_ConfigImportar
+ * restauram a configuração inicial.
+ */
+
+#define _POSIX_C_SOURCE 199309L
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#define TAMANHO_ULTIMO_RETORNO 1048576
+#define TAMANHO_ENDERECO 320
+#define MAXIMO_ENDERECOS (TAMANHO_ULTIMO_RETORNO / TAMANHO_ENDERECO - 1)
+#define MAXIMO_VALORES_CONFIG 64
+#define TAMANHO_NOME_CONFIG 64
+
+static char ultimo_retorno[TAMANHO_ULTIMO_RETORNO];
+static char resposta[TAMANHO_ULTIMO_RETORNO];
+static int inicializada = 0;
+
+static long latencia_us = 0;
+static int enderecos_cep = 1;
+static int enderecos_logradouro = 20;
+
+struct valor_config {
+    char sessao[TAMANHO_NOME_CONFIG];
+    char chave[TAMANHO_NOME_CONFIG];
+    char *valor;
+};
+
+static struct valor_config config[MAXIMO_VALORES_CONFIG];
+static int valores_config = 0;
+
+static int limitar(int quantidade)
+{
+    if (quantidade < 0)
+        return 0;
+    return quantidade > MAXIMO_ENDERECOS ? MAXIMO_ENDERECOS : quantidade;
+}
+
+/*
+ * Configura a latência (em microssegundos) de cada busca e a quantidade de
+ * endereços das respostas de CEP_BuscarPorCEP e CEP_BuscarPorLogradouro.
+ * Valores negativos mantêm a configuração atual.
+ */
+int STUB_Configurar(long eLatenciaUs, int eEnderecosCEP, int eEnderecosLogradouro)
+{
+    if (eLatenciaUs >= 0)
+        latencia_us = eLatenciaUs;
+    if (eEnderecosCEP >= 0)
+        enderecos_cep = limitar(eEnderecosCEP);
+    if (eEnderecosLogradouro >= 0)
+        enderecos_logradouro = limitar(eEnderecosLogradouro);
+    return 0;
+}
+
+static void configurar_ambiente(void)
+{
+    const char *valor;
+
+    if ((valor = getenv("ACBRCEP_STUB_LATENCIA_US")) != NULL)
+        STUB_Configurar(atol(valor), -1, -1);
+    if ((valor = getenv("ACBRCEP_STUB_ENDERECOS_CEP")) != NULL)
+        STUB_Configurar(-1, atoi(valor), -1);
+    if ((valor = getenv("ACBRCEP_STUB_ENDERECOS_LOGRADOURO")) != NULL)
+        STUB_Configurar(-1, -1, atoi(valor));
+}
+
+static struct valor_config *procurar_config(const char *sessao, const char *chave)
+{
+    int i;
+
+    for (i = 0; i < valores_config; i++)
+        if (strcmp(config[i].sessao, sessao) == 0 && strcmp(config[i].chave, chave) == 0)
+            return &config[i];
+    return NULL;
+}
+
+static int gravar_config(const char *sessao, const char *chave, const char *valor)
+{
+    struct valor_config *item = procurar_config(sessao, chave);
+    char *copia;
+
+    if (strlen(sessao) >= TAMANHO_NOME_CONFIG || strlen(chave) >= TAMANHO_NOME_CONFIG)
+        return -3;
+    if ((copia = malloc(strlen(valor) + 1)) == NULL)
+        return -3;
+    strcpy(copia, valor);
+    if (item == NULL) {
+        if (valores_config == MAXIMO_VALORES_CONFIG) {
+            free(copia);
+            return -3;
+        }
+        item = &config[valores_config++];
+        strcpy(item->sessao, sessao);
+        strcpy(item->chave, chave);
+    } else {
+        free(item->valor);
+    }
+    item->valor = copia;
+    return 0;
+}
+
+static void restaurar_config(void)
+{
+    while (valores_config > 0)
+        free(config[--valores_config].valor);
+    gravar_config("Principal", "LogPath", "");
+    gravar_config("CEP", "WebService", "10");
+}
+
+static int exportar_config(char *destino, int disponivel)
+{
+    int i, j, n = 0;
+
+    for (i = 0; i < valores_config; i++) {
+        for (j = 0; j < i; j++)
+            if (strcmp(config[j].sessao, config[i].sessao) == 0)
+                break;
+        if (j < i)
+            continue;  /* sessão já exportada */
+        n += snprintf(destino + n, disponivel - n, "%s[%s]\n", n ? "\n" : "", config[i].sessao);
+        for (j = i; j < valores_config && n < disponivel; j++)
+            if (strcmp(config[j].sessao, config[i].sessao) == 0)
+                n += snprintf(destino + n, disponivel - n, "%s=%s\n", config[j].chave, config[j].valor);
+        if (n >= disponivel)
+            return -10;
+    }
+    return 0;
+}
+
+static void aguardar(void)
+{
+    struct timespec espera;
+
+    if (latencia_us <= 0)
+        return;
+    espera.tv_sec = latencia_us / 1000000;
+    espera.tv_nsec = (latencia_us % 1000000) * 1000;
+    while (nanosleep(&espera, &espera) != 0)
+        ;
+}
+
+static int responder(const char *texto, char *sResposta, int *esTamanho)
+{
+    int tamanho = (int) strlen(texto);
+    int copiar = tamanho;
+
+    if (tamanho >= TAMANHO_ULTIMO_RETORNO)
+        return -10;
+    if (texto != ultimo_retorno)
+        memcpy(ultimo_retorno, texto, tamanho + 1);
+
+    if (copiar > *esTamanho)
+        copiar = *esTamanho;
+    memcpy(sResposta, texto, copiar);
+    if (copiar < *esTamanho)
+        sResposta[copiar] = '\0';
+
+    *esTamanho = tamanho;
+    return 0;
+}
+
+static int escrever_endereco(char *destino, int n, const char *cep)
+{
+    return sprintf(
+            destino,
+            "[Endereco%d]\n"
+            "Bairro=Centro\n"
+            "CEP=%.5s-%.3s\n"
+            "Complemento=\n"
+            "IBGE_Municipio=3554003\n"
+            "IBGE_UF=35\n"
+            "Logradouro=Rua Coronel Aureliano de Camargo\n"
+            "Municipio=Tatu\xc3\xad\n"
+            "Tipo_Logradouro=Rua\n"
+            "UF=SP\n"
+            "\n",
+            n, cep, cep + 5);
+}
+
+int CEP_Inicializar(const char *eArqConfig, const char *eChaveCrypt)
+{
+    configurar_ambiente();
+    restaurar_config();
+    inicializada = 1;
+    return 0;
+}
+
+int CEP_Finalizar(void)
+{
+    inicializada = 0;
+    return 0;
+}
+
+int CEP_UltimoRetorno(char *sMensagem, int *esTamanho)
+{
+    return responder(ultimo_retorno, sMensagem, esTamanho);
+}
+
+int CEP_Nome(char *sNome, int *esTamanho)
+{
+    return responder("ACBrLibCEP", sNome, esTamanho);
+}
+
+int CEP_Versao(char *sVersao, int *esTamanho)
+{
+    return responder("0.0.1-stub", sVersao, esTamanho);
+}
+
+int CEP_ConfigLer(const char *eArqConfig)
+{
+    restaurar_config();
+    return 0;
+}
+
+int CEP_ConfigGravar(const char *eArqConfig)
+{
+    return 0;
+}
+
+int CEP_ConfigLerValor(
+        const char *eSessao,
+        const char *eChave,
+        char *sValor,
+        int *esTamanho)
+{
+    struct valor_config *item;
+
+    if (!inicializada)
+        return -1;
+    item = procurar_config(eSessao, eChave);
+    return responder(item ? item->valor : "", sValor, esTamanho);
+}
+
+int CEP_ConfigGravarValor(
+        const char *eSessao,
+        const char *eChave,
+        const char *sValor)
+{
+    if (!inicializada)
+        return -1;
+    return gravar_config(eSessao, eChave, sValor);
+}
+
+int CEP_ConfigImportar(const char *eArqConfig)
+{
+    restaurar_config();
+    return 0;
+}
+
+int CEP_ConfigExportar(char *sMensagem, int *esTamanho)
+{
+    int retorno = exportar_config(resposta, TAMANHO_ULTIMO_RETORNO);
+
+    if (retorno != 0)
+        return retorno;
+    return responder(resposta, sMensagem, esTamanho);
+}
+
+int CEP_BuscarPorCEP(const char *eCEP, char *sResposta, int *esTamanho)
+{
+    int i, n = 0;
+
+    if (!inicializada)
+        return -1;
+
+    aguardar();
+    for (i = 0; i < enderecos_cep; i++)
+        n += escrever_endereco(resposta + n, i + 1, eCEP);
+    sprintf(resposta + n, "[CEP]\nQuantidade=%d\n", enderecos_cep);
+    return responder(resposta, sResposta, esTamanho);
+}
+
+int CEP_BuscarPorLogradouro(
+        const char *eCidade,
+        const char *eTipo_Logradouro,
+        const char *eLogradouro,
+        const char *eUF,
+        const char *eBairro,
+        char *sResposta,
+        int *esTamanho)
+{
+    int quantidade = enderecos_logradouro;
+    int i, n = 0;
+
+    if (!inicializada)
+        return -1;
+
+    aguardar();
+    for (i = 0; i < quantidade; i++) {
+        char cep[12];
+        sprintf(cep, "%08d", 18270000 + i);
+        n += escrever_endereco(resposta + n, i + 1, cep);
+    }
+    sprintf(resposta + n, "[CEP]\nQuantidade=%d\n", quantidade);
+    return responder(resposta, sResposta, esTamanho);
+}
@@ -17,8 +17,54 @@
 # limitations under the License.
 #
 
+import subprocess
+import sys
+
+import pytest
+
 from acbrlib_python import __version__
 
 
 def test_version():
     assert __version__ == '0.1.0'
+
+
+def _importados(codigo):
+    verificacao = f'{codigo}; import sys; print(" ".join(sorted(sys.modules)))'
+    saida = subprocess.run(
+            [sys.executable, '-c', verificacao],
+            check=True,
+            capture_output=True,
+            text=True
+        )
+    return set(saida.stdout.split())
+
+
+def test_importacao_tardia():
+    modulos = _importados('import acbrlib_python, acbrlib_python.constantes')
+    assert 'acbrlib_python.cep.impl' not in modulos
+    assert 'asyncio' not in modulos
+    assert 'unidecode' not in modulos
+
+    modulos = _importados('from acbrlib_python import ACBrLibCEP')
+    assert 'acbrlib_python.cep.impl' in modulos
+    assert 'acbrlib_python.cep.assincrono' not in modulos
+    assert 'sqlite3' not in modulos
+
+
+def test_importacao_tardia_atributos():
+    import acbrlib_python
+    from acbrlib_python import cep
+    assert acbrlib_python.ACBrLibCEP is cep.ACBrLibCEP
+    assert 'AsyncACBrLibCEP' in dir(acbrlib_python)
+    with pytest.raises(AttributeError):
+        acbrlib_python.NaoExiste
+
+
+def test_prototipos_compartilhados(biblioteca_stub):
+    from acbrlib_python import ACBrLibCEP
+    primeira = ACBrLibCEP.usar(biblioteca_stub)
+    segunda = ACBrLibCEP.usar(biblioteca_stub)
+    assert primeira._prototipos is segunda._prototipos
+    with pytest.raises(TypeError):
+        primeira._prototipos['CEP_Nome'] = None
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+# tests/test_ini.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import configparser
+
+import pytest
+
+from acbrlib_python import ini
+
+CONTEUDO = '''
+; comentario
+[Principal]
+LogPath = /var/log/acbr
+LogNivel:4
+# outro comentario
+[CEP]
+WebService=10
+Senha = a=b:c
+Vazio =
+
+[Endereco1]
+  Tipo_Logradouro  =  Rua
+'''
+
+
+def test_ler_equivale_a_configparser():
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_string(CONTEUDO)
+    esperado = {s: dict(parser.items(s)) for s in parser.sections()}
+    assert ini.ler(CONTEUDO) == esperado
+
+
+def test_secoes_na_ordem():
+    nomes = [nome for nome, _ in ini.secoes(CONTEUDO)]
+    assert nomes == ['Principal', 'CEP', 'Endereco1']
+
+
+@pytest.mark.parametrize('conteudo', [
+        'Chave=Valor\n[Secao]',
+        '[Secao]\nLinhaSemDelimitador',
+        '[Secao]\n=Valor',
+    ])
+def test_conteudo_invalido(conteudo):
+    with pytest.raises(ValueError):
+        ini.ler(conteudo)
+
+
+@pytest.mark.parametrize('conteudo', [
+        CONTEUDO,
+        '[A] texto\r\nChave : Valor \r\n[B]\n\n[A]\nOutra=1=2',
+        '[Vazia]',
+        '',
+    ])
+def test_ler_bytes_equivale_a_ler(conteudo):
+    esperado = {
+            nome.encode(): {c.encode(): v.encode() for c, v in secao.items()}
+            for nome, secao in ini.ler(conteudo).items()
+        }
+    assert ini.ler_bytes(conteudo.encode()) == esperado
+    assert ini.ler_bytes(memoryview(conteudo.encode())) == esperado
+
+
+@pytest.mark.parametrize('conteudo', [
+        'Chave=Valor\n[Secao]',
+        '[Secao]\nLinhaSemDelimitador',
+        '[Secao]\n=Valor',
+    ])
+def test_conteudo_invalido_bytes(conteudo):
+    with pytest.raises(ValueError) as excinfo:
+        ini.ler_bytes(conteudo.encode())
+    with pytest.raises(ValueError) as esperado:
+        ini.ler(conteudo)
+    assert str(excinfo.value) == str(esperado.value)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+#
+# tests/test_instrumentacao.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import logging
+
+import pytest
+
+from acbrlib_python import ACBrLibCEP
+from acbrlib_python import instrumentacao
+from acbrlib_python.cep.excecoes import ACBrLibCEPException
+from acbrlib_python.instrumentacao import ColetorLogging
+from acbrlib_python.instrumentacao import ColetorMemoria
+from acbrlib_python.instrumentacao import Instrumentacao
+from acbrlib_python.instrumentacao import exportar_prometheus
+
+
+def test_sem_instrumentacao_invoca_ponteiros_diretamente(biblioteca_stub):
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        assert cep.instrumentacao is None
+        assert not hasattr(cep._invocar('CEP_Nome'), 'fptr')
+
+
+def test_coletor_memoria(biblioteca_stub):
+    memoria = ColetorMemoria(limites=(0.5, 1.0))
+    cep = ACBrLibCEP.usar(biblioteca_stub)
+    cep.instrumentacao = Instrumentacao(memoria, relogio=iter(range(100)).__next__)
+    with pytest.raises(ACBrLibCEPException):
+        cep.buscar_por_cep('18270170')  # biblioteca não inicializada
+    cep.inicializar('', '')
+    try:
+        cep.buscar_por_cep('18270170')
+        cep.buscar_por_logradouro(logradouro='Aureliano')  # resposta > buffer
+    finally:
+        cep.finalizar()
+
+    metricas = memoria.metricas()
+    busca = metricas['CEP_BuscarPorCEP']
+    assert busca.chamadas == 2
+    assert busca.retornos == {-1: 1}
+    assert busca.histograma == [0, 2, 0]  # cada chamada dura 1 "segundo"
+    assert busca.duracao_media == 1.0
+    assert metricas['CEP_BuscarPorLogradouro'].releituras == 1
+    assert metricas['CEP_UltimoRetorno'].chamadas == 1
+
+    texto = exportar_prometheus(memoria)
+    assert 'acbrlib_chamada_duracao_segundos_bucket{metodo="CEP_BuscarPorCEP",le="1.0"} 2' in texto
+    assert 'acbrlib_chamada_duracao_segundos_count{metodo="CEP_BuscarPorCEP"} 2' in texto
+    assert 'acbrlib_chamada_erros_total{metodo="CEP_BuscarPorCEP",retorno="-1"} 1' in texto
+    assert 'acbrlib_buffer_releituras_total{metodo="CEP_BuscarPorLogradouro"} 1' in texto
+
+
+def test_instrumentacao_padrao(biblioteca_stub, caplog):
+    instrumentacao.ativar(ColetorLogging())
+    try:
+        cep = ACBrLibCEP.usar(biblioteca_stub)
+    finally:
+        instrumentacao.desativar()
+    assert ACBrLibCEP.usar(biblioteca_stub).instrumentacao is None
+    with caplog.at_level(logging.DEBUG, logger='acbrlib_python.instrumentacao'):
+        cep.versao()
+        with pytest.raises(ACBrLibCEPException):
+            cep.buscar_por_cep('18270170')
+    niveis = [(r.levelno, r.getMessage().split(':')[0]) for r in caplog.records]
+    assert niveis == [
+            (logging.DEBUG, 'CEP_Versao'),
+            (logging.WARNING, 'CEP_BuscarPorCEP'),
+        ]
@@ -17,12 +17,26 @@
 # limitations under the License.
 #
 
+import os
+import threading
+import time
+
 from acbrlib_python import proto
 from acbrlib_python.constantes import AUTO
+from acbrlib_python.excecoes import ACBrLibException
+from acbrlib_python.proto import ACBrLibReferencia
 from acbrlib_python.proto import ReferenceLibrary
+from acbrlib_python.proto import PercentileSizeStrategy
 from acbrlib_python.proto import Signature
+from acbrlib_python.proto import StringBufferPool
 from acbrlib_python.proto import common_method_prototypes
 from acbrlib_python.proto import config_method_prototypes
+from acbrlib_python.proto import discard_shared_library
+from acbrlib_python.proto import shared_library
+
+
+class _FakeFuncPtr:
+    pass
 
 
 class _FakeCDLL:
@@ -30,6 +44,11 @@ class _FakeCDLL:
     def __init__(self, path, calling_convention):
         self._path = path
         self._calling_convention = calling_convention
+        self.resolvidos = []
+
+    def __getitem__(self, name):
+        self.resolvidos.append(name)
+        return _FakeFuncPtr()
 
 
 def test_referencelibrary_class_auto_cdecl(monkeypatch):
@@ -43,6 +62,87 @@ def test_referencelibrary_class_auto_cdecl(monkeypatch):
     assert lib._lazy_load is True
 
 
+def test_referencelibrary_class_eager_load(monkeypatch):
+    def mockreturn(path, calling_convention):
+        return _FakeCDLL(path, calling_convention)
+    monkeypatch.setattr(proto, 'loader', mockreturn)
+    lib = ReferenceLibrary('/var/lib.so', lazy_load=False)
+    assert isinstance(lib._ref, _FakeCDLL)
+
+
+def test_referencelibrary_carrega_uma_vez(monkeypatch):
+    carregadas = []
+
+    def mockreturn(path, calling_convention):
+        time.sleep(0.01)
+        carregadas.append(path)
+        return _FakeCDLL(path, calling_convention)
+    monkeypatch.setattr(proto, 'loader', mockreturn)
+    lib = ReferenceLibrary('/var/lib.so')
+    refs = []
+    threads = [threading.Thread(target=lambda: refs.append(lib.ref)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert carregadas == ['/var/lib.so']
+    assert all(ref is refs[0] for ref in refs)
+
+
+def test_referencelibrary_contagem_de_usos():
+    lib = ReferenceLibrary('/var/lib.so')
+    assert lib.acquire() is True
+    assert lib.acquire() is False
+    assert lib.users == 2
+    assert lib.release() is False
+    assert lib.release() is True
+    assert lib.release() is True
+    assert lib.users == 0
+
+
+def test_shared_library(tmp_path):
+    arquivo = tmp_path / 'libacbrcep64.so'
+    arquivo.touch()
+    link = tmp_path / 'libacbrcep.so'
+    os.symlink(arquivo, link)
+    try:
+        lib = shared_library(str(arquivo))
+        assert shared_library(str(link), 'cdecl') is lib
+        assert shared_library(str(arquivo), 'stdcall') is not lib
+        discard_shared_library(str(link))
+        assert shared_library(str(arquivo)) is not lib
+    finally:
+        discard_shared_library(str(arquivo))
+        discard_shared_library(str(arquivo), 'stdcall')
+
+
+def test_acbrlibreferencia_cache_funcoes(monkeypatch):
+    def mockreturn(path, calling_convention):
+        return _FakeCDLL(path, calling_convention)
+    monkeypatch.setattr(proto, 'loader', mockreturn)
+    lib = ReferenceLibrary('/var/lib.so')
+    impl = ACBrLibReferencia(
+            'CEP',
+            lib,
+            common_method_prototypes('CEP'),
+            ACBrLibException
+        )
+
+    fptr = impl._invocar('CEP_Nome')
+    assert impl._invocar('CEP_Nome') is fptr
+    assert lib.ref.resolvidos == ['CEP_Nome']
+
+    # recarregar a biblioteca deve invalidar os ponteiros já resolvidos
+    lib.reload()
+    assert impl._invocar('CEP_Nome') is not fptr
+    assert lib.ref.resolvidos == ['CEP_Nome']
+
+    lib.ref.resolvidos.clear()
+    impl.descartar_funcoes()
+    impl.resolver_funcoes()
+    assert sorted(lib.ref.resolvidos) == sorted(common_method_prototypes('CEP'))
+
+
 def test_signature_class():
     original_args = ['a', 'b', 'c']
     s = Signature(original_args, restype='t')
@@ -61,6 +161,31 @@ def test_signature_class():
     assert 'x' not in s.argtypes
 
 
+def test_stringbufferpool_reutiliza_e_amplia():
+    pool = StringBufferPool(initial_length=16, max_length=64)
+    buf = pool.acquire('CEP_Versao')
+    assert len(buf) == 16
+    assert pool.acquire('CEP_Versao') is buf
+
+    pool.reread('CEP_Versao', 32)
+    maior = pool.acquire('CEP_Versao')
+    assert len(maior) == 33
+    assert pool.acquire('CEP_Versao') is maior
+    assert pool.stats('CEP_Versao').rereads == 1
+    assert pool.stats('CEP_Versao').largest == 32
+
+
+def test_stringbufferpool_limite():
+    pool = StringBufferPool(initial_length=16, max_length=64)
+    pool.reread('CEP_Versao', 100)
+    assert len(pool.acquire('CEP_Versao')) == 16
+
+    # buffers além do limite são temporários
+    temporario = pool.acquire('CEP_UltimoRetorno', 100)
+    assert len(temporario) == 100
+    assert pool.acquire('CEP_UltimoRetorno') is not temporario
+
+
 def test_common_method_prototypes_all():
     res = common_method_prototypes('CEP')
     assert 'CEP_Inicializar' in res
@@ -92,3 +217,56 @@ def test_config_method_prototypes_excluded():
         )
     assert 'DIS_ConfigImportar' not in res
     assert 'DIS_ConfigExportar' not in res
+
+
+def test_stringbufferpool_releituras_evitadas():
+    pool = StringBufferPool(initial_length=16)
+    pool.reread('CEP_BuscarPorLogradouro', 40)
+    pool.hit('CEP_BuscarPorLogradouro', 40)
+    pool.hit('CEP_BuscarPorLogradouro', 10)
+    stats = pool.stats('CEP_BuscarPorLogradouro')
+    assert (stats.hits, stats.rereads, stats.avoided) == (2, 1, 1)
+    pool.hit('CEP_Versao', 10)
+    total = pool.total_stats()
+    assert (total.hits, total.rereads, total.avoided) == (3, 1, 1)
+
+
+def test_stringbufferpool_estrategia_percentil():
+    pool = StringBufferPool(
+            initial_length=16,
+            strategy=lambda: PercentileSizeStrategy(percentile=0.5, window=8),
+            review_interval=2
+        )
+    pool.reread('CEP_BuscarPorLogradouro', 100)
+    assert len(pool.acquire('CEP_BuscarPorLogradouro')) == 101
+    for _ in range(4):
+        pool.hit('CEP_BuscarPorLogradouro', 20)
+    # a mediana (20) não justifica manter um buffer para 100 bytes
+    assert len(pool.acquire('CEP_BuscarPorLogradouro')) == 21
+    pool.reread('CEP_BuscarPorLogradouro', 100)  # exceção, continua relida
+    assert len(pool.acquire('CEP_BuscarPorLogradouro')) == 21
+    assert pool.stats('CEP_BuscarPorLogradouro').rereads == 2
+
+
+def test_stringbufferpool_limite_de_memoria():
+    pool = StringBufferPool(initial_length=16, memory_cap=100)
+    pool.acquire('CEP_Nome')
+    pool.acquire('CEP_Versao')
+    pool.reread('CEP_BuscarPorLogradouro', 59)
+    assert pool.memory == 92
+    pool.acquire('CEP_Nome')  # CEP_Versao passa a ser o menos usado
+    pool.reread('CEP_BuscarPorLogradouro', 79)
+    assert pool.memory == 96  # CEP_Versao foi descartado
+    assert len(pool.acquire('CEP_Nome')) == 16
+    # um buffer além do limite é temporário e o atual é mantido
+    pool.reread('CEP_BuscarPorLogradouro', 200)
+    assert len(pool.acquire('CEP_BuscarPorLogradouro')) == 80
+    assert len(pool.acquire('CEP_UltimoRetorno', 200)) == 200
+    assert pool.memory <= 100
+
+
+def test_acbrlibreferencia_buffers_configuraveis(monkeypatch):
+    monkeypatch.setattr(proto, 'loader', _FakeCDLL)
+    pool = StringBufferPool(strategy=PercentileSizeStrategy)
+    ref = ACBrLibReferencia('CEP', ReferenceLibrary('/var/lib.so'), {}, ACBrLibException, buffers=pool)
+    assert ref.buffers is pool
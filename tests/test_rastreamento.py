@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+#
+# tests/test_rastreamento.py
+#
+# Copyright 2021 Base4 Sistemas
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import pytest
+
+from acbrlib_python import ACBrLibCEP
+from acbrlib_python import rastreamento
+from acbrlib_python.rastreamento import RastreadorMemoria
+
+
+def _arvore(rastreador):
+    # (nome do span, nome do span pai), na ordem em que terminaram
+    return [
+            (s.nome, s.pai.nome if s.pai else None)
+            for s in rastreador.spans
+        ]
+
+
+def test_spans_da_busca_por_logradouro(biblioteca_stub):
+    rastreador = RastreadorMemoria()
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        cep.rastreador = rastreador
+        enderecos = cep.buscar_por_logradouro(logradouro='Aureliano')
+    assert _arvore(rastreador) == [
+            ('CEP_BuscarPorLogradouro', 'ACBrLibCEP.buscar_por_logradouro'),
+            ('CEP_UltimoRetorno', 'ultimo_retorno'),
+            ('ultimo_retorno', 'ACBrLibCEP.buscar_por_logradouro'),
+            ('processar_resposta', 'ACBrLibCEP.buscar_por_logradouro'),
+            ('ACBrLibCEP.buscar_por_logradouro', None),
+            ('CEP_Finalizar', None),
+        ]
+    nativo, _, releitura, processamento, busca, _ = rastreador.spans
+    assert nativo.atributos['acbrlib.metodo'] == 'CEP_BuscarPorLogradouro'
+    assert nativo.atributos['acbrlib.retorno'] == 0
+    assert nativo.atributos['acbrlib.tamanho_resposta'] > 1024
+    assert releitura.atributos['acbrlib.tamanho_resposta'] == \
+        nativo.atributos['acbrlib.tamanho_resposta']
+    assert processamento.atributos['acbrlib.enderecos'] == len(enderecos)
+    assert busca.atributos['acbrlib.enderecos'] == len(enderecos)
+    assert all(s.duracao >= 0 for s in rastreador.spans)
+
+
+def test_spans_da_busca_por_logradouro_sob_demanda(biblioteca_stub):
+    from acbrlib_python.cep.cache import CacheEnderecos
+    rastreador = RastreadorMemoria()
+    with ACBrLibCEP.usando(biblioteca_stub, cache=CacheEnderecos()) as cep:
+        cep.rastreador = rastreador
+        enderecos = cep.iter_buscar_por_logradouro(logradouro='Aureliano')
+        primeiro = next(enderecos)
+        # o span termina antes que os endereços sejam consumidos
+        assert _arvore(rastreador)[-1] == ('ACBrLibCEP.iter_buscar_por_logradouro', None)
+        assert rastreador.spans[-1].atributos['acbrlib.origem'] == 'biblioteca'
+        cep.cache.guardar(
+                ('', 'aureliano', '', '', ''),
+                [primeiro] + list(enderecos)
+            )
+        rastreador.limpar()
+        assert len(list(cep.iter_buscar_por_logradouro(logradouro='Aureliano'))) > 1
+    busca, _ = rastreador.spans
+    assert busca.nome == 'ACBrLibCEP.iter_buscar_por_logradouro'
+    assert busca.atributos['acbrlib.origem'] == 'cache'
+    assert busca.atributos['acbrlib.enderecos'] > 1
+
+
+def test_spans_do_aquecimento(biblioteca_stub):
+    rastreamento.ativar(RastreadorMemoria())
+    try:
+        cep = ACBrLibCEP.usar(biblioteca_stub)
+    finally:
+        rastreamento.desativar()
+    cep.aquecer(cep_canario='18270170')
+    try:
+        arvore = _arvore(cep.rastreador)
+    finally:
+        cep.finalizar()
+    assert arvore == [
+            ('aquecer.carregar', 'ACBrLibCEP.aquecer'),
+            ('CEP_Inicializar', 'aquecer.inicializar'),
+            ('aquecer.inicializar', 'ACBrLibCEP.aquecer'),
+            ('aquecer.resolver', 'ACBrLibCEP.aquecer'),
+            ('CEP_ConfigExportar', 'aquecer.configuracao'),
+            ('aquecer.configuracao', 'ACBrLibCEP.aquecer'),
+            ('CEP_BuscarPorCEP', 'aquecer.canario'),
+            ('processar_resposta', 'aquecer.canario'),
+            ('aquecer.canario', 'ACBrLibCEP.aquecer'),
+            ('ACBrLibCEP.aquecer', None),
+        ]
+
+
+def test_spans_dos_metodos_da_biblioteca_e_de_configuracao(biblioteca_stub):
+    rastreador = RastreadorMemoria()
+    with ACBrLibCEP.usando(biblioteca_stub) as cep:
+        cep.rastreador = rastreador
+        cep.nome()
+        cep.versao()
+        cep.config_gravar_valor('CEP', 'WebService', '4')
+        cep.config_ler_valor('CEP', 'WebService')
+        cep.config_ler('')
+    assert [s.nome for s in rastreador.spans] == [
+            'CEP_Nome',
+            'CEP_UltimoRetorno',  # o nome não cabe no buffer inicial
+            'ultimo_retorno',
+            'CEP_Versao',
+            'CEP_ConfigGravarValor',
+            'CEP_ConfigLerValor',
+            'CEP_ConfigLer',
+            'CEP_Finalizar',
+        ]
+    assert all(
+            s.atributos['acbrlib.retorno'] == 0
+            for s in rastreador.spans if s.nome.startswith('CEP_')
+        )
+
+
+def test_spans_do_pool_indice_cache_e_biblioteca(biblioteca_stub):
+    from acbrlib_python.cep import ACBrLibCEPPool
+    from acbrlib_python.cep.cache import CacheEnderecos
+    from acbrlib_python.cep.modelos import Endereco
+
+    class Indice:
+        def buscar(self, cep):
+            if cep == '01001000':
+                return [Endereco('', 'Sé', '', 'Sé', 'São Paulo', 'SP', '01001-000', '', '')]
+            return []
+
+    rastreador = RastreadorMemoria()
+    with ACBrLibCEPPool.usando(
+            biblioteca_stub,
+            tamanho=1,
+            cache=CacheEnderecos(),
+            indice=Indice()) as pool:
+        pool.rastreador = rastreador
+        for numero in ('01001-000', '18270170', '18270-170'):
+            pool.buscar_por_cep(numero)
+    buscas = [s for s in rastreador.spans if s.nome == 'ACBrLibCEPPool.buscar_por_cep']
+    assert [s.atributos['acbrlib.origem'] for s in buscas] == [
+            'indice', 'biblioteca', 'cache']
+    assert all(s.atributos['acbrlib.enderecos'] == 1 for s in buscas)
+    # os spans da instância (com o seu próprio rastreador) não aparecem aqui
+    assert len(rastreador.spans) == 3
+
+
+def test_span_registra_excecao(biblioteca_stub):
+    rastreamento.ativar(RastreadorMemoria())
+    try:
+        cep = ACBrLibCEP.usar(biblioteca_stub)
+    finally:
+        rastreamento.desativar()
+    with pytest.raises(ValueError):
+        cep.buscar_por_cep('123')
+    with pytest.raises(Exception):
+        cep.buscar_por_cep('18270170')  # biblioteca não inicializada
+    falha, nativo, busca = cep.rastreador.spans
+    assert isinstance(falha.excecao, ValueError)
+    assert nativo.atributos['acbrlib.retorno'] == -1
+    assert busca.excecao is not None
+    assert ACBrLibCEP.usar(biblioteca_stub).rastreador is None
+
+
+def test_rastreador_opentelemetry():
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import \
+        InMemorySpanExporter
+    exportador = InMemorySpanExporter()
+    provedor = TracerProvider()
+    provedor.add_span_processor(SimpleSpanProcessor(exportador))
+    rastreador = rastreamento.RastreadorOpenTelemetry(provedor.get_tracer('teste'))
+    with rastreador.iniciar('externo') as externo:
+        externo.definir_atributo('acbrlib.enderecos', 2)
+        with rastreador.iniciar('interno', {'acbrlib.metodo': 'CEP_Nome'}):
+            pass
+    interno, externo = exportador.get_finished_spans()
+    assert interno.parent.span_id == externo.context.span_id
+    assert externo.attributes['acbrlib.enderecos'] == 2